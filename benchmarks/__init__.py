@@ -0,0 +1 @@
+"""Benchmarks for MLRE, kept outside of the installed package."""
@@ -0,0 +1,496 @@
+"""Benchmarks for the radar database and server with synthetic workloads.
+
+Run with "python -m benchmarks.radar_benchmark --help". Each benchmark is run twice on fresh state,
+once to measure latencies and once to trace memory, since tracing slows Python down.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+import typing
+import uuid
+
+from flask import Flask
+
+from mlre.radar import (radar_api_server, radar_common, radar_database,
+                        radar_frontend, radar_ingestion, radar_wire_format)
+
+_Event = typing.Tuple[uuid.UUID, radar_common.EventIdentifier, radar_common.FreezeFrameData]
+
+# A benchmark prepares its state and returns the operation to time and how often to call it
+_Operation = typing.Callable[[int], None]
+_Benchmark = typing.Callable[["Workload", typing.List[_Event], str],
+                             typing.Tuple[_Operation, int]]
+
+_BATCH_SIZE = 100
+
+
+class Workload(typing.NamedTuple):
+    """Describes a synthetic workload.
+
+    Members:
+        event_count: Number of events to insert.
+        identifier_count: Number of distinct event identifiers.
+        freeze_frame_size: Number of measurements per freeze frame.
+        session_count: Number of distinct sessions.
+        query_count: Number of calls of each query benchmark.
+        repetitions: Number of calls of the save and load benchmarks.
+        seed: Seed of the random number generator.
+    """
+    event_count: int = 10000
+    identifier_count: int = 100
+    freeze_frame_size: int = 10
+    session_count: int = 10
+    query_count: int = 1000
+    repetitions: int = 5
+    seed: int = 0
+
+
+class BenchmarkResult(typing.NamedTuple):
+    """Describes the performance of one benchmark.
+
+    Members:
+        name: Name of the benchmark.
+        operations: Number of timed operations.
+        throughput: Operations per second.
+        p50: Median latency of an operation in seconds.
+        p95: 95th percentile latency in seconds.
+        p99: 99th percentile latency in seconds.
+        peak_memory: Peak memory allocated during the benchmark in bytes.
+    """
+    name: str
+    operations: int
+    throughput: float
+    p50: float
+    p95: float
+    p99: float
+    peak_memory: int
+
+
+def synthetic_events(workload: Workload) -> typing.List[_Event]:
+    """Generates events of a workload.
+
+    Identifiers are drawn uniformly, freeze frames hold a mix of ints, floats and strings.
+    """
+    generator = random.Random(workload.seed)
+    session_ids = [uuid.UUID(int=generator.getrandbits(128))
+                   for _ in range(workload.session_count)]
+    severities = list(radar_common.Severity)
+    event_identifiers = [radar_common.EventIdentifier(severities[number % len(severities)],
+                                                      f"benchmark.module_{number % 10}",
+                                                      f"Synthetic event {number}")
+                         for number in range(workload.identifier_count)]
+
+    events: typing.List[_Event] = list()
+    for number in range(workload.event_count):
+        freeze_frame: radar_common.FreezeFrameData = dict()
+        for measurement in range(workload.freeze_frame_size):
+            if measurement % 3 == 0:
+                freeze_frame[f"count_{measurement}"] = number
+            elif measurement % 3 == 1:
+                freeze_frame[f"value_{measurement}"] = generator.random()
+            else:
+                freeze_frame[f"label_{measurement}"] = generator.choice(("train", "test"))
+        events.append((generator.choice(session_ids), generator.choice(event_identifiers),
+                       freeze_frame))
+
+    return events
+
+
+def _filled_database(events: typing.List[_Event]) -> radar_database.RadarDatabase:
+    """Creates an in-memory database holding the given events."""
+    database = radar_database.RadarDatabase()
+    for session_id, event_identifier, freeze_frame in events:
+        database.insert_event(session_id, event_identifier, freeze_frame)
+    return database
+
+
+def _test_client(database: radar_database.RadarDatabase,  # type: ignore
+                 ingestion_queue: typing.Optional[radar_ingestion.IngestionQueue] = None
+                 ) -> typing.Any:
+    """Creates a Flask test client for the API server and frontend."""
+    app = Flask(__name__)
+    app.register_blueprint(radar_api_server.create_api_server_blueprint(
+        database, ingestion_queue=ingestion_queue))
+    app.register_blueprint(radar_frontend.create_frontend_blueprint(database))
+    return app.test_client()  # type: ignore
+
+
+def _insert_event(workload: Workload, events: typing.List[_Event],
+                  directory: str) -> typing.Tuple[_Operation, int]:
+    # pylint: disable=unused-argument
+    database = radar_database.RadarDatabase()
+
+    def operation(number: int) -> None:
+        database.insert_event(*events[number])
+
+    return operation, len(events)
+
+
+def _session_batches(events: typing.List[_Event]) -> typing.List[typing.Tuple[
+        uuid.UUID, typing.List[typing.Tuple[radar_common.EventIdentifier,
+                                            radar_common.FreezeFrameData]]]]:
+    """Splits events into batches of up to _BATCH_SIZE events, as reported by one client each."""
+    session_events: typing.Dict[uuid.UUID, typing.List[
+        typing.Tuple[radar_common.EventIdentifier, radar_common.FreezeFrameData]]] = dict()
+    for session_id, event_identifier, freeze_frame in events:
+        session_events.setdefault(session_id, list()).append((event_identifier, freeze_frame))
+
+    return [(session_id, batch[start:start + _BATCH_SIZE])
+            for session_id, batch in session_events.items()
+            for start in range(0, len(batch), _BATCH_SIZE)]
+
+
+def _insert_events(workload: Workload, events: typing.List[_Event],
+                   directory: str) -> typing.Tuple[_Operation, int]:
+    # pylint: disable=unused-argument
+    database = radar_database.RadarDatabase()
+    batches = _session_batches(events)
+
+    def operation(number: int) -> None:
+        database.insert_events(*batches[number])
+
+    return operation, len(batches)
+
+
+def _event_identifiers(workload: Workload, events: typing.List[_Event],
+                       directory: str) -> typing.Tuple[_Operation, int]:
+    # pylint: disable=unused-argument
+    database = _filled_database(events)
+
+    def operation(number: int) -> None:  # pylint: disable=unused-argument
+        database.event_identifiers()
+
+    return operation, workload.query_count
+
+
+def _event(workload: Workload, events: typing.List[_Event],
+           directory: str) -> typing.Tuple[_Operation, int]:
+    # pylint: disable=unused-argument
+    database = _filled_database(events)
+    event_count = database.event_count()
+
+    def operation(number: int) -> None:
+        database.event(number % event_count)
+
+    return operation, workload.query_count
+
+
+def _save(workload: Workload, events: typing.List[_Event],
+          directory: str) -> typing.Tuple[_Operation, int]:
+    database = _filled_database(events)
+
+    def operation(number: int) -> None:
+        # A new file every time, so saving is never incremental
+        database.save(os.path.join(directory, f"save_{number}.db"))
+
+    return operation, workload.repetitions
+
+
+def _load(workload: Workload, events: typing.List[_Event],
+          directory: str) -> typing.Tuple[_Operation, int]:
+    path = os.path.join(directory, "load.db")
+    _filled_database(events).save(path)
+
+    def operation(number: int) -> None:  # pylint: disable=unused-argument
+        radar_database.RadarDatabase().load(path)
+
+    return operation, workload.repetitions
+
+
+def _api_report_event(workload: Workload, events: typing.List[_Event],
+                      directory: str) -> typing.Tuple[_Operation, int]:
+    # pylint: disable=unused-argument
+    client = _test_client(radar_database.RadarDatabase())  # type: ignore
+    request_bodies = [{"session_id": str(session_id), "event_identifier": event_identifier,
+                       "freeze_frame": freeze_frame}
+                      for session_id, event_identifier, freeze_frame in events]
+
+    def operation(number: int) -> None:
+        client.post("/report_event", json=request_bodies[number])  # type: ignore
+
+    return operation, len(request_bodies)
+
+
+def _api_report_event_queued(workload: Workload, events: typing.List[_Event],
+                             directory: str) -> typing.Tuple[_Operation, int]:
+    # pylint: disable=unused-argument
+    database = radar_database.RadarDatabase()
+    ingestion_queue = radar_ingestion.IngestionQueue(database)
+    client = _test_client(database, ingestion_queue)  # type: ignore
+    request_bodies = [{"session_id": str(session_id), "event_identifier": event_identifier,
+                       "freeze_frame": freeze_frame}
+                      for session_id, event_identifier, freeze_frame in events]
+
+    def operation(number: int) -> None:
+        client.post("/report_event", json=request_bodies[number])  # type: ignore
+
+        # Include writing the queued events in the measurement
+        if number == len(request_bodies) - 1:
+            ingestion_queue.close()
+
+    return operation, len(request_bodies)
+
+
+def _batch_request_bodies(events: typing.List[_Event]
+                          ) -> typing.List[typing.Dict[str, object]]:
+    """Builds /report_events request bodies of up to _BATCH_SIZE events each."""
+    return [{"session_id": str(session_id), "events": batch}
+            for session_id, batch in _session_batches(events)]
+
+
+def _api_report_events(workload: Workload, events: typing.List[_Event],
+                       directory: str) -> typing.Tuple[_Operation, int]:
+    # pylint: disable=unused-argument
+    client = _test_client(radar_database.RadarDatabase())  # type: ignore
+    request_bodies = _batch_request_bodies(events)
+
+    def operation(number: int) -> None:
+        client.post("/report_events", json=request_bodies[number])  # type: ignore
+
+    return operation, len(request_bodies)
+
+
+def _api_report_events_msgpack(workload: Workload, events: typing.List[_Event],
+                               directory: str) -> typing.Tuple[_Operation, int]:
+    # pylint: disable=unused-argument
+    client = _test_client(radar_database.RadarDatabase())  # type: ignore
+    request_bodies = _batch_request_bodies(events)
+
+    def operation(number: int) -> None:
+        client.post("/report_events", content_type=radar_wire_format.MSGPACK,  # type: ignore
+                    data=radar_wire_format.encode(request_bodies[number],
+                                                  radar_wire_format.MSGPACK))
+
+    return operation, len(request_bodies)
+
+
+def _api_event_identifiers(workload: Workload, events: typing.List[_Event],
+                           directory: str) -> typing.Tuple[_Operation, int]:
+    # pylint: disable=unused-argument
+    client = _test_client(_filled_database(events))  # type: ignore
+
+    def operation(number: int) -> None:  # pylint: disable=unused-argument
+        client.get("/event_identifiers")  # type: ignore
+
+    return operation, workload.query_count
+
+
+def _api_event(workload: Workload, events: typing.List[_Event],
+               directory: str) -> typing.Tuple[_Operation, int]:
+    # pylint: disable=unused-argument
+    database = _filled_database(events)
+    event_count = database.event_count()
+    client = _test_client(database)  # type: ignore
+
+    def operation(number: int) -> None:
+        client.get(f"/event/{number % event_count}")  # type: ignore
+
+    return operation, workload.query_count
+
+
+def _frontend_index(workload: Workload, events: typing.List[_Event],
+                    directory: str) -> typing.Tuple[_Operation, int]:
+    # pylint: disable=unused-argument
+    client = _test_client(_filled_database(events))  # type: ignore
+
+    def operation(number: int) -> None:  # pylint: disable=unused-argument
+        client.get("/")  # type: ignore
+
+    return operation, workload.query_count
+
+
+BENCHMARKS: typing.Dict[str, _Benchmark] = {
+    "insert_event": _insert_event,
+    "insert_events": _insert_events,
+    "event_identifiers": _event_identifiers,
+    "event": _event,
+    "save": _save,
+    "load": _load,
+    "api_report_event": _api_report_event,
+    "api_report_event_queued": _api_report_event_queued,
+    "api_report_events": _api_report_events,
+    "api_event_identifiers": _api_event_identifiers,
+    "api_event": _api_event,
+    "frontend_index": _frontend_index,
+}
+
+if radar_wire_format.MSGPACK in radar_wire_format.content_types():
+    BENCHMARKS["api_report_events_msgpack"] = _api_report_events_msgpack
+
+
+def _percentile(sorted_values: typing.Sequence[float], fraction: float) -> float:
+    """Gets a percentile of sorted values by the nearest-rank method."""
+    return sorted_values[max(math.ceil(fraction * len(sorted_values)) - 1, 0)]
+
+
+def run_benchmark(name: str, workload: Workload,
+                  events: typing.Optional[typing.List[_Event]] = None) -> BenchmarkResult:
+    """Runs a single benchmark.
+
+    Args:
+        name: Name of the benchmark, see BENCHMARKS.
+        workload: Workload to run the benchmark with.
+        events: Events of the workload, generated if not given.
+    """
+    if events is None:
+        events = synthetic_events(workload)
+
+    with tempfile.TemporaryDirectory() as directory:
+        operation, operation_count = BENCHMARKS[name](workload, events, directory)
+        latencies: typing.List[float] = list()
+        for number in range(operation_count):
+            start = time.perf_counter()
+            operation(number)
+            latencies.append(time.perf_counter() - start)
+
+    with tempfile.TemporaryDirectory() as directory:
+        operation, operation_count = BENCHMARKS[name](workload, events, directory)
+
+        # Only what the operations allocate is traced, not the prepared state
+        tracemalloc.start()
+        try:
+            for number in range(operation_count):
+                operation(number)
+            peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    latencies.sort()
+    return BenchmarkResult(name, operation_count, operation_count / max(sum(latencies), 1e-9),
+                           _percentile(latencies, 0.5), _percentile(latencies, 0.95),
+                           _percentile(latencies, 0.99), peak_memory)
+
+
+def run_benchmarks(workload: Workload,
+                   names: typing.Optional[typing.Iterable[str]] = None
+                   ) -> typing.List[BenchmarkResult]:
+    """Runs several benchmarks on the same synthetic events.
+
+    Args:
+        workload: Workload to run the benchmarks with.
+        names: Names of the benchmarks to run. Defaults to all.
+    """
+    events = synthetic_events(workload)
+    if names is None:
+        names = BENCHMARKS
+    return [run_benchmark(name, workload, events) for name in names]
+
+
+def compare_with_baseline(results: typing.Iterable[BenchmarkResult],
+                          baseline: typing.Mapping[str, typing.Mapping[str, float]],
+                          tolerance: float = 0.2) -> typing.List[str]:
+    """Compares results with a baseline.
+
+    Args:
+        results: Results of the current run.
+        baseline: Results of an earlier run by benchmark name, as written by save_baseline.
+        tolerance: Relative deviation that is not considered a regression.
+
+    Returns:
+        A description of each regression.
+    """
+    regressions: typing.List[str] = list()
+    for result in results:
+        if result.name not in baseline:
+            continue
+
+        expected = baseline[result.name]
+        if result.throughput < expected["throughput"] * (1.0 - tolerance):
+            regressions.append(f"{result.name}: throughput {result.throughput:.1f}/s is below "
+                               f"baseline {expected['throughput']:.1f}/s")
+        if result.p95 > expected["p95"] * (1.0 + tolerance):
+            regressions.append(f"{result.name}: p95 latency {result.p95 * 1000.0:.3f} ms is above "
+                               f"baseline {expected['p95'] * 1000.0:.3f} ms")
+        if result.peak_memory > expected["peak_memory"] * (1.0 + tolerance):
+            regressions.append(f"{result.name}: peak memory {result.peak_memory} B is above "
+                               f"baseline {expected['peak_memory']:.0f} B")
+
+    return regressions
+
+
+def save_baseline(path: str, workload: Workload,
+                  results: typing.Iterable[BenchmarkResult]) -> None:
+    """Writes results to a JSON file, to compare later runs with them."""
+    with open(path, "w") as baseline_file:
+        json.dump({"workload": workload._asdict(),  # type: ignore
+                   "results": {result.name: result._asdict()  # type: ignore
+                               for result in results}},
+                  baseline_file, indent=2, sort_keys=True)
+
+
+def load_baseline(path: str) -> typing.Tuple[Workload, typing.Dict[str, typing.Dict[str, float]]]:
+    """Reads results written by save_baseline."""
+    with open(path) as baseline_file:
+        baseline = json.load(baseline_file)  # type: ignore
+
+    return Workload(**baseline["workload"]), baseline["results"]  # type: ignore
+
+
+def format_results(results: typing.Iterable[BenchmarkResult]) -> str:
+    """Formats results as a table."""
+    lines = [f"{'benchmark':<24}{'ops':>8}{'ops/s':>12}{'p50 ms':>10}{'p95 ms':>10}"
+             f"{'p99 ms':>10}{'peak MiB':>10}"]
+    for result in results:
+        lines.append(f"{result.name:<24}{result.operations:>8}{result.throughput:>12.1f}"
+                     f"{result.p50 * 1000.0:>10.3f}{result.p95 * 1000.0:>10.3f}"
+                     f"{result.p99 * 1000.0:>10.3f}{result.peak_memory / 2 ** 20:>10.2f}")
+    return "\n".join(lines)
+
+
+def main(argv: typing.Optional[typing.Sequence[str]] = None) -> int:
+    """Runs benchmarks from the command line.
+
+    Returns:
+        1 if a regression compared to the baseline was found, 0 otherwise.
+    """
+    defaults = Workload()
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=defaults.event_count)
+    parser.add_argument("--identifiers", type=int, default=defaults.identifier_count)
+    parser.add_argument("--freeze-frame-size", type=int, default=defaults.freeze_frame_size)
+    parser.add_argument("--sessions", type=int, default=defaults.session_count)
+    parser.add_argument("--queries", type=int, default=defaults.query_count)
+    parser.add_argument("--repetitions", type=int, default=defaults.repetitions)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS),
+                        help="Benchmarks to run. Defaults to all.")
+    parser.add_argument("--baseline", help="Compare with the results in this file.")
+    parser.add_argument("--save-baseline", help="Write the results to this file.")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Relative deviation from the baseline that is not a regression.")
+    arguments = parser.parse_args(argv)
+
+    workload = Workload(arguments.events, arguments.identifiers,  # type: ignore
+                        arguments.freeze_frame_size, arguments.sessions,  # type: ignore
+                        arguments.queries, arguments.repetitions, arguments.seed)  # type: ignore
+    results = run_benchmarks(workload, arguments.only)  # type: ignore
+    print(format_results(results))
+
+    if arguments.save_baseline is not None:  # type: ignore
+        save_baseline(arguments.save_baseline, workload, results)  # type: ignore
+
+    if arguments.baseline is not None:  # type: ignore
+        baseline_workload, baseline = load_baseline(arguments.baseline)  # type: ignore
+        if baseline_workload != workload:
+            print(f"Warning: the baseline was measured with {baseline_workload}.")
+
+        regressions = compare_with_baseline(results, baseline, arguments.tolerance)  # type: ignore
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            return 1
+
+    return 0
+
+
+__all__ = ["Workload", "BenchmarkResult", "BENCHMARKS", "synthetic_events", "run_benchmark",
+           "run_benchmarks", "compare_with_baseline", "save_baseline", "load_baseline",
+           "format_results", "main"]
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,29 +1,225 @@
 """Handles to client->server connection."""
+import json
+import random
+import time
 import typing
 import urllib.parse
 import uuid
 
 import requests
+import requests.adapters
+from urllib3.util import retry
 
-from . import radar_common
+from . import radar_common, radar_compression, radar_spool, radar_wire_format
 
 
-class APIClient:
+class _Aggregate:
+    """Collects the occurrences of one event identifier within an aggregation window."""
+
+    def __init__(self, now: float) -> None:
+        self.count: int = 0
+        self.first_seen: float = now
+        self.last_seen: float = now
+        self.freeze_frames: typing.List[radar_common.FreezeFrameData] = list()
+
+    def add(self, now: float, freeze_frame: radar_common.FreezeFrameData,
+            max_samples: int, rng: random.Random) -> None:
+        """Counts an occurrence and keeps its freeze frame with reservoir sampling."""
+        self.count += 1
+        self.last_seen = now
+        if len(self.freeze_frames) < max_samples:
+            self.freeze_frames.append(freeze_frame)
+            return
+
+        # Every occurrence ends up in the sample with the same probability
+        sample_index = rng.randrange(self.count)
+        if sample_index < max_samples:
+            self.freeze_frames[sample_index] = freeze_frame
+
+    def event(self, event_identifier: radar_common.EventIdentifier) -> radar_common.AggregatedEvent:
+        """Summarizes the collected occurrences as an aggregated event."""
+        return radar_common.AggregatedEvent(event_identifier, self.count, self.first_seen,
+                                            self.last_seen, self.freeze_frames)
+
+
+class RequestEncoder:
+    """Encodes request bodies for a radar server, shared by the blocking and the asyncio client.
+
+    Bodies are encoded as the client's content type, which falls back to JSON if the server does
+    not support it, and compressed if they are large enough.
+    """
+
+    def __init__(self, compression: typing.Optional[str], compression_threshold: int,
+                 content_type: str) -> None:
+        """Checks the encodings.
+
+        Args:
+            compression: Content encoding for large request bodies, or None.
+            compression_threshold: Minimum size in bytes of a compressed request body.
+            content_type: Preferred content type of request bodies.
+
+        Raises:
+            ValueError: If the compression or content type is not supported.
+        """
+        if compression is not None and compression not in radar_compression.ENCODINGS:
+            raise ValueError(f"Unsupported compression {compression}!")
+        if content_type not in radar_wire_format.content_types():
+            raise ValueError(f"Unsupported content type {content_type}!")
+
+        self._compression: typing.Optional[str] = compression
+        self._compression_threshold: int = compression_threshold
+        self._content_type: str = content_type
+
+        #: Whether the server was asked for its content types, which JSON doesn't need
+        self.content_type_confirmed: bool = content_type == radar_wire_format.JSON
+
+    def confirm_content_type(self, server_content_types: typing.Optional[typing.List[str]]) -> None:
+        """Falls back to JSON unless it is listed in the server's version response."""
+        self._content_type = radar_wire_format.negotiate(self._content_type, server_content_types)
+        self.content_type_confirmed = True
+
+    def fall_back(self, status: int) -> bool:
+        """Falls back to JSON if the server could not decode a body.
+
+        Returns:
+            Whether the body was answered with 415 and should be sent again as JSON. It was not
+            stored by the server then.
+        """
+        if status != 415 or self._content_type == radar_wire_format.JSON:
+            return False
+
+        self._content_type = radar_wire_format.JSON
+        return True
+
+    def encode(self, request_body: typing.Mapping[str, object]) -> typing.Tuple[
+            bytes, typing.Dict[str, str]]:
+        """Encodes a request body.
+
+        Returns:
+            The encoded body and its Content-Type and, if compressed, Content-Encoding headers.
+        """
+        data = radar_wire_format.encode(request_body, self._content_type)
+        headers = {"Content-Type": self._content_type}
+        if self._compression is not None and len(data) >= self._compression_threshold:
+            data = radar_compression.compress(data, self._compression)
+            headers["Content-Encoding"] = self._compression
+
+        return data, headers
+
+
+class APIClient:  # pylint: disable=R0902
     """Represents an active connection to a radar server."""
 
-    def __init__(self,
+    def __init__(self,  # pylint: disable=R0913,R0914
                  endpoint_url: str,
-                 session_id: uuid.UUID):
+                 session_id: uuid.UUID,
+                 buffered: bool = False,
+                 max_batch_events: int = 100,
+                 max_batch_bytes: int = 1 << 20,
+                 max_batch_delay: float = 1.0,
+                 aggregation_window: typing.Optional[float] = None,
+                 max_aggregated_samples: int = 10,
+                 pool_size: int = 10,
+                 max_retries: int = 3,
+                 retry_backoff: float = 0.1,
+                 timeout: float = 10.0,
+                 compression: typing.Optional[str] = None,
+                 compression_threshold: int = radar_compression.DEFAULT_THRESHOLD,
+                 content_type: str = radar_wire_format.JSON,
+                 spool: typing.Optional[radar_spool.Spool] = None,
+                 spool_close_timeout: typing.Optional[float] = 10.0):
         """Connects to a radar server.
 
+        Connections are kept alive and reused for all requests. Failed connection attempts and
+        requests answered with 503, e.g. while the server's ingestion queue is full, are retried
+        with exponential backoff. If the last retry is answered with 503 as well, the report is
+        lost and OSError is raised. Reports are not retried otherwise once they reached the
+        server, so events are never stored twice.
+
+        In buffered mode, events are collected and sent together once the buffer holds
+        max_batch_events events, about max_batch_bytes of freeze frame data, or its oldest event
+        is older than max_batch_delay seconds. The delay is only checked when an event is
+        reported or poll is called, so call flush when done reporting.
+
+        In aggregation mode, identical events reported within aggregation_window seconds are
+        sent as a single record. It holds their count, the first and last timestamp and up to
+        max_aggregated_samples randomly sampled freeze frames. The window is checked like the
+        batch delay.
+
+        With compression, request bodies of at least compression_threshold bytes are compressed.
+        Responses are compressed by the server if they are large enough.
+
+        Reports are encoded as content_type. Unless it is JSON, the client asks the server for the
+        content types it supports before the first report, and falls back to JSON if it is not
+        listed, e.g. by servers that predate content negotiation. Reports answered with 415 are
+        sent again as JSON.
+
+        With a spool, reports are appended to it instead of being sent right away, and uploaded
+        from a background thread whenever the server is reachable. Reports left in the spool,
+        e.g. after a crash or a server outage, are uploaded by the next client using it.
+
         Args:
             endpoint_url: URL to send requests to.
             session_id: UUID (self-generated) of the current session.
+            buffered: Whether to send events in batches.
+            max_batch_events: Maximum number of events in a batch.
+            max_batch_bytes: Maximum approximate size of a batch in bytes.
+            max_batch_delay: Maximum time in seconds an event is buffered.
+            aggregation_window: Length of the aggregation window in seconds, or None to
+                report every event on its own.
+            max_aggregated_samples: Maximum number of freeze frames kept per aggregated event.
+            pool_size: Maximum number of connections kept alive.
+            max_retries: Maximum number of retries per request.
+            retry_backoff: Backoff factor in seconds between retries.
+            timeout: Timeout in seconds for connecting and for waiting on a response.
+            compression: Content encoding for large request bodies, "gzip" or "deflate", or None
+                to send them uncompressed.
+            compression_threshold: Minimum size in bytes of a compressed request body.
+            content_type: Encoding of reports, radar_wire_format.JSON or, if msgpack is
+                installed, radar_wire_format.MSGPACK.
+            spool: Spool to append reports to, or None to send them right away.
+            spool_close_timeout: Maximum time in seconds close waits for spooled reports to be
+                uploaded, or None to wait until the server is back.
         """
+        self._encoder = RequestEncoder(compression, compression_threshold, content_type)
         self._endpoint_url: str = endpoint_url
+        self._timeout: float = timeout
+
+        # Radar servers answer 503 before storing anything. A 502 or 504 from a proxy, or a broken
+        # response, may come after the report was stored, so those are not retried.
+        retries: object = retry.Retry(  # type: ignore
+            total=max_retries, read=0, backoff_factor=retry_backoff, status_forcelist=(503,),
+            method_whitelist=frozenset(("GET", "POST")), raise_on_status=False)
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries)
+        self._http: requests.Session = requests.Session()
+        self._http.mount("http://", adapter)
+        self._http.mount("https://", adapter)
+
         self._session_id: uuid.UUID = session_id
         self._has_reported_client_info: bool = False
 
+        self._buffered: bool = buffered
+        self._max_batch_events: int = max_batch_events
+        self._max_batch_bytes: int = max_batch_bytes
+        self._max_batch_delay: float = max_batch_delay
+        self._buffer: typing.List[typing.Tuple[radar_common.EventIdentifier,
+                                               radar_common.FreezeFrameData]] = list()
+        self._buffer_bytes: int = 0
+        self._buffer_start_time: float = 0.0
+
+        self._aggregation_window: typing.Optional[float] = aggregation_window
+        self._max_aggregated_samples: int = max_aggregated_samples
+        self._aggregates: typing.Dict[radar_common.EventIdentifier,
+                                      _Aggregate] = dict()
+        self._aggregation_start_time: float = 0.0
+        self._random = random.Random()  # nosec
+
+        self._spool: typing.Optional[radar_spool.Spool] = spool
+        self._spool_close_timeout: typing.Optional[float] = spool_close_timeout
+        self._spool_uploader: typing.Optional[radar_spool.SpoolUploader] =\
+            radar_spool.SpoolUploader(spool, self.upload) if spool is not None else None
+
     def get_api_version(self) -> typing.Optional[str]:
         """Gets the server's API version."""
         return self._get_version()[0]
@@ -35,10 +231,51 @@ class APIClient:
     def _get_version(self) -> typing.Tuple[str, str]:
         """Gets the server's API and MLRE version."""
         request_url = urllib.parse.urljoin(self._endpoint_url, "version")
-        response: typing.Dict[str, str] = requests.get(request_url).json()
+        response: typing.Dict[str, str] = self._http.get(
+            request_url, timeout=self._timeout).json()
 
         return response['api'], response['mlre']
 
+    def _confirm_content_type(self) -> None:
+        """Falls back to JSON unless the server lists the client's content type as supported."""
+        request_url = urllib.parse.urljoin(self._endpoint_url, "version")
+        response: typing.Dict[str, typing.List[str]] = self._http.get(
+            request_url, timeout=self._timeout).json()
+
+        self._encoder.confirm_content_type(response.get("content_types"))
+
+    def _post(self, path: str, request_body: typing.Mapping[str, object]) -> None:
+        """Posts a request body to the given API path, or appends it to the spool."""
+        if self._spool is not None:
+            self._spool.append((path, request_body))
+            return
+
+        status = self.upload(path, request_body)
+        if status == 503:
+            raise OSError(f"Radar server responded with status {status}.")
+
+    def upload(self, path: str, request_body: typing.Mapping[str, object]) -> int:
+        """Posts a request body to the given API path, compressing it if enabled.
+
+        Args:
+            path: API path, e.g. "report_events".
+            request_body: The request body, which is encoded as the client's content type.
+
+        Returns:
+            The HTTP status code of the response.
+        """
+        if not self._encoder.content_type_confirmed:
+            self._confirm_content_type()
+
+        data, headers = self._encoder.encode(request_body)
+        response = self._http.post(urllib.parse.urljoin(self._endpoint_url, path), data=data,
+                                   headers=headers, timeout=self._timeout)
+
+        if self._encoder.fall_back(response.status_code):
+            return self.upload(path, request_body)
+
+        return response.status_code
+
     def report_client_info(
             self,
             client_info: radar_common.ClientInfo) -> None:
@@ -54,12 +291,8 @@ class APIClient:
             raise ValueError(
                 "This method should only be called once per session.")
 
-        request_url = urllib.parse.urljoin(
-            self._endpoint_url, "report_client_info")
-        request_body = {"session_id": str(self._session_id),
-                        "client_info": client_info}
-
-        requests.post(request_url, json=request_body)
+        self._post("report_client_info", {"session_id": str(self._session_id),
+                                          "client_info": client_info})
 
         # Remember having reported client information
         self._has_reported_client_info = True
@@ -81,12 +314,104 @@ class APIClient:
             raise ValueError(
                 "Make sure to report the client information before reporting any events.")
 
-        request_url = urllib.parse.urljoin(self._endpoint_url, "report_event")
+        if self._aggregation_window is not None:
+            self._aggregate_event(event_identifier, freeze_frame)
+            return
+
+        if self._buffered:
+            self._buffer_event(event_identifier, freeze_frame)
+            return
+
+        self._post("report_event", {"session_id": str(self._session_id),
+                                    "event_identifier": event_identifier,
+                                    "freeze_frame": freeze_frame})
+
+    def _buffer_event(self,
+                      event_identifier: radar_common.EventIdentifier,
+                      freeze_frame: radar_common.FreezeFrameData) -> None:
+        """Adds an event to the buffer and flushes it if any limit is reached."""
+        now = time.monotonic()
+        if not self._buffer:
+            self._buffer_start_time = now
+
+        self._buffer.append((event_identifier, freeze_frame))
+        self._buffer_bytes += len(json.dumps(freeze_frame)) +\
+            len(event_identifier.location) + len(event_identifier.description)
+
+        if len(self._buffer) >= self._max_batch_events or\
+                self._buffer_bytes >= self._max_batch_bytes or\
+                now - self._buffer_start_time >= self._max_batch_delay:
+            self._flush_buffer()
+
+    def _aggregate_event(self,
+                         event_identifier: radar_common.EventIdentifier,
+                         freeze_frame: radar_common.FreezeFrameData) -> None:
+        """Adds an event to its aggregate and sends all aggregates if the window is over."""
+        now = time.time()
+        if not self._aggregates:
+            self._aggregation_start_time = now
+
+        aggregate = self._aggregates.get(event_identifier)
+        if aggregate is None:
+            aggregate = self._aggregates[event_identifier] = _Aggregate(now)
+        aggregate.add(now, freeze_frame,
+                      self._max_aggregated_samples, self._random)
+
+        self.poll()
+
+    def poll(self) -> None:
+        """Sends buffered and aggregated events whose time limit has passed."""
+        if self._buffer and\
+                time.monotonic() - self._buffer_start_time >= self._max_batch_delay:
+            self._flush_buffer()
+
+        if self._aggregates and self._aggregation_window is not None and\
+                time.time() - self._aggregation_start_time >= self._aggregation_window:
+            self._flush_aggregates()
+
+    def flush(self) -> None:
+        """Sends all buffered and aggregated events to the server."""
+        self._flush_buffer()
+        self._flush_aggregates()
+
+    def _flush_aggregates(self) -> None:
+        """Sends all aggregated events to the server."""
+        if not self._aggregates:
+            return
+
+        events = [aggregate.event(event_identifier)
+                  for event_identifier, aggregate in self._aggregates.items()]
+        request_body = {"session_id": str(self._session_id), "events": events}
+
+        # Reset the aggregates first, so a failed request does not send the events twice
+        self._aggregates = dict()
+
+        self._post("report_aggregated_events", request_body)
+
+    def _flush_buffer(self) -> None:
+        """Sends all buffered events to the server."""
+        if not self._buffer:
+            return
+
         request_body = {"session_id": str(self._session_id),
-                        "event_identifier": event_identifier,
-                        "freeze_frame": freeze_frame}
+                        "events": self._buffer}
 
-        requests.post(request_url, json=request_body)
+        # Reset the buffer first, so a failed request does not send the events twice
+        self._buffer = list()
+        self._buffer_bytes = 0
+
+        self._post("report_events", request_body)
+
+    def close(self) -> None:
+        """Sends buffered events and closes all connections.
+
+        With a spool, waits up to spool_close_timeout for the spooled reports to be uploaded.
+        """
+        self.flush()
+        if self._spool is not None and self._spool_uploader is not None:
+            self._spool_uploader.close(self._spool_close_timeout)
+            self._spool.close()
+        self._http.close()
 
 
-__all__ = ["APIClient"]
+__all__ = ["APIClient", "RequestEncoder"]
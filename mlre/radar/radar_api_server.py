@@ -1,80 +1,366 @@
 """Server component for the radar API."""
+import contextlib
+import functools
+import time
 import typing
 import uuid
 
-from flask import Blueprint, request
+from flask import Blueprint, Response, abort, g, make_response, request
 
 import mlre
-from mlre.radar import radar_common, radar_database
+from mlre.radar import (radar_common, radar_compression, radar_database,
+                        radar_ingestion, radar_metrics, radar_wire_format)
+
+# Requests may not decompress to more than this, compressed or not
+_MAX_REQUEST_BYTES = 256 << 20
+
+
+def _parse_severity(value: typing.Optional[str]) -> typing.Optional[radar_common.Severity]:
+    """Parses a severity query parameter given by name or number."""
+    if value is None:
+        return None
+
+    try:
+        if value.isdigit():
+            return radar_common.Severity(int(value))
+        return radar_common.Severity[value.upper()]
+    except (KeyError, ValueError):
+        abort(400, f"Unknown severity {value}.")
+        raise  # abort always raises, this is for pylint
+
+
+def _parse_session_id(value: typing.Optional[str]) -> typing.Optional[uuid.UUID]:
+    """Parses a session id query parameter."""
+    if value is None:
+        return None
+
+    try:
+        return uuid.UUID(value)
+    except ValueError:
+        abort(400, f"Invalid session id {value}.")
+        raise  # abort always raises, this is for pylint
+
+
+def _request_body() -> object:
+    """Decodes the request body according to its Content-Type and Content-Encoding.
+
+    Bodies without a content type are decoded as JSON.
+    """
+    content_type = request.mimetype or radar_wire_format.JSON
+    if content_type not in radar_wire_format.content_types():
+        abort(415, f"Unsupported content type {content_type}.")
+
+    encoding = request.headers.get('Content-Encoding', 'identity').strip().lower()
+    if encoding not in radar_compression.ENCODINGS + ("identity",):
+        abort(415, f"Unsupported content encoding {encoding}.")
+
+    try:
+        body: object = radar_wire_format.decode(radar_compression.decompress(
+            request.get_data(), encoding, _MAX_REQUEST_BYTES), content_type)
+        return body
+    except ValueError as error:
+        abort(400, str(error))
+        raise  # abort always raises, this is for pylint
+
+
+@contextlib.contextmanager  # type: ignore
+def _malformed_reports() -> typing.Iterator[None]:
+    """Answers 400 instead of 500 if a report can't be decoded into the expected types."""
+    try:
+        yield
+    except (AttributeError, IndexError, KeyError, TypeError, ValueError) as error:
+        abort(400, f"Malformed report: {error}")
+
+
+def _array(value: object) -> typing.Sequence[object]:
+    """Checks that a decoded value is an array."""
+    if not isinstance(value, (list, tuple)):  # type: ignore
+        raise TypeError("Expected an array.")
+    return typing.cast(typing.Sequence[object], value)
+
+
+def _fields(value: object, count: int) -> typing.Sequence[object]:
+    """Checks that a decoded value is an array with the given number of fields."""
+    fields = _array(value)
+    if len(fields) != count:
+        raise ValueError(f"Expected an array of {count} fields.")
+    return fields
+
+
+def _string_keys(value: object) -> bool:
+    """Checks that a decoded value is an object with string keys."""
+    return isinstance(value, dict) and all(isinstance(key, str) for key in value)  # type: ignore
+
+
+def _report(value: object) -> typing.Mapping[str, object]:
+    """Validates the request body of a report."""
+    if not _string_keys(value):
+        raise TypeError("Reports have to be objects.")
+    return typing.cast(typing.Mapping[str, object], value)
+
+
+def _session_id(value: object) -> uuid.UUID:
+    """Decodes and validates the session id of a report."""
+    if not isinstance(value, str):
+        raise TypeError("Session ids have to be strings.")
+    return uuid.UUID(value)
+
+
+def _event_identifier(value: object) -> radar_common.EventIdentifier:
+    """Decodes and validates the event identifier of a report."""
+    severity, location, description = _fields(value, 3)
+    if not isinstance(severity, int) or not isinstance(location, str) or\
+            not isinstance(description, str):
+        raise TypeError("Event identifiers have to be a severity number and two strings.")
+    return radar_common.EventIdentifier(radar_common.Severity(severity), location, description)
+
+
+def _freeze_frame(value: object) -> radar_common.FreezeFrameData:
+    """Validates the freeze frame of a report."""
+    if not _string_keys(value):
+        raise TypeError("Freeze frames have to be objects with string keys.")
+    return typing.cast(radar_common.FreezeFrameData, value)
+
+
+def _aggregated_event(value: object) -> radar_common.AggregatedEvent:
+    """Decodes and validates an aggregated event of a report."""
+    event_identifier, count, first_seen, last_seen, freeze_frames = _fields(value, 5)
+    # bool is a subclass of int, but is no count
+    if not isinstance(count, int) or isinstance(count, bool) or count < 0:
+        raise ValueError("Occurrence counts have to be non-negative integers.")
+    if not isinstance(first_seen, (int, float)) or not isinstance(last_seen, (int, float)):
+        raise TypeError("First and last seen have to be timestamps.")
+    return radar_common.AggregatedEvent(
+        _event_identifier(event_identifier), count, first_seen, last_seen,
+        [_freeze_frame(freeze_frame) for freeze_frame in _array(freeze_frames)])
+
+
+def _client_info(value: object) -> radar_common.ClientInfo:
+    """Decodes and validates the client information of a report."""
+    hostname, environment_variables = _fields(value, 2)
+    if not isinstance(hostname, str) or not _string_keys(environment_variables):
+        raise TypeError("Client information has to be a hostname and an object of variables.")
+    return radar_common.ClientInfo(
+        hostname, typing.cast(typing.Dict[str, str], environment_variables))
+
+
+def _queued(accepted: bool) -> typing.Tuple[str, int]:
+    """Acknowledges a queued report, or asks the client to retry later if the queue is full."""
+    if not accepted:
+        abort(Response("The ingestion queue is full, retry later.", 503,
+                       headers={'Retry-After': '1'}))
+    return '', 202
 
 
 # type: ignore
-def create_api_server_blueprint(database: radar_database.RadarDatabase) -> Blueprint:
+def create_api_server_blueprint(  # pylint: disable=R0914,R0915
+        database: radar_database.RadarDatabase,
+        metrics: typing.Optional[radar_metrics.MetricsRegistry] = None,
+        compression_threshold: int = radar_compression.DEFAULT_THRESHOLD,
+        ingestion_queue: typing.Optional[radar_ingestion.IngestionQueue] = None) -> Blueprint:
     """Creates an instance of the API server.
 
+    Request bodies are decoded according to their Content-Type and Content-Encoding. Event
+    queries are answered in the content type the client prefers, JSON by default, and compressed
+    if the client accepts it.
+
+    Reports are validated before they are written or queued, and malformed reports are answered
+    with 400. With an ingestion queue, reports are acknowledged with 202 once queued, and written
+    to the database in batches. While the queue is full, reports are answered with 503 and a
+    Retry-After header.
+
     Args:
         database: An instance of the radar event and client info database.
+        metrics: Registry to record request metrics in and to serve at /metrics. Pass the
+            database's registry to serve its metrics, too. Defaults to a new registry.
+        compression_threshold: Minimum size in bytes of a compressed response body.
+        ingestion_queue: Queue that writes reports to the same database. If None, reports
+            are inserted into the database before they are acknowledged.
     """
     api_server = Blueprint(__name__, __name__)
 
+    def negotiated(view: typing.Callable[..., typing.Any]  # type: ignore
+                   ) -> typing.Callable[..., Response]:
+        """Encodes the results of a view as the client prefers, and compresses them."""
+        @functools.wraps(view)  # type: ignore
+        def wrapper(*args: typing.Any, **kwargs: typing.Any) -> Response:  # type: ignore
+            result: object = view(*args, **kwargs)  # type: ignore
+
+            # JSON comes first, so it wins if the client accepts anything
+            content_type = request.accept_mimetypes.best_match(
+                radar_wire_format.content_types(), radar_wire_format.JSON)
+            response: Response
+            if content_type == radar_wire_format.JSON:
+                response = make_response(result)
+            else:
+                response = Response(radar_wire_format.encode(result, content_type),
+                                    content_type=content_type)
+            response.vary.add('Accept')  # type: ignore
+            response.vary.add('Accept-Encoding')  # type: ignore
+
+            encoding = request.accept_encodings.best_match(radar_compression.ENCODINGS)
+            if encoding is not None and response.status_code == 200 and\
+                    (response.content_length or 0) >= compression_threshold:
+                response.set_data(radar_compression.compress(response.get_data(), encoding))
+                response.headers['Content-Encoding'] = encoding
+
+            return response
+
+        return wrapper  # type: ignore
+
+    registry = metrics if metrics is not None else radar_metrics.MetricsRegistry()
+    requests_total = registry.counter(
+        "radar_http_requests_total", "Number of handled HTTP requests.",
+        ("endpoint", "method", "status"))
+    request_seconds = registry.histogram(
+        "radar_http_request_duration_seconds", "Time to handle an HTTP request.",
+        ("endpoint",))
+    request_bytes = registry.histogram(
+        "radar_http_request_size_bytes", "Size of HTTP request bodies.",
+        ("endpoint",), radar_metrics.DEFAULT_SIZE_BUCKETS)
+    response_bytes = registry.histogram(
+        "radar_http_response_size_bytes", "Size of HTTP response bodies.",
+        ("endpoint",), radar_metrics.DEFAULT_SIZE_BUCKETS)
+
+    @api_server.before_request  # type: ignore
+    def start_timer() -> None:  # type: ignore  # pylint: disable=W0612
+        g.radar_request_start = time.perf_counter()  # type: ignore
+
+    @api_server.after_request  # type: ignore
+    def record_request(response: Response) -> Response:  # type: ignore  # pylint: disable=W0612
+        # Label by URL rule instead of URL, so event indices don't create new time series
+        url_rule = request.url_rule  # type: ignore
+        endpoint: str = url_rule.rule if url_rule is not None else "unknown"  # type: ignore
+        requests_total.inc((endpoint, request.method, str(response.status_code)))
+        start: float = g.radar_request_start  # type: ignore
+        request_seconds.observe(time.perf_counter() - start, (endpoint,))
+        request_bytes.observe(request.content_length or 0, (endpoint,))
+        response_bytes.observe(response.content_length or 0, (endpoint,))
+        return response
+
+    @api_server.route('/metrics')  # type: ignore
+    def get_metrics() -> Response:  # pylint: disable=W0612
+        """Give server metrics in the Prometheus text format."""
+        return Response(registry.render(), content_type=radar_metrics.CONTENT_TYPE)
+
     @api_server.route('/version')  # type: ignore
-    def get_version() -> typing.Dict[str, str]:  # pylint: disable=W0612
-        """Give api server and mlre versions."""
-        return {'api': '1', 'mlre': mlre.__version__}
+    def get_version() -> typing.Dict[str, object]:  # pylint: disable=W0612
+        """Give api server and mlre versions, and the content types reports may be sent in."""
+        return {'api': '1', 'mlre': mlre.__version__,
+                'content_types': list(radar_wire_format.content_types())}
 
     @api_server.route('/report_event', methods=['POST'])  # type: ignore
-    def report_event() -> str:  # pylint: disable=W0612
+    def report_event() -> typing.Union[str, typing.Tuple[str, int]]:  # pylint: disable=W0612
         # Decode request
-        request_json = request.json  # type: ignore
-        session_id: uuid.UUID = uuid.UUID(
-            request_json['session_id'])  # type: ignore
-        event_identifier: radar_common.EventIdentifier =\
-            radar_common.EventIdentifier(
-                *request_json['event_identifier'])  # type: ignore
-
-        freeze_frame: radar_common.FreezeFrameData =\
-            request_json['freeze_frame']  # type: ignore
+        with _malformed_reports():
+            report = _report(_request_body())
+            session_id = _session_id(report['session_id'])
+            event_identifier = _event_identifier(report['event_identifier'])
+            freeze_frame = _freeze_frame(report['freeze_frame'])
 
         # Make database call
+        if ingestion_queue is not None:
+            return _queued(ingestion_queue.insert_event(session_id, event_identifier,
+                                                        freeze_frame))
         database.insert_event(session_id, event_identifier, freeze_frame)
         return ''
 
+    @api_server.route('/report_events', methods=['POST'])  # type: ignore
+    def report_events() -> typing.Union[str, typing.Tuple[str, int]]:  # pylint: disable=W0612
+        # Decode request
+        with _malformed_reports():
+            report = _report(_request_body())
+            session_id = _session_id(report['session_id'])
+            events = [(_event_identifier(event_identifier), _freeze_frame(freeze_frame))
+                      for event_identifier, freeze_frame in (_fields(event, 2)
+                                                             for event in _array(report['events']))]
+
+        # Make database call
+        if ingestion_queue is not None:
+            return _queued(ingestion_queue.insert_events(session_id, events))
+        database.insert_events(session_id, events)
+        return ''
+
+    @api_server.route('/report_aggregated_events', methods=['POST'])  # type: ignore
+    # pylint: disable=W0612
+    def report_aggregated_events() -> typing.Union[str, typing.Tuple[str, int]]:
+        # Decode request
+        with _malformed_reports():
+            report = _report(_request_body())
+            session_id = _session_id(report['session_id'])
+            aggregated_events = [_aggregated_event(aggregated_event)
+                                 for aggregated_event in _array(report['events'])]
+
+        # Make database call
+        if ingestion_queue is not None:
+            return _queued(ingestion_queue.insert_aggregated_events(session_id,
+                                                                    aggregated_events))
+        database.insert_aggregated_events(session_id, aggregated_events)
+        return ''
+
     @api_server.route('/report_client_info', methods=['POST'])  # type: ignore
-    def report_client_info() -> str:  # pylint: disable=W0612
+    def report_client_info() -> typing.Union[str, typing.Tuple[str, int]]:  # pylint: disable=W0612
         # Decode request
-        request_json = request.json  # type: ignore
-        session_id: uuid.UUID = uuid.UUID(
-            request_json['session_id'])  # type: ignore
-        client_info: radar_common.ClientInfo =\
-            radar_common.ClientInfo(
-                *request_json['client_info'])  # type: ignore
+        with _malformed_reports():
+            report = _report(_request_body())
+            session_id = _session_id(report['session_id'])
+            client_info = _client_info(report['client_info'])
 
         # Make database call
+        if ingestion_queue is not None:
+            return _queued(ingestion_queue.insert_client_info(session_id, client_info))
         database.insert_client_info(session_id, client_info)
         return ''
 
     @api_server.route('/event_identifiers')  # type: ignore
+    @negotiated  # type: ignore
+    # type: ignore
     # pylint: disable=W0612
     def event_identifiers() ->\
             typing.Dict[str,
-                        typing.Sequence[
+                        typing.Union[typing.Optional[int], typing.Sequence[
                             typing.Mapping[str,
-                                           typing.Union[int, radar_common.EventIdentifier]]]]:
+                                           typing.Union[int, radar_common.EventIdentifier]]]]]:
+        limit: typing.Optional[int] = request.args.get('limit', type=int)  # type: ignore
+        identifiers = database.event_identifiers(
+            severity=_parse_severity(request.args.get('severity')),  # type: ignore
+            location_prefix=request.args.get('location_prefix'),  # type: ignore
+            description=request.args.get('description'),  # type: ignore
+            session_id=_parse_session_id(
+                request.args.get('session_id')),  # type: ignore
+            after=request.args.get('cursor', -1, type=int),  # type: ignore
+            limit=limit)
         response_data = [{"event_index": event_index, "event_identifier": event_identifier}
-                         for event_index, event_identifier in database.event_identifiers()]
-        return {"event_identifiers": response_data}  # type: ignore
+                         for event_index, event_identifier in identifiers]
+
+        # A full page means there may be more, continue after its last event
+        next_cursor = identifiers[-1][0]\
+            if limit is not None and identifiers and len(identifiers) >= limit else None
+        return {"event_identifiers": response_data,  # type: ignore
+                "next_cursor": next_cursor}
 
     @api_server.route('/event/<event_index>')  # type: ignore
+    @negotiated  # type: ignore
+    # type: ignore
     # pylint: disable=W0612
     def event(event_index: int) ->  \
             typing.Dict[str,
                         typing.Union[radar_common.EventIdentifier,
+                                     typing.Optional[int],
                                      typing.Sequence[typing.Tuple[uuid.UUID,
                                                                   radar_common.FreezeFrameData]]]]:
+        offset: int = request.args.get('offset', 0, type=int)  # type: ignore
+        limit: typing.Optional[int] = request.args.get('limit', type=int)  # type: ignore
+
+        event_identifier, freeze_frames = database.event(
+            int(event_index), offset=offset, limit=limit,
+            session_id=_parse_session_id(request.args.get('session_id')))  # type: ignore
 
-        event_identifier, freeze_frames = database.event(int(event_index))
+        next_offset = offset + len(freeze_frames)\
+            if limit is not None and len(freeze_frames) >= limit else None
         # type: ignore
-        return {"event_identifier": event_identifier, "freeze_frames": freeze_frames}
+        return {"event_identifier": event_identifier, "freeze_frames": freeze_frames,
+                "next_offset": next_offset}
 
     return api_server
 
@@ -1,15 +1,34 @@
 """Entry point for hosting the radar app with API and frontend."""
+import atexit
+import os
+
 from flask import Flask
 
-from mlre.radar import radar_api_server, radar_database, radar_frontend
+from mlre.radar import (radar_api_server, radar_database, radar_frontend,
+                        radar_ingestion, radar_metrics, radar_sqlite_storage)
 
 
 def create_default_app() -> Flask:
-    """Creates an app instance with the default configuration."""
-    database = radar_database.RadarDatabase()
+    """Creates an app instance with the default configuration.
+
+    If the environment variable RADAR_DATABASE is set, the data is stored in an SQLite database
+    at that path. Otherwise, it is kept in memory. Server and database metrics are served at
+    /metrics. Reports are written to the database in batches by an ingestion queue, which is
+    drained when the interpreter exits.
+    """
+    metrics = radar_metrics.MetricsRegistry()
+    if 'RADAR_DATABASE' in os.environ.keys():
+        database = radar_database.RadarDatabase(
+            radar_sqlite_storage.SQLiteStorageBackend(os.environ['RADAR_DATABASE']), metrics)
+    else:
+        database = radar_database.RadarDatabase(metrics=metrics)
+
+    ingestion_queue = radar_ingestion.IngestionQueue(database, metrics=metrics)
+    atexit.register(ingestion_queue.close)
+
     app = Flask(__name__)
-    app.register_blueprint(
-        radar_api_server.create_api_server_blueprint(database))
+    app.register_blueprint(radar_api_server.create_api_server_blueprint(
+        database, metrics, ingestion_queue=ingestion_queue))
     app.register_blueprint(radar_frontend.create_frontend_blueprint(database))
     return app
 
@@ -0,0 +1,183 @@
+"""Handles to client->server connection for asyncio applications.
+
+This module requires aiohttp, which is installed with the "async" extra.
+"""
+import asyncio
+import typing
+import urllib.parse
+import uuid
+
+import aiohttp
+
+from . import (radar_api_client, radar_common, radar_compression,
+               radar_wire_format)
+
+
+class AsyncAPIClient:  # pylint: disable=R0902
+    """Represents an active, non-blocking connection to a radar server.
+
+    The client can be used as an async context manager, which closes it on exit.
+    """
+
+    def __init__(self,  # pylint: disable=R0913
+                 endpoint_url: str,
+                 session_id: uuid.UUID,
+                 pool_size: int = 100,
+                 timeout: float = 10.0,
+                 compression: typing.Optional[str] = None,
+                 compression_threshold: int = radar_compression.DEFAULT_THRESHOLD,
+                 content_type: str = radar_wire_format.JSON,
+                 max_retries: int = 3,
+                 retry_backoff: float = 0.1):
+        """Connects to a radar server.
+
+        Requests answered with 503, e.g. while the server's ingestion queue is full, are retried
+        with exponential backoff, or after the delay the server asks for with Retry-After. If
+        the last retry is answered with 503 as well, the report is lost and OSError is raised.
+
+        With compression, request bodies of at least compression_threshold bytes are compressed.
+        Reports are encoded as content_type. Unless it is JSON, the client asks the server for the
+        content types it supports before the first report, and falls back to JSON if it is not
+        listed, e.g. by servers that predate content negotiation. Reports answered with 415 are
+        sent again as JSON.
+
+        Args:
+            endpoint_url: URL to send requests to.
+            session_id: UUID (self-generated) of the current session.
+            pool_size: Maximum number of simultaneous connections.
+            timeout: Timeout in seconds for a whole request.
+            compression: Content encoding for large request bodies, "gzip" or "deflate", or None
+                to send them uncompressed.
+            compression_threshold: Minimum size in bytes of a compressed request body.
+            content_type: Encoding of reports, radar_wire_format.JSON or, if msgpack is
+                installed, radar_wire_format.MSGPACK.
+            max_retries: Maximum number of retries per request.
+            retry_backoff: Backoff factor in seconds between retries.
+        """
+        self._encoder = radar_api_client.RequestEncoder(
+            compression, compression_threshold, content_type)
+        self._endpoint_url: str = endpoint_url
+        self._session_id: uuid.UUID = session_id
+        self._has_reported_client_info: bool = False
+
+        self._pool_size: int = pool_size
+        self._timeout: float = timeout
+        self._max_retries: int = max_retries
+        self._retry_backoff: float = retry_backoff
+        self._http: typing.Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self) -> "AsyncAPIClient":
+        return self
+
+    async def __aexit__(self, exc_type: type,  # type: ignore
+                        exc_val: Exception,
+                        exc_tb: typing.Any) -> None:
+        await self.close()
+
+    def _session(self) -> aiohttp.ClientSession:
+        """Gets the HTTP session, which has to be created inside the running event loop."""
+        if self._http is None:
+            self._http = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self._pool_size),
+                timeout=aiohttp.ClientTimeout(total=self._timeout))
+
+        return self._http
+
+    async def get_api_version(self) -> typing.Optional[str]:
+        """Gets the server's API version."""
+        return (await self._get_version())[0]
+
+    async def get_mlre_version(self) -> typing.Optional[str]:
+        """Gets the server's MLRE version."""
+        return (await self._get_version())[1]
+
+    async def _get_version(self) -> typing.Tuple[str, str]:
+        """Gets the server's API and MLRE version."""
+        request_url = urllib.parse.urljoin(self._endpoint_url, "version")
+        async with self._session().get(request_url) as response:
+            response_json: typing.Dict[str, str] = await response.json()  # type: ignore
+
+        return response_json['api'], response_json['mlre']
+
+    async def _confirm_content_type(self) -> None:
+        """Falls back to JSON unless the server lists the client's content type as supported."""
+        request_url = urllib.parse.urljoin(self._endpoint_url, "version")
+        async with self._session().get(request_url) as response:
+            response_json: typing.Dict[str, typing.List[str]] = \
+                await response.json()  # type: ignore
+
+        self._encoder.confirm_content_type(response_json.get("content_types"))
+
+    async def _post(self, path: str, request_body: typing.Mapping[str, object]) -> None:
+        """Posts a request body to the given API path, compressing it if enabled."""
+        if not self._encoder.content_type_confirmed:
+            await self._confirm_content_type()
+
+        data, headers = self._encoder.encode(request_body)
+        status = await self._send(urllib.parse.urljoin(self._endpoint_url, path), data, headers)
+        if self._encoder.fall_back(status):
+            await self._post(path, request_body)
+        elif status == 503:
+            raise OSError(f"Radar server responded with status {status}.")
+
+    async def _send(self, request_url: str, data: bytes,
+                    headers: typing.Mapping[str, str]) -> int:
+        """Posts data, retrying it while the server answers 503, and gives the last status."""
+        for attempt in range(self._max_retries + 1):
+            async with self._session().post(request_url, data=data, headers=headers) as response:
+                status = response.status
+                retry_after: str = response.headers.get("Retry-After", "")  # type: ignore
+            if status != 503 or attempt == self._max_retries:
+                break
+
+            # Radar servers answer 503 before storing anything, so the report can be sent again
+            await asyncio.sleep(float(retry_after) if retry_after.isdigit()
+                                else self._retry_backoff * (1 << attempt))
+
+        return status
+
+    async def report_client_info(self, client_info: radar_common.ClientInfo) -> None:
+        """Reports information about the client to the server.
+
+        This method should only be called once per session, and before
+        any events are reported.
+
+        Args:
+            client_info: Client information object.
+        """
+        if self._has_reported_client_info:
+            raise ValueError(
+                "This method should only be called once per session.")
+
+        await self._post("report_client_info", {"session_id": str(self._session_id),
+                                                "client_info": client_info})
+
+        # Remember having reported client information
+        self._has_reported_client_info = True
+
+    async def report_event(self, event_identifier: radar_common.EventIdentifier,
+                           freeze_frame: radar_common.FreezeFrameData) -> None:
+        """Reports an event to the server.
+
+        Make sure to report the client information before reporting any events.
+
+        Args:
+            event_identifier: Unique identifier of the event.
+            freeze_frame: A dictionary of helpful measurements.
+        """
+        if not self._has_reported_client_info:
+            raise ValueError(
+                "Make sure to report the client information before reporting any events.")
+
+        await self._post("report_event", {"session_id": str(self._session_id),
+                                          "event_identifier": event_identifier,
+                                          "freeze_frame": freeze_frame})
+
+    async def close(self) -> None:
+        """Closes all connections."""
+        if self._http is not None:
+            await self._http.close()
+            self._http = None
+
+
+__all__ = ["AsyncAPIClient"]
@@ -0,0 +1,65 @@
+"""Radar session object for asyncio applications.
+
+This module requires aiohttp, which is installed with the "async" extra.
+"""
+import typing
+import uuid
+
+from mlre.radar import radar_async_api_client, radar_session, radar_wire_format
+
+
+class AsyncRadarSession:
+    """Radar session object, to be used by asyncio clients with "async with"."""
+
+    def __init__(self,
+                 environment_allowlist: typing.Optional[typing.Iterable[str]] = None,
+                 environment_denylist: typing.Optional[typing.Iterable[str]] = None,
+                 compression: typing.Optional[str] = None,
+                 content_type: str = radar_wire_format.JSON):
+        """Configures the radar session.
+
+        Args:
+            environment_allowlist: If set, only environment variables matching one of these
+                shell-style patterns are reported, e.g. "CUDA_*".
+            environment_denylist: Environment variables matching one of these shell-style
+                patterns are not reported.
+            compression: If set, large reports are compressed with this content encoding,
+                "gzip" or "deflate".
+            content_type: Encoding of reports, e.g. radar_wire_format.MSGPACK for MessagePack.
+        """
+        self._environment_allowlist: typing.Optional[typing.List[str]] =\
+            radar_session.environment_patterns(environment_allowlist)
+        self._environment_denylist: typing.Optional[typing.List[str]] =\
+            radar_session.environment_patterns(environment_denylist)
+        self._compression: typing.Optional[str] = compression
+        self._content_type: str = content_type
+
+    async def __aenter__(self) -> None:
+        """Creates a radar session by entering its context."""
+        self.session_id = uuid.uuid4()  # pylint: disable=W0201
+
+        self.api_client =\
+            radar_async_api_client.AsyncAPIClient(  # pylint: disable=W0201
+                radar_session.server_endpoint(), self.session_id,
+                compression=self._compression, content_type=self._content_type)
+
+        # Report client info
+        client_info = radar_session.RadarSession.collect_client_info(
+            self._environment_allowlist, self._environment_denylist)
+        await self.api_client.report_client_info(client_info)
+
+        # Report that the session has started
+        await self.api_client.report_event(
+            radar_session.lifecycle_event(__name__, "Session started"), {})
+
+    async def __aexit__(self, exc_type: type,  # type: ignore
+                        exc_val: Exception,
+                        exc_tb: typing.Any) -> None:
+
+        # Report that the session has ended
+        await self.api_client.report_event(
+            radar_session.lifecycle_event(__name__, "Session ended"), {})
+        await self.api_client.close()
+
+
+__all__ = ["AsyncRadarSession"]
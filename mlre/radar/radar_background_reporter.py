@@ -0,0 +1,134 @@
+"""Reports events to a radar server from a background thread."""
+import enum
+import logging
+import queue
+import threading
+import typing
+
+from mlre.radar import radar_api_client, radar_common
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class QueueFullPolicy(enum.Enum):
+    """Describes what happens to an event that is reported while the queue is full."""
+
+    BLOCK: int = enum.auto()  # pragma: no mutate
+    DROP: int = enum.auto()  # pragma: no mutate
+
+
+class _Command(enum.Enum):
+    """Queue items that are not reports."""
+
+    FLUSH: int = enum.auto()  # pragma: no mutate
+    STOP: int = enum.auto()  # pragma: no mutate
+
+
+_QueueItem = typing.Union[_Command,
+                          radar_common.ClientInfo,
+                          typing.Tuple[radar_common.EventIdentifier,
+                                       radar_common.FreezeFrameData]]
+
+
+class BackgroundReporter:
+    """Queues reports in memory and sends them from a worker thread.
+
+    Reporting only enqueues, so callers are not blocked by network I/O. Freeze frames are sent
+    later and must not be modified after reporting. Failed requests are logged and skipped.
+    """
+
+    def __init__(self,
+                 api_client: radar_api_client.APIClient,
+                 max_queue_size: int = 10000,
+                 queue_full_policy: QueueFullPolicy = QueueFullPolicy.DROP,
+                 poll_interval: float = 0.1):
+        """Starts the worker thread.
+
+        Args:
+            api_client: Client used by the worker thread to send reports.
+            max_queue_size: Maximum number of queued reports.
+            queue_full_policy: Whether to block or to drop events while the queue is full.
+            poll_interval: Time in seconds between checks for due batches while idle.
+        """
+        self._api_client: radar_api_client.APIClient = api_client
+        self._queue: "queue.Queue[_QueueItem]" = queue.Queue(max_queue_size)
+        self._queue_full_policy: QueueFullPolicy = queue_full_policy
+        self._poll_interval: float = poll_interval
+        self.dropped_events: int = 0
+
+        self._thread = threading.Thread(
+            target=self._run, name="radar-reporter", daemon=True)
+        self._thread.start()
+
+    def report_client_info(self, client_info: radar_common.ClientInfo) -> None:
+        """Queues client information. Blocks while the queue is full.
+
+        Args:
+            client_info: Client information object.
+        """
+        self._queue.put(client_info)
+
+    def report_event(self, event_identifier: radar_common.EventIdentifier,
+                     freeze_frame: radar_common.FreezeFrameData) -> None:
+        """Queues an event. If the queue is full, blocks or drops the event depending on policy.
+
+        Args:
+            event_identifier: Unique identifier of the event.
+            freeze_frame: A dictionary of helpful measurements.
+        """
+        if self._queue_full_policy is QueueFullPolicy.BLOCK:
+            self._queue.put((event_identifier, freeze_frame))
+            return
+
+        try:
+            self._queue.put_nowait((event_identifier, freeze_frame))
+        except queue.Full:
+            self.dropped_events += 1
+
+    def flush(self) -> None:
+        """Blocks until all queued reports are sent."""
+        self._queue.put(_Command.FLUSH)
+        self._queue.join()
+
+    def close(self) -> None:
+        """Sends all queued reports, stops the worker thread and closes the API client."""
+        self._queue.put(_Command.STOP)
+        self._thread.join()
+
+    def _run(self) -> None:
+        """Sends queued reports until stopped."""
+        while True:
+            try:
+                item = self._queue.get(timeout=self._poll_interval)
+            except queue.Empty:
+                # Batches and aggregates are also due when no new events arrive
+                self._send(self._api_client.poll)
+                continue
+
+            try:
+                if item is _Command.STOP:
+                    self._send(self._api_client.close)
+                    return
+
+                if item is _Command.FLUSH:
+                    self._send(self._api_client.flush)
+                elif isinstance(item, radar_common.ClientInfo):
+                    self._send(self._api_client.report_client_info, item)
+                else:
+                    self._send(self._api_client.report_event, *item)
+            finally:
+                self._queue.task_done()
+
+    @staticmethod
+    def _send(method: typing.Callable[..., None], *args: object) -> None:  # type: ignore
+        """Calls an API client method, logging instead of raising errors.
+
+        The worker must survive errors, otherwise flush would wait forever.
+        """
+        try:
+            method(*args)
+        except Exception:  # pylint: disable=broad-except
+            _LOGGER.exception("Failed to report to radar server.")
+
+
+__all__ = ["BackgroundReporter", "QueueFullPolicy"]
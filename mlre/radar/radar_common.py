@@ -38,4 +38,47 @@ class ClientInfo(typing.NamedTuple):
 FreezeFrameMeasurement = typing.Union[str, int, float]
 FreezeFrameData = typing.Dict[str, FreezeFrameMeasurement]
 
-__all__ = ["Severity", "EventIdentifier"]
+
+class AggregatedEvent(typing.NamedTuple):
+    """Summarizes repeated occurrences of the same event.
+
+    Members:
+        event_identifier: Unique identifier of the event.
+        count: How often the event occurred.
+        first_seen: UNIX timestamp of the first occurrence.
+        last_seen: UNIX timestamp of the last occurrence.
+        freeze_frames: A sample of the occurrences' freeze frames.
+    """
+    event_identifier: EventIdentifier
+    count: int  # type: ignore
+    first_seen: float
+    last_seen: float
+    freeze_frames: typing.List[FreezeFrameData]
+
+
+class EventStatistics(typing.NamedTuple):
+    """Describes all occurrences of an event, including those without stored freeze frames.
+
+    Members:
+        count: How often the event occurred.
+        first_seen: UNIX timestamp of the first occurrence, if known.
+        last_seen: UNIX timestamp of the last occurrence, if known.
+    """
+    count: int  # type: ignore
+    first_seen: typing.Optional[float]
+    last_seen: typing.Optional[float]
+
+
+class FreezeFrameSummary(typing.NamedTuple):
+    """Describes the stored freeze frames of an event.
+
+    Members:
+        count: Number of stored freeze frames.
+        session_count: Number of distinct sessions the stored freeze frames come from.
+    """
+    count: int  # type: ignore
+    session_count: int
+
+
+__all__ = ["Severity", "EventIdentifier", "AggregatedEvent", "EventStatistics",
+           "FreezeFrameSummary"]
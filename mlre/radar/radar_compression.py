@@ -0,0 +1,70 @@
+"""Compression of radar API request and response bodies.
+
+Bodies are compressed with gzip or deflate and marked with the HTTP Content-Encoding header.
+"""
+import gzip
+import typing
+import zlib
+
+#: Content encodings supported by the radar API, in order of preference
+ENCODINGS: typing.Tuple[str, ...] = ("gzip", "deflate")
+
+#: Default minimum body size in bytes worth compressing
+DEFAULT_THRESHOLD = 1024
+
+_GZIP_WINDOW_BITS = 16 + zlib.MAX_WBITS
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    """Compresses a body.
+
+    Args:
+        data: The uncompressed body.
+        encoding: Content encoding, one of ENCODINGS.
+    """
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=6)
+    if encoding == "deflate":
+        return zlib.compress(data, 6)
+
+    raise ValueError(f"Unsupported content encoding {encoding}!")
+
+
+def decompress(data: bytes, encoding: str, max_size: typing.Optional[int] = None) -> bytes:
+    """Decompresses a body.
+
+    Args:
+        data: The compressed body.
+        encoding: Content encoding, one of ENCODINGS or "identity".
+        max_size: If given, bodies that decompress to more bytes are rejected, so a small
+            request cannot make the server allocate huge amounts of memory.
+
+    Raises:
+        ValueError: If the encoding is not supported, or the body is invalid or too large.
+    """
+    encoding = encoding.strip().lower()
+    if encoding in ("", "identity"):
+        return data
+
+    if encoding == "gzip":
+        decompressor = zlib.decompressobj(_GZIP_WINDOW_BITS)
+    elif encoding == "deflate":
+        decompressor = zlib.decompressobj()
+    else:
+        raise ValueError(f"Unsupported content encoding {encoding}!")
+
+    try:
+        # Ask for one byte more than allowed, to tell a body of exactly max_size bytes apart
+        result = decompressor.decompress(data, max_size + 1 if max_size is not None else 0)
+    except zlib.error as error:
+        raise ValueError(f"Invalid {encoding} body: {error}") from error
+
+    if max_size is not None and len(result) > max_size:
+        raise ValueError(f"Body is larger than {max_size} bytes when decompressed!")
+    if not decompressor.eof:
+        raise ValueError(f"Truncated {encoding} body!")
+
+    return result
+
+
+__all__ = ["ENCODINGS", "DEFAULT_THRESHOLD", "compress", "decompress"]
@@ -1,32 +1,218 @@
-"""Database access layer for radar event and client info."""
-import pickle  # nosec
+"""Database access layer for radar event and client info.
+
+Databases are saved as an append-only log of records, see radar_record_log. Saving to the file
+that was last saved to or loaded from only appends the records added since.
+"""
+import bisect
+import collections
+import contextlib
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
 import typing
 import uuid
 
-from . import radar_common
+from . import (radar_common, radar_metrics, radar_record_log, radar_retention,
+               radar_storage)
+
+_EventIndexDict = typing.Dict[radar_common.EventIdentifier, int]
+
+_FREEZE_FRAMES_PER_RECORD = 1024
+_LOCK_STRIPES = 64
+_MAX_CHANGES = 1 << 16
+_SHARED_POLL_INTERVAL = 0.5
+
+
+class _Timer:
+    """Records the duration of a database operation, if the database has a metrics registry."""
+
+    def __init__(self, histogram: typing.Optional[radar_metrics.Histogram],
+                 operation: str) -> None:
+        self._histogram = histogram
+        self._operation = operation
+        self._start: float = 0.0
+
+    def __enter__(self) -> None:
+        self._start = time.perf_counter()
+
+    def __exit__(self, *exc_info: object) -> None:
+        if self._histogram is not None:
+            self._histogram.observe(time.perf_counter() - self._start, (self._operation,))
+
+
+class RadarDatabase:  # pylint: disable=R0902,R0904
+    """Represents a database for radar event and client info.
+
+    The database can be shared by threads. Inserts into different events only contend if the
+    events share a lock stripe, and reads take no locks. Saving and loading block inserts.
+
+    If the storage backend is shared with other processes, identifiers stored by them are picked
+    up when needed, and occurrences are counted by the backend.
+
+    Recording occurrences advances an insert sequence number, so live views can ask for the
+    changes since the sequence number they last saw instead of reloading everything. Each event
+    and the client info also have version numbers, so rendered pages can be reused until the
+    data they show changes.
+    """
+
+    def __init__(self, storage: typing.Optional[radar_storage.StorageBackend] = None,
+                 metrics: typing.Optional[radar_metrics.MetricsRegistry] = None,
+                 retention: typing.Optional[radar_retention.RetentionPolicies] = None) -> None:
+        """Creates a database on top of a storage backend.
+
+        Args:
+            storage: Where to keep the data. Defaults to an in-memory backend.
+            metrics: If given, operation durations and the database size are recorded here.
+            retention: Retention policies by severity. Freeze frames of events without a policy
+                are kept forever.
+        """
+        self._storage: radar_storage.StorageBackend =\
+            storage if storage is not None else radar_storage.MemoryStorageBackend()
+
+        # New identifiers are stored under the index lock. Writes to an event hold its lock
+        # stripe, which also guards the storage backend's data of that event.
+        self._index_lock = threading.RLock()
+        self._event_locks: typing.List[threading.Lock] = [
+            threading.Lock() for _ in range(_LOCK_STRIPES)]
+        self._rollup_lock = threading.Lock()
+        self._client_info_lock = threading.Lock()
+
+        # The identifiers are cached, so looking up events does not hit the storage backend
+        self._event_identifiers: typing.List[radar_common.EventIdentifier] = list()
+        self._event_index: _EventIndexDict = dict()
+
+        # Secondary indices for filtering event identifiers: event indices by severity and by
+        # location, in ascending order, and all locations, sorted
+        self._events_by_severity: typing.Dict[int, typing.List[int]] = dict()
+        self._events_by_location: typing.Dict[str, typing.List[int]] = dict()
+        self._locations: typing.List[str] = list()
+        self._locations_lock = threading.Lock()
+
+        # Retention state of each event: approximate number of stored freeze frames, and when
+        # freeze frames were last evicted
+        self._retention: typing.Dict[int, radar_retention.RetentionPolicy] = {
+            int(severity): policy for severity, policy in (retention or {}).items()}
+        self._ages_expire: bool = any(policy.max_age is not None
+                                      for policy in self._retention.values())
+        self._stored_freeze_frames: typing.List[int] = list()
+        self._evicted_at: typing.List[float] = list()
+        self._eviction_cursor: int = 0
+        self._random = random.Random()  # nosec
+
+        # Occurrence counters, updated on insert so the overview never counts freeze frames
+        self._event_counts: typing.List[int] = list()
+        self._severity_counts: typing.Dict[int, int] = collections.Counter()
+        self._location_counts: typing.Dict[str, int] = collections.Counter()
+
+        # Insert sequence and the most recent occurrence changes, (sequence, event index, count).
+        # A shared backend logs the changes of all processes itself.
+        self._sequence: int = 0
+        self._changes: typing.Deque[typing.Tuple[int, int, int]] =\
+            collections.deque(maxlen=_MAX_CHANGES)
+        self._changed = threading.Condition(self._rollup_lock)
+        self._waiting_for_changes: int = 0
 
-# Putting nosec here is safe as long as the database files can be trusted. Since they are not
-# transferred over the network, any attacker would have to have local access.
+        # Versions of each event, bumped by occurrences and evictions, and of the client info
+        self._event_versions: typing.List[int] = list()
+        self._client_info_version: int = 0
 
+        self._sync_identifiers()
+        for event_index, count in enumerate(self._storage.occurrence_counts()):
+            self._count_occurrences(event_index, count)
 
-_EventDataList = typing.List[typing.Tuple[
-    radar_common.EventIdentifier,
-    typing.List[typing.Tuple[uuid.UUID, radar_common.FreezeFrameData]]]]
+        # Checkpoint state: what has been written to which file so far
+        self._checkpoint_path: typing.Optional[str] = None
+        self._checkpoint_size: int = 0
+        self._saved_event_count: int = 0
+        self._saved_freeze_frame_counts: typing.Dict[int, int] = dict()
+        self._saved_statistics: typing.Dict[int,
+                                            radar_common.EventStatistics] = dict()
+        self._evicted_since_checkpoint: bool = False
+        self._unsaved_event_indices: typing.Set[int] = set()
+        self._unsaved_client_info: typing.Set[uuid.UUID] = set()
 
-_ClientInfoDict = typing.Dict[uuid.UUID,
-                              radar_common.ClientInfo]
+        self._operation_seconds: typing.Optional[radar_metrics.Histogram] = None
+        self._evictions: typing.Optional[radar_metrics.Counter] = None
+        if metrics is not None:
+            self._evictions = metrics.counter(
+                "radar_database_evicted_freeze_frames_total",
+                "Number of freeze frames evicted by retention policies.")
+            self._operation_seconds = metrics.histogram(
+                "radar_database_operation_duration_seconds",
+                "Time spent in radar database operations.", ("operation",))
+            metrics.gauge("radar_database_events", "Number of distinct events.",
+                          lambda: len(self._event_identifiers))
+            metrics.gauge("radar_database_unsaved_events",
+                          "Number of events with occurrences that are not saved yet.",
+                          lambda: len(self._unsaved_event_indices))
 
+    def event_identifiers(  # pylint: disable=R0913
+            self,
+            severity: typing.Optional[radar_common.Severity] = None,
+            location_prefix: typing.Optional[str] = None,
+            description: typing.Optional[str] = None,
+            session_id: typing.Optional[uuid.UUID] = None,
+            after: int = -1,
+            limit: typing.Optional[int] = None,
+    ) -> typing.Sequence[typing.Tuple[int, radar_common.EventIdentifier]]:
+        """Gets all events uniquely identified by the severity/location/description triplet.
+
+        Events are returned ordered by index and can be filtered and paginated.
+
+        Args:
+            severity: Only return events of this severity.
+            location_prefix: Only return events whose location starts with this.
+            description: Only return events whose description contains this.
+            session_id: Only return events that occurred in this session.
+            after: Only return events with a higher index, i.e. the last index of the
+                previous page.
+            limit: Maximum number of events to return.
+        """
+        with self._timed("event_identifiers"):
+            self._refresh()
+
+            # Start from the candidates of the most selective index
+            candidates: typing.Sequence[int] = range(
+                after + 1, len(self._event_identifiers))
+            if location_prefix is not None:
+                locations: typing.List[str] = list()
+                with self._locations_lock:
+                    start = bisect.bisect_left(self._locations, location_prefix)
+                    for location in itertools.islice(self._locations, start, None):
+                        if not location.startswith(location_prefix):
+                            break
+                        locations.append(location)
+                candidates = sorted(itertools.chain.from_iterable(
+                    self._events_by_location[location] for location in locations))
+            elif severity is not None:
+                candidates = self._events_by_severity.get(int(severity), [])
+            elif session_id is not None:
+                candidates = sorted(
+                    self._storage.session_event_indices(session_id))
 
-class RadarDatabase:
-    """Represents a database for radar event and client info."""
+            session_events: typing.AbstractSet[int] = set()
+            if session_id is not None:
+                session_events = self._storage.session_event_indices(session_id)
 
-    def __init__(self) -> None:
-        self._event_data: _EventDataList = list()
-        self._client_info: _ClientInfoDict = dict()
+            result: typing.List[typing.Tuple[int,
+                                             radar_common.EventIdentifier]] = list()
+            for event_index in itertools.islice(
+                    candidates, bisect.bisect_right(candidates, after), None):
+                event_identifier = self._event_identifiers[event_index]
+                if limit is not None and len(result) >= limit:
+                    break
+                if severity is not None and event_identifier.severity != severity:
+                    continue
+                if description is not None and description not in event_identifier.description:
+                    continue
+                if session_id is not None and event_index not in session_events:
+                    continue
+                result.append((event_index, event_identifier))
 
-    def event_identifiers(self) -> typing.Sequence[typing.Tuple[int, radar_common.EventIdentifier]]:
-        """Gets all events uniquely identified by the severity/location/description triplet."""
-        return [(i, event_identifier) for i, (event_identifier, _) in enumerate(self._event_data)]
+            return result
 
     def insert_event(
             self,
@@ -43,32 +229,513 @@ class RadarDatabase:
             event_identifier: Unique identifier of the event.
             freeze_frame: A dictionary of helpful measurements.
         """
-        all_identifiers = [event_identifier for (
-            event_identifier, _) in self._event_data]
-        if event_identifier not in all_identifiers:
-            new_index = len(self._event_data)
-            self._event_data.insert(
-                new_index, (event_identifier, [(session_id, freeze_frame)]))
-            return new_index
-
-        # Already exists
-        index = all_identifiers.index(event_identifier)
-        self._event_data[index] = (
-            self._event_data[index][0], self._event_data[index][1] + [(session_id, freeze_frame)])
+        with self._timed("insert_event"):
+            now = time.time()
+            index = self._index_of(event_identifier)
+            with self._locked_events((index,)):
+                stored = self._sample(index, 1, [freeze_frame])
+                if stored:
+                    self._storage.append_freeze_frame(index, session_id, freeze_frame, now)
+                self._record_occurrences(index, 1, now, now)
+                self._unsaved_event_indices.add(index)
+                self._retain(index, len(stored), now)
+
+            self._retain_next(now)
+            return index
+
+    def insert_events(
+            self,
+            session_id: uuid.UUID,
+            events: typing.Sequence[typing.Tuple[radar_common.EventIdentifier,
+                                                 radar_common.FreezeFrameData]],
+    ) -> typing.List[int]:
+        """Inserts several events of one session into the database at once.
+
+        Args:
+            session_id: Unique session identifier.
+            events: Pairs of event identifier and freeze frame.
+
+        Returns:
+            The database index of each event.
+        """
+        with self._timed("insert_events"):
+            now = time.time()
+            indices = [self._index_of(event_identifier)
+                       for event_identifier, _ in events]
+            freeze_frames_by_event: typing.Dict[int, typing.List[radar_common.FreezeFrameData]] =\
+                collections.defaultdict(list)
+            for index, (_, freeze_frame) in zip(indices, events):
+                freeze_frames_by_event[index].append(freeze_frame)
+
+            with self._locked_events(indices):
+                stored = {index: self._sample(index, len(freeze_frames), freeze_frames)
+                          for index, freeze_frames in freeze_frames_by_event.items()}
+                self._storage.append_freeze_frames(
+                    ((index, session_id, freeze_frame)
+                     for index, freeze_frames in stored.items() for freeze_frame in freeze_frames),
+                    now)
+                for index, freeze_frames in freeze_frames_by_event.items():
+                    self._record_occurrences(index, len(freeze_frames), now, now)
+                    self._retain(index, len(stored[index]), now)
+                self._unsaved_event_indices.update(indices)
+
+            self._retain_next(now)
+            return indices
+
+    def insert_aggregated_events(
+            self,
+            session_id: uuid.UUID,
+            aggregated_events: typing.Sequence[radar_common.AggregatedEvent],
+    ) -> typing.List[int]:
+        """Inserts summaries of repeated events of one session into the database.
+
+        Only the sampled freeze frames are stored, but all occurrences are counted.
+
+        Args:
+            session_id: Unique session identifier.
+            aggregated_events: Summaries of repeated events.
+
+        Returns:
+            The database index of each event.
+        """
+        with self._timed("insert_aggregated_events"):
+            now = time.time()
+            indices = [self._index_of(aggregated_event.event_identifier)
+                       for aggregated_event in aggregated_events]
+            with self._locked_events(indices):
+                for index, aggregated_event in zip(indices, aggregated_events):
+                    # Each aggregate is sampled before counting, so repeated events are handled
+                    stored = self._sample(index, aggregated_event.count,
+                                          aggregated_event.freeze_frames)
+                    self._storage.append_freeze_frames(
+                        ((index, session_id, freeze_frame) for freeze_frame in stored), now)
+                    self._record_occurrences(index, aggregated_event.count,
+                                             aggregated_event.first_seen,
+                                             aggregated_event.last_seen)
+                    self._retain(index, len(stored), now)
+                self._unsaved_event_indices.update(indices)
+
+            self._retain_next(now)
+            return indices
+
+    def _index_of(self, event_identifier: radar_common.EventIdentifier) -> int:
+        """Looks up the index of an event identifier, storing the identifier if it is new."""
+        index = self._event_index.get(event_identifier)
+        if index is None:
+            with self._index_lock:
+                # Another thread may have stored the identifier while this one waited
+                index = self._event_index.get(event_identifier)
+                if index is None:
+                    index = self._storage.insert_event_identifier(event_identifier)
+                    # Other processes may have stored identifiers in the meantime
+                    self._sync_identifiers()
+
         return index
 
-    def event(self, event_index: int)\
+    def _sync_identifiers(self) -> None:
+        """Indexes the identifiers that were stored since the last call, by any process."""
+        with self._index_lock:
+            start = len(self._event_identifiers)
+            for event_index, event_identifier in enumerate(
+                    self._storage.event_identifiers(start), start):
+                self._index_identifier(event_index, event_identifier)
+
+    def _refresh(self) -> None:
+        """Picks up identifiers stored by other processes sharing the storage backend."""
+        if self._storage.shared:
+            self._sync_identifiers()
+
+    def _index_identifier(self, event_index: int,
+                          event_identifier: radar_common.EventIdentifier) -> None:
+        """Adds an event identifier to the cache, the lookup and filter indices and the counters.
+
+        Readers don't lock, so the event is only appended to the filter indices, except for the
+        sorted locations, and the lookup index, which makes the event visible to writers, is
+        updated last.
+        """
+        self._event_counts.append(0)
+        self._event_versions.append(0)
+        self._stored_freeze_frames.append(0)
+        self._evicted_at.append(time.time())
+        self._event_identifiers.append(event_identifier)
+
+        self._events_by_severity.setdefault(int(event_identifier.severity), []).append(event_index)
+        if event_identifier.location in self._events_by_location:
+            self._events_by_location[event_identifier.location].append(event_index)
+        else:
+            # The location has to be visible in the bucket lookup before readers can find it
+            self._events_by_location[event_identifier.location] = [event_index]
+            with self._locations_lock:
+                bisect.insort(self._locations, event_identifier.location)
+
+        self._event_index[event_identifier] = event_index
+
+    def _timed(self, operation: str) -> _Timer:
+        """Records the duration of the enclosed operation."""
+        return _Timer(self._operation_seconds, operation)
+
+    @contextlib.contextmanager  # type: ignore
+    def _locked_events(self, event_indices: typing.Iterable[int]) -> typing.Iterator[None]:
+        """Holds the lock stripes of the given events.
+
+        Stripes are always locked in ascending order, so threads can't deadlock.
+        """
+        with contextlib.ExitStack() as stack:
+            for stripe in sorted({event_index % _LOCK_STRIPES for event_index in event_indices}):
+                stack.enter_context(self._event_locks[stripe])
+            yield
+
+    @contextlib.contextmanager  # type: ignore
+    def _exclusive(self) -> typing.Iterator[None]:
+        """Holds all locks, so no other thread can write to the database."""
+        with self._index_lock, self._client_info_lock,\
+                self._locked_events(range(_LOCK_STRIPES)):
+            yield
+
+    def _record_occurrences(self,
+                            event_index: int,
+                            count: int,
+                            first_seen: typing.Optional[float],
+                            last_seen: typing.Optional[float]) -> None:
+        """Stores occurrences of an event and updates the counters."""
+        self._storage.record_occurrences(
+            event_index, count, first_seen, last_seen)
+        self._count_occurrences(event_index, count)
+
+    def _count_occurrences(self, event_index: int, count: int) -> None:
+        """Adds occurrences of an event to its counter and the severity and location rollups.
+
+        The caller has to hold the event's lock stripe.
+        """
+        event_identifier = self._event_identifiers[event_index]
+        self._event_counts[event_index] += count
+        self._event_versions[event_index] += 1
+        with self._rollup_lock:
+            self._severity_counts[int(event_identifier.severity)] += count
+            self._location_counts[event_identifier.location] += count
+            if not self._storage.shared:
+                self._log_change(event_index, count)
+
+    def _log_change(self, event_index: int, count: int) -> None:
+        """Advances the insert sequence and wakes up waiting live views.
+
+        The caller has to hold the rollup lock.
+        """
+        self._sequence += 1
+        self._changes.append((self._sequence, event_index, count))
+        if self._waiting_for_changes:
+            self._changed.notify_all()
+
+    def _sample(self, event_index: int, occurrences: int,
+                freeze_frames: typing.Sequence[radar_common.FreezeFrameData]
+                ) -> typing.List[radar_common.FreezeFrameData]:
+        """Picks the freeze frames of new occurrences of an event that are stored.
+
+        The caller has to hold the event's lock stripe and count the occurrences afterwards.
+        """
+        policy = self._retention.get(int(self._event_identifiers[event_index].severity))
+        if policy is None:
+            return list(freeze_frames)
+
+        frame_numbers = radar_retention.sampled_freeze_frames(
+            policy, self._event_counts[event_index], occurrences, len(freeze_frames), self._random)
+        return [freeze_frames[frame_number] for frame_number in frame_numbers]
+
+    def _retain(self, event_index: int, stored: int, now: float) -> None:
+        """Evicts freeze frames of an event if it has too many or it is time to check their age.
+
+        The caller has to hold the event's lock stripe.
+
+        Args:
+            event_index: Index of the event.
+            stored: Number of freeze frames just stored.
+            now: Current UNIX timestamp.
+        """
+        policy = self._retention.get(int(self._event_identifiers[event_index].severity))
+        if policy is None:
+            return
+
+        self._stored_freeze_frames[event_index] += stored
+        too_many = policy.max_freeze_frames is not None and\
+            self._stored_freeze_frames[event_index] >\
+            policy.max_freeze_frames + radar_retention.eviction_slack(policy)
+        too_old = policy.max_age is not None and\
+            now - self._evicted_at[event_index] >= policy.max_age / 4
+        if too_many or too_old:
+            self._evict(event_index, policy, now)
+
+    def _retain_next(self, now: float) -> None:
+        """Checks the ages of the next event's freeze frames, taking turns between events.
+
+        This way, freeze frames of events that stopped occurring expire, too. Inserts call this
+        after releasing their locks.
+        """
+        if not self._ages_expire or not self._event_identifiers:
+            return
+
+        event_index = self._eviction_cursor % len(self._event_identifiers)
+        self._eviction_cursor = event_index + 1
+        policy = self._retention.get(int(self._event_identifiers[event_index].severity))
+
+        # Only lock the event if it is due, which _retain checks again while holding the lock
+        if policy is not None and policy.max_age is not None and\
+                now - self._evicted_at[event_index] >= policy.max_age / 4:
+            with self._locked_events((event_index,)):
+                self._retain(event_index, 0, now)
+
+    def _evict(self, event_index: int, policy: radar_retention.RetentionPolicy,
+               now: float) -> int:
+        """Evicts freeze frames of an event according to its policy.
+
+        The caller has to hold the event's lock stripe.
+
+        Returns:
+            The number of evicted freeze frames.
+        """
+        def select(timestamps: typing.Sequence[float]) -> typing.List[int]:
+            evicted = radar_retention.select_evicted(policy, timestamps, now, self._random)
+            self._stored_freeze_frames[event_index] = len(timestamps) - len(evicted)
+            return evicted
+
+        evicted_count = self._storage.evict_freeze_frames(event_index, select)
+        self._evicted_at[event_index] = now
+        if evicted_count > 0:
+            self._event_versions[event_index] += 1
+            # Appending to the file can't remove freeze frames, so the next save compacts it
+            self._evicted_since_checkpoint = True
+            if self._evictions is not None:
+                self._evictions.inc(amount=evicted_count)
+
+        return evicted_count
+
+    def apply_retention(self) -> int:
+        """Evicts freeze frames of all events according to the retention policies.
+
+        Inserts already evict incrementally, so this is only needed to enforce the policies at a
+        specific time, e.g. before saving.
+
+        Returns:
+            The number of evicted freeze frames.
+        """
+        with self._timed("apply_retention"):
+            now = time.time()
+            evicted_count = 0
+            for event_index, event_identifier in enumerate(list(self._event_identifiers)):
+                policy = self._retention.get(int(event_identifier.severity))
+                if policy is not None:
+                    with self._locked_events((event_index,)):
+                        evicted_count += self._evict(event_index, policy, now)
+
+            return evicted_count
+
+    def event(  # pylint: disable=R0913
+            self,
+            event_index: int,
+            offset: int = 0,
+            limit: typing.Optional[int] = None,
+            session_id: typing.Optional[uuid.UUID] = None,
+            sort_key: typing.Optional[str] = None,
+            descending: bool = False)\
             -> typing.Tuple[radar_common.EventIdentifier,
                             typing.List[typing.Tuple[uuid.UUID, radar_common.FreezeFrameData]]]:
         """Returns the freeze frame data matching the given identifier.
 
         Args:
             event_index: Database index of the event.
+            offset: Number of freeze frames to skip.
+            limit: Maximum number of freeze frames to return.
+            session_id: If given, only freeze frames of this session are returned.
+            sort_key: If given, freeze frames are ordered by their measurement of this key
+                instead of insertion order. Freeze frames without it come last.
+            descending: Whether to order by the measurement in descending order.
 
         Returns:
             The freeze frame data matching the event identifier.
         """
-        return self._event_data[event_index]
+        with self._timed("event"):
+            if event_index >= len(self._event_identifiers):
+                self._refresh()
+
+            return self._event_identifiers[event_index],\
+                self._storage.freeze_frames(event_index, offset, limit, session_id, sort_key,
+                                            descending)
+
+    def freeze_frame_summary(self, event_index: int) -> radar_common.FreezeFrameSummary:
+        """Counts the stored freeze frames of an event and the sessions they come from.
+
+        Retention policies may have evicted freeze frames, so the count can be lower than the
+        number of occurrences.
+
+        Args:
+            event_index: Database index of the event.
+        """
+        return self._storage.freeze_frame_summary(event_index)
+
+    def event_count(self) -> int:
+        """Gets the number of distinct events."""
+        self._refresh()
+        return len(self._event_identifiers)
+
+    def event_frequencies(
+            self,
+            offset: int = 0,
+            limit: typing.Optional[int] = None,
+            sort_by_frequency: bool = False,
+    ) -> typing.Sequence[typing.Tuple[int, radar_common.EventIdentifier, int]]:
+        """Gets a page of events together with how often they occurred.
+
+        Args:
+            offset: Number of events to skip.
+            limit: Maximum number of events to return.
+            sort_by_frequency: Order the events by descending frequency instead of by index.
+
+        Returns:
+            Triplets of event index, event identifier and number of occurrences.
+        """
+        with self._timed("event_frequencies"):
+            self._refresh()
+            counts = self._occurrence_counts()
+            stop = None if limit is None else offset + limit
+            event_indices: typing.Iterable[int] = range(len(self._event_identifiers))
+            if sort_by_frequency:
+                # Only the events up to the requested page have to be ordered
+                event_indices = heapq.nlargest(stop, event_indices, key=counts.__getitem__)\
+                    if stop is not None else\
+                    sorted(event_indices, key=counts.__getitem__, reverse=True)
+
+            return [(event_index, self._event_identifiers[event_index], counts[event_index])
+                    for event_index in itertools.islice(event_indices, offset, stop)]
+
+    def severity_frequencies(self) -> typing.Dict[radar_common.Severity, int]:
+        """Gets the total number of occurrences of events of each severity."""
+        severity_counts, _ = self._rollups()
+        return {radar_common.Severity(severity): count
+                for severity, count in sorted(severity_counts.items())}
+
+    def location_frequencies(self) -> typing.Dict[str, int]:
+        """Gets the total number of occurrences of events at each location."""
+        _, location_counts = self._rollups()
+        return location_counts
+
+    def _occurrence_counts(self) -> typing.Sequence[int]:
+        """Gets the occurrence counter of each event."""
+        if self._storage.shared:
+            return self._storage.occurrence_counts()
+
+        return self._event_counts
+
+    def _rollups(self) -> typing.Tuple[typing.Dict[int, int], typing.Dict[str, int]]:
+        """Gets copies of the per-severity and per-location occurrence counters."""
+        if self._storage.shared:
+            # Other processes don't update this process' counters, so add up the backend's
+            self._refresh()
+            severity_counts: typing.Dict[int, int] = collections.Counter()
+            location_counts: typing.Dict[str, int] = collections.Counter()
+            for event_identifier, count in zip(self._event_identifiers,
+                                               self._storage.occurrence_counts()):
+                severity_counts[int(event_identifier.severity)] += count
+                location_counts[event_identifier.location] += count
+            return dict(severity_counts), dict(location_counts)
+
+        with self._rollup_lock:
+            return dict(self._severity_counts), dict(self._location_counts)
+
+    def sequence(self) -> int:
+        """Gets the current insert sequence number."""
+        if self._storage.shared:
+            return self._storage.change_sequence()
+
+        return self._sequence
+
+    def changes(self, after: int, timeout: float = 0.0) -> typing.Optional[
+            typing.Tuple[int, typing.List[typing.Tuple[int, radar_common.EventIdentifier, int]]]]:
+        """Gets the occurrences recorded after an insert sequence number.
+
+        Args:
+            after: Sequence number returned by sequence or an earlier call.
+            timeout: Maximum time in seconds to wait if nothing was recorded yet.
+
+        Returns:
+            The current sequence number, and triplets of event index, event identifier and
+            number of new occurrences, ordered by index. None if the changes after the given
+            sequence number are no longer known, so the caller has to reload everything.
+        """
+        if self._storage.shared:
+            return self._shared_changes(after, timeout)
+
+        with self._changed:
+            if self._sequence == after and timeout > 0:
+                self._waiting_for_changes += 1
+                try:
+                    self._changed.wait(timeout)
+                finally:
+                    self._waiting_for_changes -= 1
+
+            if after > self._sequence or\
+                    (self._changes and self._changes[0][0] > after + 1):
+                return None
+
+            added: typing.Dict[int, int] = collections.Counter()
+            for sequence, event_index, count in reversed(self._changes):
+                if sequence <= after:
+                    break
+                added[event_index] += count
+            return self._sequence, [(event_index, self._event_identifiers[event_index], count)
+                                    for event_index, count in sorted(added.items())]
+
+    def _shared_changes(self, after: int, timeout: float) -> typing.Optional[
+            typing.Tuple[int, typing.List[typing.Tuple[int, radar_common.EventIdentifier, int]]]]:
+        """Gets the occurrences recorded after a sequence number from the shared backend's log.
+
+        Other processes can't wake up waiting live views, so the log is polled.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            changes = self._storage.occurrence_changes(after)
+            remaining = deadline - time.monotonic()
+            if changes is None or changes[0] != after or remaining <= 0:
+                break
+            time.sleep(min(remaining, _SHARED_POLL_INTERVAL))
+
+        if changes is None:
+            return None
+
+        # Identifiers are stored before their occurrences, so indexing them now covers all changes
+        self._refresh()
+        sequence, added = changes
+        return sequence, [(event_index, self._event_identifiers[event_index], count)
+                          for event_index, count in added]
+
+    def event_version(self, event_index: int) -> int:
+        """Gets a number that changes whenever occurrences or freeze frames of an event change.
+
+        With a shared backend, evictions by other processes are only noticed once the event
+        occurs again.
+
+        Args:
+            event_index: Database index of the event.
+        """
+        if self._storage.shared:
+            self._refresh()
+            return self._event_versions[event_index] +\
+                self._storage.event_statistics(event_index).count
+
+        return self._event_versions[event_index]
+
+    def client_info_version(self) -> int:
+        """Gets a number that changes whenever client info is inserted, by any process."""
+        if self._storage.shared:
+            return self._storage.client_info_count()
+
+        return self._client_info_version
+
+    def event_statistics(self, event_index: int) -> radar_common.EventStatistics:
+        """Gets how often and when an event occurred, including occurrences without freeze frames.
+
+        Args:
+            event_index: Database index of the event.
+        """
+        return self._storage.event_statistics(event_index)
 
     def insert_client_info(self, session_id: uuid.UUID,
                            client_info: radar_common.ClientInfo) -> None:
@@ -77,42 +744,227 @@ class RadarDatabase:
         Args:
             session_id: Unique session identifier.
             client_info: Client information structure."""
+        with self._timed("insert_client_info"):
 
-        self._client_info[session_id] = client_info
+            with self._client_info_lock:
+                self._storage.insert_client_info(session_id, client_info)
+                self._unsaved_client_info.add(session_id)
+                self._client_info_version += 1
 
     def client_info(self, session_id: uuid.UUID) -> radar_common.ClientInfo:
         """Gets client info associated with a session id from the database."""
-        return self._client_info[session_id]
+        with self._timed("client_info"):
+            return self._storage.client_info(session_id)
+
+    def close(self) -> None:
+        """Closes the underlying storage backend."""
+        self._storage.close()
 
     def load(self, path: str) -> None:
         """Loads the database from the given path.
 
-        The database has to be empty. Otherwise, a ValueError is raised.
+        The database has to be empty. Otherwise, a ValueError is raised. Records are streamed
+        from the file, so the file is never held in memory as a whole.
 
         Args:
             path: path to load the database from.
         """
-        if len(self._client_info.keys()) > 0 or len(self._event_data) > 0:
+        with self._timed("load"):
+            with self._exclusive():
+                self._load(path)
+
+    def _load(self, path: str) -> None:
+        """Loads the database from the given path while holding all locks."""
+        if any(True for _ in self._storage.client_infos()) or len(self._event_identifiers) > 0:
             raise ValueError("The database is not empty. Cannot load!")
 
+        freeze_frame_counts: typing.Dict[int, int] = dict()
+        statistics: typing.Dict[int, radar_common.EventStatistics] = dict()
         with open(path, "rb") as db_file:
-            db_dict: typing.Mapping[str, typing.Union[_EventDataList,
-                                                      _ClientInfoDict]] =\
-                pickle.load(db_file)  # nosec
-            self._event_data = db_dict["event_data"]  # type: ignore
-            self._client_info = db_dict["client_info"]  # type: ignore
+            is_log = db_file.read(len(radar_record_log.LOG_MAGIC)) == radar_record_log.LOG_MAGIC
+            complete_size = db_file.tell()
+            if is_log:
+                records = radar_record_log.read_records(db_file)
+            else:
+                db_file.seek(0)
+                records = radar_record_log.read_legacy_records(db_file)
+
+            # Map the indices in the file to the ones assigned by the storage backend
+            index_map: typing.Dict[int, int] = dict()
+            for record in records:
+                self._load_record(record, index_map, freeze_frame_counts, statistics)
+
+                # The reader pauses right after each complete record
+                complete_size = db_file.tell()
+
+        self._unsaved_event_indices.clear()
+        self._unsaved_client_info.clear()
+        if is_log and complete_size == os.path.getsize(path):
+            self._set_checkpoint(path, freeze_frame_counts, statistics)
+        else:
+            # Legacy files are rewritten in the log format on the next save, and so are files
+            # with a torn record at the end, since appending after it would make them unreadable
+            self._checkpoint_path = None
+
+        # Files may have been written with other policies, or the freeze frames may be too old now
+        now = time.time()
+        for event_index, event_identifier in enumerate(self._event_identifiers):
+            policy = self._retention.get(int(event_identifier.severity))
+            if policy is not None:
+                self._evict(event_index, policy, now)
+
+    def _load_record(self, record: radar_record_log.Record, index_map: typing.Dict[int, int],
+                     freeze_frame_counts: typing.Dict[int, int],
+                     statistics: typing.Dict[int, radar_common.EventStatistics]) -> None:
+        """Inserts a loaded record, counting the freeze frames and occurrences it adds."""
+        kind: str = record[0]
+        if kind == "event_identifier":
+            index_map[record[1]] = self._index_of(record[2])
+        elif kind == "freeze_frames":
+            index = index_map[record[1]]
+            freeze_frames: radar_storage.FreezeFrameList = record[2]
+            # Older files have no timestamps, so those freeze frames are stamped now
+            stored_timestamps: typing.Sequence[float] = record[3] if len(record) > 3 else ()
+            timestamps: typing.Iterator[typing.Optional[float]] = itertools.chain(
+                stored_timestamps, itertools.repeat(None))
+            for (session_id, freeze_frame), timestamp in zip(freeze_frames, timestamps):
+                self._storage.append_freeze_frame(index, session_id, freeze_frame, timestamp)
+            freeze_frame_counts[index] = freeze_frame_counts.get(index, 0) + len(freeze_frames)
+            self._stored_freeze_frames[index] += len(freeze_frames)
+        elif kind == "occurrences":
+            index = index_map[record[1]]
+            self._record_occurrences(index, *record[2:])
+            statistics[index] = radar_storage.merge_event_statistics(
+                statistics.get(index, radar_common.EventStatistics(0, None, None)),
+                radar_common.EventStatistics(*record[2:]))
+        elif kind == "client_info":
+            self._storage.insert_client_info(record[1], record[2])
+            self._client_info_version += 1
+        else:
+            raise ValueError(f"Unknown record kind {kind}!")
 
     def save(self, path: str) -> None:
         """Saves the database to the given path.
 
-        The file will be overwritten.
+        If the database was last saved to or loaded from the same file, and the file has not been
+        modified since, only the records added in the meantime are appended. Otherwise, the file
+        is compacted, i.e. overwritten with the complete database. The file is always compacted
+        if other processes share the storage backend, since their inserts are not tracked.
 
         Args:
             path: path to save the database to.
         """
-        with open(path, "wb") as db_file:
-            pickle.dump({"client_info": self._client_info,  # type: ignore
-                         "event_data": self._event_data}, db_file)  # type: ignore
+        with self._timed("save"):
+            with self._exclusive():
+                self._refresh()
+                if self._can_append(path):
+                    self._append_checkpoint(path)
+                else:
+                    self._compact(path)
+
+    def _can_append(self, path: str) -> bool:
+        """Checks if the file at path is unchanged since the last checkpoint."""
+        if self._storage.shared or self._evicted_since_checkpoint or\
+                os.path.abspath(path) != self._checkpoint_path:
+            return False
+        return os.path.exists(path) and os.path.getsize(path) == self._checkpoint_size
+
+    def compact(self, path: str) -> None:
+        """Writes the complete database to the given path in as few records as possible.
+
+        The file is replaced atomically, so a crash while compacting leaves the old file intact.
+
+        Args:
+            path: path to save the database to.
+        """
+        with self._timed("compact"):
+            with self._exclusive():
+                self._refresh()
+                self._compact(path)
+
+    def _compact(self, path: str) -> None:
+        """Writes the complete database to the given path while holding all locks."""
+        temp_path = path + ".tmp"
+        freeze_frame_counts: typing.Dict[int, int] = dict()
+        statistics: typing.Dict[int, radar_common.EventStatistics] = dict()
+        with open(temp_path, "wb") as db_file:
+            db_file.write(radar_record_log.LOG_MAGIC)
+            for session_id, client_info in self._storage.client_infos():
+                radar_record_log.write_record(db_file, ("client_info", session_id, client_info))
+
+            for event_index, event_identifier in enumerate(self._event_identifiers):
+                radar_record_log.write_record(
+                    db_file, ("event_identifier", event_index, event_identifier))
+                freeze_frame_counts[event_index] = self._write_freeze_frames(
+                    db_file, event_index, 0)
+                statistics[event_index] = self._storage.event_statistics(
+                    event_index)
+                radar_record_log.write_record(
+                    db_file, ("occurrences", event_index, *statistics[event_index]))
+
+        os.replace(temp_path, path)
+        self._unsaved_event_indices.clear()
+        self._unsaved_client_info.clear()
+        self._set_checkpoint(path, freeze_frame_counts, statistics)
+
+    def _append_checkpoint(self, path: str) -> None:
+        """Appends all records added since the last checkpoint to the given file."""
+        with open(path, "ab") as db_file:
+            for session_id in sorted(self._unsaved_client_info):
+                radar_record_log.write_record(
+                    db_file, ("client_info", session_id, self._storage.client_info(session_id)))
+
+            for event_index in range(self._saved_event_count, len(self._event_identifiers)):
+                event_identifier = self._event_identifiers[event_index]
+                radar_record_log.write_record(
+                    db_file, ("event_identifier", event_index, event_identifier))
+
+            for event_index in sorted(self._unsaved_event_indices):
+                start = self._saved_freeze_frame_counts.get(event_index, 0)
+                self._saved_freeze_frame_counts[event_index] = start +\
+                    self._write_freeze_frames(db_file, event_index, start)
+
+                # Occurrence records are added up when loading, so only write the difference
+                saved = self._saved_statistics.get(
+                    event_index, radar_common.EventStatistics(0, None, None))
+                current = self._storage.event_statistics(event_index)
+                radar_record_log.write_record(
+                    db_file, ("occurrences", event_index, current.count - saved.count,
+                              current.first_seen, current.last_seen))
+                self._saved_statistics[event_index] = current
+
+        self._unsaved_event_indices.clear()
+        self._unsaved_client_info.clear()
+        self._saved_event_count = len(self._event_identifiers)
+        self._checkpoint_size = os.path.getsize(path)
+
+    def _write_freeze_frames(self, db_file: typing.BinaryIO, event_index: int, start: int) -> int:
+        """Writes the freeze frames of an event from start onward in chunks.
+
+        Returns:
+            The number of freeze frames written.
+        """
+        freeze_frames = self._storage.freeze_frames(event_index, start)
+        timestamps = self._storage.freeze_frame_timestamps(event_index, start)
+        for chunk_start in range(0, len(freeze_frames), _FREEZE_FRAMES_PER_RECORD):
+            chunk_stop = chunk_start + _FREEZE_FRAMES_PER_RECORD
+            chunk_timestamps: typing.List[float] = list(timestamps[chunk_start:chunk_stop])
+            radar_record_log.write_record(
+                db_file, ("freeze_frames", event_index, freeze_frames[chunk_start:chunk_stop],
+                          chunk_timestamps))
+
+        return len(freeze_frames)
+
+    def _set_checkpoint(self, path: str,
+                        freeze_frame_counts: typing.Dict[int, int],
+                        statistics: typing.Dict[int, radar_common.EventStatistics]) -> None:
+        """Remembers that the database is completely saved in the given file."""
+        self._checkpoint_path = os.path.abspath(path)
+        self._checkpoint_size = os.path.getsize(path)
+        self._saved_event_count = len(self._event_identifiers)
+        self._saved_freeze_frame_counts = freeze_frame_counts
+        self._saved_statistics = statistics
+        self._evicted_since_checkpoint = False
 
 
 __all__ = ["RadarDatabase"]
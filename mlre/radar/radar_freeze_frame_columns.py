@@ -0,0 +1,356 @@
+"""Columnar storage of the freeze frames of an event.
+
+Instead of one dictionary per freeze frame, the measurements of each key are stored in one column.
+Integers and floats are kept in typed arrays, strings are dictionary-encoded, and session ids are
+kept as 16 bytes each. The key sets of the frames are shared, so each key string is stored once.
+"""
+import array
+import heapq
+import itertools
+import sys
+import time
+import typing
+import uuid
+
+from . import radar_common
+
+_SESSION_ID_SIZE = 16
+
+
+def _sort_key(value: radar_common.FreezeFrameMeasurement
+              ) -> typing.Tuple[int, typing.Union[int, float], str]:
+    """Orders measurements of mixed types: numbers first, then strings, then anything else."""
+    if isinstance(value, (int, float)):
+        return 0, value, ""
+    if isinstance(value, str):
+        return 1, 0, value
+    return 2, 0, repr(value)
+
+
+class _ArrayColumn:
+    """Stores measurements of one numeric type in a typed array."""
+
+    def __init__(self, value_type: type, typecode: str,
+                 values: typing.Iterable[typing.Union[int, float]] = ()) -> None:
+        self._value_type: type = value_type
+        self._values: "array.array[typing.Union[int, float]]" = array.array(typecode, values)
+
+    def append(self, value: radar_common.FreezeFrameMeasurement) -> bool:
+        """Appends a measurement. Returns False if it does not fit the column's type."""
+        # bool is a subclass of int, but has to come back as a bool
+        if type(value) is not self._value_type:  # pylint: disable=unidiomatic-typecheck
+            return False
+
+        try:
+            self._values.append(value)  # type: ignore
+        except OverflowError:
+            return False
+
+        return True
+
+    def append_missing(self, count: int = 1) -> None:
+        """Appends placeholders for frames that do not have this key."""
+        self._values.frombytes(bytes(count * self._values.itemsize))
+
+    def select(self, positions: typing.Sequence[int]) -> "_ArrayColumn":
+        """Copies the measurements at the given positions into a new column."""
+        return _ArrayColumn(self._value_type, self._values.typecode,
+                            (self._values[position] for position in positions))
+
+    def __getitem__(self, position: int) -> radar_common.FreezeFrameMeasurement:
+        return self._values[position]
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+
+class _StringColumn:
+    """Stores string measurements as indices into a list of distinct strings."""
+
+    def __init__(self) -> None:
+        self._codes: "array.array[int]" = array.array("I")
+        self._strings: typing.List[str] = list()
+        self._string_codes: typing.Dict[str, int] = dict()
+
+    def append(self, value: radar_common.FreezeFrameMeasurement) -> bool:
+        """Appends a measurement. Returns False if it is not a string."""
+        if type(value) is not str:  # pylint: disable=unidiomatic-typecheck
+            return False
+
+        code = self._string_codes.get(value)  # type: ignore
+        if code is None:
+            code = len(self._strings)
+            self._strings.append(sys.intern(value))  # type: ignore
+            self._string_codes[value] = code  # type: ignore
+
+        self._codes.append(code)
+        return True
+
+    def append_missing(self, count: int = 1) -> None:
+        """Appends placeholders for frames that do not have this key."""
+        self._codes.frombytes(bytes(count * self._codes.itemsize))
+
+    def select(self, positions: typing.Sequence[int]) -> "_StringColumn":
+        """Copies the measurements at the given positions into a new column.
+
+        Only the strings at those positions are kept. Placeholders are copied as the string they
+        refer to, which is never read.
+        """
+        column = _StringColumn()
+        for position in positions:
+            column.append(self._strings[self._codes[position]])
+        return column
+
+    def __getitem__(self, position: int) -> radar_common.FreezeFrameMeasurement:
+        return self._strings[self._codes[position]]
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+
+class _ObjectColumn:
+    """Stores measurements of mixed or unusual types as Python objects."""
+
+    def __init__(self, values: typing.Iterable[radar_common.FreezeFrameMeasurement] = ()) -> None:
+        self._values: typing.List[typing.Optional[radar_common.FreezeFrameMeasurement]] =\
+            list(values)
+
+    def append(self, value: radar_common.FreezeFrameMeasurement) -> bool:
+        """Appends a measurement of any type."""
+        self._values.append(value)
+        return True
+
+    def append_missing(self, count: int = 1) -> None:
+        """Appends placeholders for frames that do not have this key."""
+        self._values.extend(itertools.repeat(None, count))
+
+    def select(self, positions: typing.Sequence[int]) -> "_ObjectColumn":
+        """Copies the measurements at the given positions into a new column."""
+        return _ObjectColumn(self._values[position] for position in positions)  # type: ignore
+
+    def __getitem__(self, position: int) -> radar_common.FreezeFrameMeasurement:
+        return self._values[position]  # type: ignore
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+
+_Column = typing.Union[_ArrayColumn, _StringColumn, _ObjectColumn]
+
+
+class _KeySets:
+    """Numbers the distinct key sets of the frames, in their original key order."""
+
+    def __init__(self, key_sets: typing.Iterable[typing.Tuple[str, ...]] = ()) -> None:
+        self._key_sets: typing.List[typing.Tuple[str, ...]] = list(key_sets)
+        self._key_set_index: typing.Dict[typing.Tuple[str, ...], int] = {
+            key_set: key_set_id for key_set_id, key_set in enumerate(self._key_sets)}
+
+    def add(self, key_set: typing.Tuple[str, ...]) -> int:
+        """Gets the id of a key set, numbering it if it is new."""
+        key_set_id = self._key_set_index.get(key_set)
+        if key_set_id is None:
+            key_set_id = len(self._key_sets)
+            self._key_sets.append(tuple(sys.intern(key) for key in key_set))
+            self._key_set_index[key_set] = key_set_id
+        return key_set_id
+
+    def copy(self) -> "_KeySets":
+        """Copies the key sets, keeping their ids."""
+        return _KeySets(self._key_sets)
+
+    def __getitem__(self, key_set_id: int) -> typing.Tuple[str, ...]:
+        return self._key_sets[key_set_id]
+
+    def __iter__(self) -> typing.Iterator[typing.Tuple[str, ...]]:
+        return iter(self._key_sets)
+
+
+# Session id bytes, timestamp and key set id of a frame
+_FrameMetadata = typing.Tuple[bytes, float, int]
+
+
+def _new_column(value: radar_common.FreezeFrameMeasurement) -> _Column:
+    """Creates the most compact column that can hold the given measurement."""
+    if type(value) is int:  # pylint: disable=unidiomatic-typecheck
+        return _ArrayColumn(int, "q")
+    if type(value) is float:  # pylint: disable=unidiomatic-typecheck
+        return _ArrayColumn(float, "d")
+    if type(value) is str:  # pylint: disable=unidiomatic-typecheck
+        return _StringColumn()
+    return _ObjectColumn()
+
+
+class FreezeFrameColumns:
+    """Stores the freeze frames of one event column by column.
+
+    Frames are rebuilt as new dictionaries when read, so modifying them does not change the
+    stored data. Appends have to be serialized, but frames can be read during an append, since a
+    frame is only counted once all of its columns are written.
+    """
+
+    def __init__(self, key_sets: typing.Optional[_KeySets] = None,
+                 columns: typing.Optional[typing.Dict[str, _Column]] = None,
+                 frames: typing.Iterable[_FrameMetadata] = ()) -> None:
+        """Creates freeze frame columns, empty unless they are given.
+
+        Args:
+            key_sets: Key sets the frames refer to.
+            columns: Measurements by key, with one entry per frame each.
+            frames: Session id, timestamp and key set id of each frame.
+        """
+        self._session_ids: bytearray = bytearray()
+        # Distinct session ids, so they can be counted without scanning every frame
+        self._sessions: typing.Set[bytes] = set()
+        self._timestamps: "array.array[float]" = array.array("d")
+
+        # Each frame refers to the tuple of its keys, in their original order
+        self._key_sets: _KeySets = key_sets if key_sets is not None else _KeySets()
+        self._key_set_ids: "array.array[int]" = array.array("I")
+
+        self._columns: typing.Dict[str, _Column] = columns if columns is not None else dict()
+
+        for session_id, timestamp, key_set_id in frames:
+            self._session_ids += session_id
+            self._sessions.add(session_id)
+            self._timestamps.append(timestamp)
+            self._key_set_ids.append(key_set_id)
+        self._size: int = len(self._key_set_ids)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, session_id: uuid.UUID, freeze_frame: radar_common.FreezeFrameData,
+               timestamp: typing.Optional[float] = None) -> None:
+        """Appends a freeze frame.
+
+        Args:
+            session_id: Unique session identifier.
+            freeze_frame: A dictionary of helpful measurements.
+            timestamp: UNIX timestamp of when the freeze frame was stored. Defaults to now.
+        """
+        key_set_id = self._key_sets.add(tuple(freeze_frame))
+
+        # Every column has one entry per frame, so the position of a frame is the same in all
+        for key, column in self._columns.items():
+            if key not in freeze_frame:
+                column.append_missing()
+
+        for key, value in freeze_frame.items():
+            column_ = self._columns.get(key)
+            if column_ is None:
+                column_ = _new_column(value)
+                column_.append_missing(self._size)
+                self._columns[key] = column_
+
+            if not column_.append(value):
+                # The value does not fit the column's type, fall back to Python objects
+                column_ = _ObjectColumn(column_[position] for position in range(self._size))
+                column_.append(value)
+                self._columns[key] = column_
+
+        self._session_ids += session_id.bytes
+        self._sessions.add(session_id.bytes)
+        self._timestamps.append(time.time() if timestamp is None else timestamp)
+        self._key_set_ids.append(key_set_id)
+        self._size += 1
+
+    def frames(  # pylint: disable=R0913
+            self,
+            start: int = 0,
+            stop: typing.Optional[int] = None,
+            session_id: typing.Optional[uuid.UUID] = None,
+            sort_key: typing.Optional[str] = None,
+            descending: bool = False
+    ) -> typing.List[typing.Tuple[uuid.UUID, radar_common.FreezeFrameData]]:
+        """Rebuilds freeze frames.
+
+        Args:
+            start: Number of frames to skip.
+            stop: Position after the last frame to return.
+            session_id: If given, only frames of this session are counted and returned.
+            sort_key: If given, frames are ordered by their measurement of this key instead of
+                insertion order. Frames without it, or with None, come last.
+            descending: Whether to order by the measurement in descending order.
+
+        Returns:
+            Pairs of session id and freeze frame.
+        """
+        positions: typing.Iterable[int] = range(self._size)
+        if session_id is not None:
+            positions = (position for position in positions
+                         if self._session_id_bytes(position) == session_id.bytes)
+        if sort_key is not None:
+            positions = self._sorted(positions, sort_key, descending, stop)
+
+        return [self._frame(position)
+                for position in itertools.islice(positions, start, stop)]
+
+    def _sorted(self, positions: typing.Iterable[int], sort_key: str, descending: bool,
+                stop: typing.Optional[int]) -> typing.List[int]:
+        """Orders frame positions by the measurements of a key, keeping frames without it last.
+
+        Only the first stop positions are ordered completely, so early pages are cheap.
+        """
+        column = self._columns.get(sort_key)
+        key_set_ids = {key_set_id for key_set_id, key_set in enumerate(self._key_sets)
+                       if sort_key in key_set}
+        present: typing.List[int] = list()
+        missing: typing.List[int] = list()
+        for position in positions:
+            if column is not None and self._key_set_ids[position] in key_set_ids and\
+                    column[position] is not None:
+                present.append(position)
+            else:
+                missing.append(position)
+
+        def key(position: int) -> typing.Tuple[int, typing.Union[int, float], str]:
+            return _sort_key(column[position])  # type: ignore
+
+        if stop is not None and stop < len(present):
+            if descending:
+                return heapq.nlargest(stop, present, key=key)
+            return heapq.nsmallest(stop, present, key=key)
+
+        return sorted(present, key=key, reverse=descending) + missing
+
+    def timestamps(self, start: int = 0) -> typing.List[float]:
+        """Gets the timestamps of the freeze frames from start onward."""
+        return self._timestamps[start:self._size].tolist()
+
+    def session_count(self) -> int:
+        """Gets the number of distinct sessions that have freeze frames."""
+        return len(self._sessions)
+
+    def session_ids(self) -> typing.Set[uuid.UUID]:
+        """Gets the sessions that have freeze frames."""
+        # Copied first, since appends may add sessions meanwhile
+        return {uuid.UUID(bytes=session_id) for session_id in list(self._sessions)}
+
+    def without(self, positions: typing.Iterable[int]) -> "FreezeFrameColumns":
+        """Copies the freeze frames, leaving out those at the given positions."""
+        removed = set(positions)
+        kept = [position for position in range(self._size) if position not in removed]
+
+        frames = [(self._session_id_bytes(position), self._timestamps[position],
+                   self._key_set_ids[position]) for position in kept]
+        # Columns of keys no kept frame has are dropped, so every column holds a measurement
+        kept_keys = {key for key_set_id in {key_set_id for _, _, key_set_id in frames}
+                     for key in self._key_sets[key_set_id]}
+        columns = {key: column.select(kept) for key, column in self._columns.items()
+                   if key in kept_keys}
+        return FreezeFrameColumns(self._key_sets.copy(), columns, frames)
+
+    def _session_id_bytes(self, position: int) -> bytes:
+        """Gets the session id of a frame as bytes."""
+        offset = position * _SESSION_ID_SIZE
+        return bytes(self._session_ids[offset:offset + _SESSION_ID_SIZE])
+
+    def _frame(self, position: int) -> typing.Tuple[uuid.UUID, radar_common.FreezeFrameData]:
+        """Rebuilds a single freeze frame."""
+        key_set = self._key_sets[self._key_set_ids[position]]
+        return uuid.UUID(bytes=self._session_id_bytes(position)),\
+            {key: self._columns[key][position] for key in key_set}
+
+
+__all__ = ["FreezeFrameColumns"]
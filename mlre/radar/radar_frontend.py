@@ -1,48 +1,199 @@
 """Radar frontend component."""
+import functools
+import json
+import threading
+import time
 import typing
 import uuid
 
-from flask import Blueprint, render_template
+from flask import Blueprint, Response, render_template, request
 
 from mlre.radar import radar_common, radar_database
 
+_EVENTS_PER_PAGE = 50
+_MAX_EVENTS_PER_PAGE = 1000
+_FREEZE_FRAMES_PER_PAGE = 100
+_MAX_FREEZE_FRAMES_PER_PAGE = 1000
 
-def create_frontend_blueprint(database: radar_database.RadarDatabase) -> Blueprint:  # pylint: disable=W0613
+# Live streams send a comment this often, so proxies keep them open, and end after a while, so
+# they don't tie up a worker forever. Browsers reconnect where they left off. Servers that handle
+# one request per worker at a time only answer with the changes so far, so browsers poll instead.
+_LIVE_KEEPALIVE_SECONDS = 15.0
+_LIVE_STREAM_SECONDS = 300.0
+
+# Number of rendered pages kept for reuse
+_CACHED_PAGES = 256
+
+
+def _format_timestamp(timestamp: typing.Optional[float]) -> str:
+    """Formats a UNIX timestamp for display, in UTC."""
+    if timestamp is None:
+        return "unknown"
+    return time.strftime("%Y-%m-%d %H:%M:%S UTC", time.gmtime(timestamp))
+
+
+def _live_message(sequence: int,
+                  changed_events: typing.Sequence[typing.Tuple[int, radar_common.EventIdentifier,
+                                                               int]]) -> str:
+    """Formats occurrence changes as a server-sent event."""
+    severities: typing.Dict[int, int] = dict()
+    for _, event_identifier, added in changed_events:
+        severity = int(event_identifier.severity)
+        severities[severity] = severities.get(severity, 0) + added
+
+    data = {"sequence": sequence,
+            "events": [{"index": event_index,
+                        "severity": int(event_identifier.severity),
+                        "location": event_identifier.location,
+                        "description": event_identifier.description,
+                        "added": added}
+                       for event_index, event_identifier, added in changed_events],
+            "severities": severities}
+    return f"id: {sequence}\ndata: {json.dumps(data)}\n\n"
+
+
+def _freeze_frame_columns(
+        selected_columns: typing.Sequence[str],
+        freeze_frames: typing.Sequence[typing.Tuple[uuid.UUID, radar_common.FreezeFrameData]]
+) -> typing.List[str]:
+    """Lists the selected columns and the keys of the shown freeze frames, in order of use."""
+    keys = list(selected_columns)
+    for _, freeze_frame in freeze_frames:
+        keys.extend(freeze_frame)
+    return list(dict.fromkeys(keys, None))
+
+
+def create_frontend_blueprint(database: radar_database.RadarDatabase) -> Blueprint:  # pylint: disable=W0613,R0915
     """Creates the frontend blueprint."""
     frontend = Blueprint(__name__, __name__, template_folder='templates')
 
+    # Rendered pages by path, least recently used first, with the ETag naming the database
+    # versions they show. The token keeps ETags apart from those of other processes, whose version
+    # numbers differ.
+    rendered_pages: typing.Dict[str, typing.Tuple[str, str]] = dict()
+    rendered_pages_lock = threading.Lock()
+    etag_token = uuid.uuid4().hex[:8]
+
+    def cached(versions: typing.Callable[..., typing.Sequence[int]]  # type: ignore
+               ) -> typing.Callable[[typing.Callable[..., str]], typing.Callable[..., Response]]:
+        """Reuses the rendered page until the database versions it shows change.
+
+        Responses carry the versions as ETag, so clients that already have the current page get
+        an empty 304 response.
+
+        Args:
+            versions: Gets the versions of the data the page shows, given the view arguments.
+        """
+        def decorator(view: typing.Callable[..., str]  # type: ignore
+                      ) -> typing.Callable[..., Response]:
+            @functools.wraps(view)  # type: ignore
+            def wrapper(**kwargs: typing.Any) -> Response:  # type: ignore
+                shown_versions: typing.Sequence[int] = versions(**kwargs)  # type: ignore
+                etag = "-".join([etag_token] + [str(version) for version in shown_versions])
+                if request.if_none_match.contains(etag):  # type: ignore
+                    response = Response(status=304)
+                else:
+                    with rendered_pages_lock:
+                        rendered_etag, page = rendered_pages.pop(request.full_path, ("", ""))
+                    if rendered_etag != etag:
+                        page = view(**kwargs)  # type: ignore
+                    with rendered_pages_lock:
+                        rendered_pages[request.full_path] = (etag, page)
+                        while len(rendered_pages) > _CACHED_PAGES:
+                            del rendered_pages[next(iter(rendered_pages))]
+                    response = Response(page, mimetype='text/html')
+
+                response.set_etag(etag)
+                response.cache_control.no_cache = True  # type: ignore
+                return response
+
+            return wrapper
+
+        return decorator  # type: ignore
+
     @frontend.route('/')  # type: ignore
+    @cached(lambda: (database.sequence(), database.event_count()))  # type: ignore
     # type: ignore
     # pylint: disable=W0612
     def index() -> typing.Any:
-        event_identifiers = database.event_identifiers()
+        page: int = max(request.args.get('page', 1, type=int), 1)  # type: ignore
+        per_page: int = min(max(request.args.get(  # type: ignore
+            'per_page', _EVENTS_PER_PAGE, type=int), 1), _MAX_EVENTS_PER_PAGE)
+        sort: str = request.args.get('sort', 'frequency')  # type: ignore
+
+        # Taken first, so the live view may repeat but never miss occurrences
+        sequence = database.sequence()
+        # Pages past the end show the last one
+        event_count = database.event_count()
+        page_count = max(-(-event_count // per_page), 1)
+        page = min(page, page_count)
+        event_frequencies = database.event_frequencies(
+            offset=(page - 1) * per_page, limit=per_page,
+            sort_by_frequency=sort == 'frequency')
 
         context_data = [{
             "index": event_index,
             "severity": radar_common.Severity(event_identifier.severity),
             "location": event_identifier.location,
             "description": event_identifier.description,
-            "frequency": len(database.event(event_index)[1])
-        } for (event_index, event_identifier) in event_identifiers]
+            "frequency": frequency
+        } for (event_index, event_identifier, frequency) in event_frequencies]
 
-        return render_template('index.html', events=context_data)
+        return render_template('index.html', events=context_data,
+                               severity_frequencies=database.severity_frequencies(),
+                               page=page, page_count=page_count, per_page=per_page, sort=sort,
+                               event_count=event_count, sequence=sequence)
 
     @frontend.route('/event_details/<event_index>')  # type: ignore
+    @cached(lambda event_index: (database.event_version(int(event_index)),))  # type: ignore
     # type: ignore
     # pylint: disable=W0612
     def event_details(event_index: str) -> typing.Any:
-        event_identifier, freeze_frames = database.event(int(event_index))
+        page: int = max(request.args.get('page', 1, type=int), 1)  # type: ignore
+        per_page: int = min(max(request.args.get(  # type: ignore
+            'per_page', _FREEZE_FRAMES_PER_PAGE, type=int), 1), _MAX_FREEZE_FRAMES_PER_PAGE)
+        sort: str = request.args.get('sort', '')  # type: ignore
+        order: str = 'desc' if request.args.get('order') == 'desc' else 'asc'  # type: ignore
+        selected_columns: typing.List[str] = request.args.getlist('column')  # type: ignore
+
+        # Only one page of freeze frames is loaded, the summary comes from the counters
+        sequence = database.sequence()
+        statistics = database.event_statistics(int(event_index))
+        summary = database.freeze_frame_summary(int(event_index))
+        # Pages past the end show the last one
+        page_count = max(-(-summary.count // per_page), 1)
+        page = min(page, page_count)
+        event_identifier, freeze_frames = database.event(
+            int(event_index), offset=(page - 1) * per_page, limit=per_page,
+            sort_key=sort or None, descending=order == 'desc')
         context_data = {
             "severity": radar_common.Severity(event_identifier.severity),
             "location": event_identifier.location,
             "description": event_identifier.description
         }
+        summary_data = {
+            "count": statistics.count,
+            "first_seen": _format_timestamp(statistics.first_seen),
+            "last_seen": _format_timestamp(statistics.last_seen),
+            "freeze_frame_count": summary.count,
+            "session_count": summary.session_count
+        }
 
+        available_columns = _freeze_frame_columns(selected_columns, freeze_frames)
         return render_template('event_details.html',
+                               event_index=int(event_index),
                                event_identifier=context_data,
-                               freeze_frames=freeze_frames)
+                               summary=summary_data,
+                               freeze_frames=freeze_frames,
+                               columns=selected_columns or available_columns,
+                               available_columns=available_columns,
+                               selected_columns=selected_columns,
+                               page=page, page_count=page_count,
+                               per_page=per_page, sort=sort, order=order,
+                               sequence=sequence)
 
     @frontend.route('/client_info/<session_id>')  # type: ignore
+    @cached(lambda session_id: (database.client_info_version(),))  # type: ignore
     # type: ignore
     # pylint: disable=W0612
     def client_info(session_id: str) -> typing.Any:
@@ -55,4 +206,54 @@ def create_frontend_blueprint(database: radar_database.RadarDatabase) -> Bluepri
         return render_template('client_info.html',
                                client_info=context_data)
 
+    @frontend.route('/live')  # type: ignore
+    # type: ignore
+    # pylint: disable=W0612
+    def live() -> typing.Any:
+        """Streams the occurrences recorded after a sequence number as server-sent events.
+
+        Each message lists the events that occurred since the previous message and by how much
+        their counters and the severity counters grew. A "reset" event means the changes are no
+        longer known, so the page has to be reloaded.
+
+        Streams are only held open by multithreaded servers, like gunicorn's gthread workers.
+        """
+        after: typing.Optional[int] = request.headers.get(  # type: ignore
+            'Last-Event-ID', type=int)
+        if after is None:
+            after = request.args.get('after', type=int)  # type: ignore
+        if after is None:
+            after = database.sequence()
+        event_index: typing.Optional[int] = request.args.get('event', type=int)  # type: ignore
+        stream_seconds = _LIVE_STREAM_SECONDS if request.environ.get('wsgi.multithread') else 0.0
+
+        def stream(sequence: int) -> typing.Iterator[str]:
+            deadline = time.monotonic() + stream_seconds
+            yield "retry: 1000\n\n"
+            while True:
+                remaining = max(deadline - time.monotonic(), 0.0)
+                changes = database.changes(sequence, min(remaining, _LIVE_KEEPALIVE_SECONDS))
+                if changes is None:
+                    yield "event: reset\ndata: {}\n\n"
+                    return
+
+                previous_sequence, (sequence, changed_events) = sequence, changes
+                if event_index is not None:
+                    changed_events = [change for change in changed_events
+                                      if change[0] == event_index]
+
+                if changed_events:
+                    yield _live_message(sequence, changed_events)
+                elif sequence != previous_sequence:
+                    # Without data, browsers only remember where to reconnect
+                    yield f"id: {sequence}\n\n"
+                else:
+                    yield ": keepalive\n\n"
+
+                if deadline <= time.monotonic():
+                    return
+
+        return Response(stream(after), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
     return frontend
@@ -0,0 +1,276 @@
+"""In-process ingestion queue, which decouples report requests from database writes.
+
+Request handlers only enqueue reports, and a writer thread inserts them into the database. Each
+batch holds everything queued while the previous batch was written, grouped by session, so the
+database sees few large writes instead of many small ones. When the queue is full, reports are
+rejected, so the server can ask clients to retry later instead of running out of memory.
+
+If writing a batch fails, its reports are written one by one, so only the reports that fail on
+their own are lost. Reports should be validated before they are queued, since clients are told
+they were accepted before they are written.
+"""
+import collections
+import itertools
+import logging
+import threading
+import typing
+import uuid
+
+from mlre.radar import radar_common, radar_database, radar_metrics
+
+_LOGGER = logging.getLogger(__name__)
+
+_BATCH_SIZE_BUCKETS: typing.Tuple[float, ...] = (1.0, 10.0, 100.0, 1000.0, 10000.0, 100000.0)
+
+
+_Events = typing.Sequence[typing.Tuple[radar_common.EventIdentifier, radar_common.FreezeFrameData]]
+
+
+class _EventsItem(typing.NamedTuple):
+    """Queued events of a session."""
+
+    session_id: uuid.UUID
+    events: _Events
+
+
+class _AggregatedEventsItem(typing.NamedTuple):
+    """Queued aggregated events of a session."""
+
+    session_id: uuid.UUID
+    aggregated_events: typing.Sequence[radar_common.AggregatedEvent]
+
+
+class _ClientInfoItem(typing.NamedTuple):
+    """Queued client information of a session."""
+
+    session_id: uuid.UUID
+    client_info: radar_common.ClientInfo
+
+
+_Item = typing.Union[_EventsItem, _AggregatedEventsItem, _ClientInfoItem]
+
+
+def _event_count(item: _Item) -> int:
+    """Gets the number of events a queued report holds. Client information counts as one."""
+    if isinstance(item, _EventsItem):
+        return len(item.events)
+    if isinstance(item, _AggregatedEventsItem):
+        return len(item.aggregated_events)
+    return 1
+
+
+class IngestionQueue:  # pylint: disable=R0902
+    """Queues reports in memory and inserts them into a database from a writer thread.
+
+    Queued reports are not visible to queries until they are written, which usually takes a few
+    milliseconds. Freeze frames must not be modified after queueing.
+    """
+
+    def __init__(self,
+                 database: radar_database.RadarDatabase,
+                 max_queued_events: int = 100000,
+                 max_batch_events: int = 10000,
+                 metrics: typing.Optional[radar_metrics.MetricsRegistry] = None) -> None:
+        """Starts the writer thread.
+
+        Args:
+            database: Database to insert reports into.
+            max_queued_events: Maximum number of events waiting to be written. Reports that
+                would exceed it are rejected, unless the queue is empty.
+            max_batch_events: Maximum number of events written together.
+            metrics: Registry to record the queue depth, rejected events and batch sizes in.
+        """
+        self._database: radar_database.RadarDatabase = database
+        self._max_queued_events: int = max_queued_events
+        self._max_batch_events: int = max_batch_events
+
+        self._condition = threading.Condition()
+        self._items: typing.Deque[_Item] = collections.deque()
+        self._queued_events: int = 0
+        self._writing: bool = False
+        self._stopping: bool = False
+
+        registry = metrics if metrics is not None else radar_metrics.MetricsRegistry()
+        registry.gauge("radar_ingestion_queue_depth",
+                       "Number of events waiting to be written to the database.",
+                       lambda: self._queued_events)
+        self._rejected_events = registry.counter(
+            "radar_ingestion_rejected_events_total",
+            "Number of events rejected because the ingestion queue was full.")
+        self._batch_events = registry.histogram(
+            "radar_ingestion_batch_events", "Number of events written to the database together.",
+            buckets=_BATCH_SIZE_BUCKETS)
+
+        self._thread = threading.Thread(
+            target=self._run, name="radar-ingestion", daemon=True)
+        self._thread.start()
+
+    def insert_event(self,
+                     session_id: uuid.UUID,
+                     event_identifier: radar_common.EventIdentifier,
+                     freeze_frame: radar_common.FreezeFrameData) -> bool:
+        """Queues an event.
+
+        Args:
+            session_id: UUID of the reporting session.
+            event_identifier: Identifier of the event.
+            freeze_frame: Freeze frame of the occurrence.
+
+        Returns:
+            Whether the event was queued. It is rejected if the queue is full.
+        """
+        return self._put(_EventsItem(session_id, [(event_identifier, freeze_frame)]))
+
+    def insert_events(self,
+                      session_id: uuid.UUID,
+                      events: _Events) -> bool:
+        """Queues a batch of events.
+
+        Args:
+            session_id: UUID of the reporting session.
+            events: Identifiers and freeze frames of the occurrences.
+
+        Returns:
+            Whether the events were queued. They are rejected if the queue is full.
+        """
+        return self._put(_EventsItem(session_id, events))
+
+    def insert_aggregated_events(
+            self,
+            session_id: uuid.UUID,
+            aggregated_events: typing.Sequence[radar_common.AggregatedEvent]) -> bool:
+        """Queues aggregated events.
+
+        Args:
+            session_id: UUID of the reporting session.
+            aggregated_events: Aggregated occurrences of events.
+
+        Returns:
+            Whether the events were queued. They are rejected if the queue is full.
+        """
+        return self._put(_AggregatedEventsItem(session_id, aggregated_events))
+
+    def insert_client_info(self, session_id: uuid.UUID,
+                           client_info: radar_common.ClientInfo) -> bool:
+        """Queues client information.
+
+        Args:
+            session_id: UUID of the reporting session.
+            client_info: Client information object.
+
+        Returns:
+            Whether the client information was queued. It is rejected if the queue is full.
+        """
+        return self._put(_ClientInfoItem(session_id, client_info))
+
+    def _put(self, item: _Item) -> bool:
+        """Queues a report unless the queue is full."""
+        with self._condition:
+            if self._stopping:
+                raise ValueError("The ingestion queue is closed.")
+
+            # An empty queue takes reports of any size, so large batches are never starved
+            event_count = _event_count(item)
+            if self._queued_events > 0 and\
+                    self._queued_events + event_count > self._max_queued_events:
+                self._rejected_events.inc(amount=event_count)
+                return False
+
+            self._items.append(item)
+            self._queued_events += event_count
+            self._condition.notify_all()
+        return True
+
+    def flush(self) -> None:
+        """Blocks until all queued reports are written."""
+        with self._condition:
+            while self._items or self._writing:
+                self._condition.wait()
+
+    def close(self) -> None:
+        """Writes all queued reports and stops the writer thread."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        self._thread.join()
+
+    def _run(self) -> None:
+        """Writes queued reports in batches until stopped."""
+        while True:
+            with self._condition:
+                while not self._items and not self._stopping:
+                    self._condition.wait()
+                if not self._items:
+                    return
+
+                batch: typing.List[_Item] = list()
+                batch_events = 0
+                while self._items and (not batch or batch_events + _event_count(self._items[0])
+                                       <= self._max_batch_events):
+                    batch.append(self._items.popleft())
+                    batch_events += _event_count(batch[-1])
+                self._writing = True
+
+            try:
+                self._write(batch)
+            finally:
+                with self._condition:
+                    self._queued_events -= batch_events
+                    self._writing = False
+                    self._condition.notify_all()
+            self._batch_events.observe(batch_events)
+
+    def _write(self, batch: typing.Sequence[_Item]) -> None:
+        """Inserts a batch of reports into the database, grouped by session.
+
+        If inserting a group fails, its reports are inserted one by one, and those that still
+        fail are logged and dropped. Reports are validated before they are queued, so this only
+        happens if the database itself fails, which may leave part of a group written twice.
+        """
+        client_infos: typing.List[typing.List[_Item]] = list()
+        events: typing.DefaultDict[uuid.UUID, typing.List[_Item]] = collections.defaultdict(list)
+        aggregated_events: typing.DefaultDict[uuid.UUID, typing.List[_Item]] =\
+            collections.defaultdict(list)
+
+        for item in batch:
+            if isinstance(item, _ClientInfoItem):
+                client_infos.append([item])
+            elif isinstance(item, _EventsItem):
+                events[item.session_id].append(item)
+            else:
+                aggregated_events[item.session_id].append(item)
+
+        for items in itertools.chain(client_infos, events.values(), aggregated_events.values()):
+            try:
+                self._insert(items)
+            except Exception:  # pylint: disable=broad-except
+                if len(items) == 1:
+                    _LOGGER.exception("Failed to write a queued report to the radar database, "
+                                      "dropping it.")
+                    continue
+
+                _LOGGER.warning("Failed to write queued reports to the radar database, "
+                                "retrying them one by one.", exc_info=True)
+                for item in items:
+                    try:
+                        self._insert([item])
+                    except Exception:  # pylint: disable=broad-except
+                        _LOGGER.exception("Failed to write a queued report to the radar "
+                                          "database, dropping it.")
+
+    def _insert(self, items: typing.Sequence[_Item]) -> None:
+        """Inserts reports of the same kind and session into the database at once."""
+        first = items[0]
+        if isinstance(first, _ClientInfoItem):
+            self._database.insert_client_info(first.session_id, first.client_info)
+        elif isinstance(first, _EventsItem):
+            self._database.insert_events(first.session_id, [
+                event for item in items if isinstance(item, _EventsItem)
+                for event in item.events])
+        else:
+            self._database.insert_aggregated_events(first.session_id, [
+                aggregated_event for item in items if isinstance(item, _AggregatedEventsItem)
+                for aggregated_event in item.aggregated_events])
+
+
+__all__ = ["IngestionQueue"]
@@ -0,0 +1,242 @@
+"""Metrics of the radar server in the Prometheus text format.
+
+Metrics are kept in a registry and rendered on request, e.g. by the /metrics endpoint of the API
+server. Updating a metric only takes a short lock, so instrumenting hot paths is cheap.
+"""
+import bisect
+import threading
+import typing
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+#: Upper bounds in seconds of the default latency histogram buckets
+DEFAULT_LATENCY_BUCKETS: typing.Tuple[float, ...] = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+    5.0, 10.0)
+
+#: Upper bounds in bytes of the default size histogram buckets
+DEFAULT_SIZE_BUCKETS: typing.Tuple[float, ...] = (
+    64.0, 256.0, 1024.0, 4096.0, 16384.0, 65536.0, 262144.0, 1048576.0, 4194304.0)
+
+_LabelValues = typing.Tuple[str, ...]
+
+
+def _format_labels(label_names: typing.Sequence[str], label_values: typing.Sequence[str]) -> str:
+    """Formats labels as {name="value",...}, or an empty string without labels."""
+    if not label_names:
+        return ""
+
+    escaped = (value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+               for value in label_values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(label_names, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    """Formats a sample value, writing whole numbers without a fraction."""
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """Counts events, separately for each combination of label values."""
+
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str,
+                 label_names: typing.Sequence[str] = ()) -> None:
+        """Creates a counter. Use MetricsRegistry.counter instead."""
+        self.name: str = name
+        self.documentation: str = documentation
+        self.label_names: typing.Tuple[str, ...] = tuple(label_names)
+        self._lock = threading.Lock()
+        self._values: typing.Dict[_LabelValues, float] = dict()
+
+    def inc(self, label_values: _LabelValues = (), amount: float = 1.0) -> None:
+        """Increases the counter.
+
+        Args:
+            label_values: Values of the counter's labels, in the order of their names.
+            amount: How much to add.
+        """
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def value(self, label_values: _LabelValues = ()) -> float:
+        """Gets the current value of the counter."""
+        return self._values.get(label_values, 0.0)
+
+    def render(self) -> typing.List[str]:
+        """Renders the samples of the counter."""
+        with self._lock:
+            values = sorted(self._values.items())
+
+        return [f"{self.name}{_format_labels(self.label_names, label_values)} "
+                f"{_format_value(value)}"
+                for label_values, value in values]
+
+
+class Histogram:
+    """Counts observations in buckets, separately for each combination of label values."""
+
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str,
+                 label_names: typing.Sequence[str] = (),
+                 buckets: typing.Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> None:
+        """Creates a histogram. Use MetricsRegistry.histogram instead."""
+        self.name: str = name
+        self.documentation: str = documentation
+        self.label_names: typing.Tuple[str, ...] = tuple(label_names)
+        self._bounds: typing.List[float] = sorted(buckets)
+        self._lock = threading.Lock()
+
+        # Per label values: the count of each bucket and of the overflow, and the sum
+        self._counts: typing.Dict[_LabelValues, typing.List[int]] = dict()
+        self._sums: typing.Dict[_LabelValues, float] = dict()
+
+    def observe(self, value: float, label_values: _LabelValues = ()) -> None:
+        """Records an observation.
+
+        Args:
+            value: The observed value, e.g. a duration in seconds.
+            label_values: Values of the histogram's labels, in the order of their names.
+        """
+        bucket = bisect.bisect_left(self._bounds, value)
+        with self._lock:
+            counts = self._counts.get(label_values)
+            if counts is None:
+                counts = self._counts[label_values] = [0] * (len(self._bounds) + 1)
+                self._sums[label_values] = 0.0
+            counts[bucket] += 1
+            self._sums[label_values] += value
+
+    def count(self, label_values: _LabelValues = ()) -> int:
+        """Gets the number of observations."""
+        return sum(self._counts.get(label_values, ()))
+
+    def render(self) -> typing.List[str]:
+        """Renders the cumulative buckets, sum and count of the histogram."""
+        with self._lock:
+            snapshot = sorted((label_values, list(counts), self._sums[label_values])
+                              for label_values, counts in self._counts.items())
+
+        lines: typing.List[str] = list()
+        label_names = self.label_names + ("le",)
+        for label_values, counts, total in snapshot:
+            cumulative = 0
+            for bound, count in zip(self._bounds + [float("inf")], counts):
+                cumulative += count
+                bucket_labels = _format_labels(label_names,
+                                               label_values + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            labels = _format_labels(self.label_names, label_values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+
+        return lines
+
+
+class Gauge:
+    """Reports a current value, e.g. a queue depth, which is read when the metrics are rendered."""
+
+    metric_type = "gauge"
+
+    def __init__(self, name: str, documentation: str,
+                 callback: typing.Callable[[], float]) -> None:
+        """Creates a gauge. Use MetricsRegistry.gauge instead."""
+        self.name: str = name
+        self.documentation: str = documentation
+        self._callback: typing.Callable[[], float] = callback
+
+    def value(self) -> float:
+        """Reads the current value."""
+        return self._callback()
+
+    def render(self) -> typing.List[str]:
+        """Renders the current value of the gauge."""
+        return [f"{self.name} {_format_value(self.value())}"]
+
+
+_Metric = typing.Union[Counter, Histogram, Gauge]
+_MetricType = typing.TypeVar("_MetricType", Counter, Histogram)
+
+
+class MetricsRegistry:
+    """Holds the metrics of a server."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._metrics: typing.Dict[str, _Metric] = dict()
+
+    def counter(self, name: str, documentation: str,
+                label_names: typing.Sequence[str] = ()) -> Counter:
+        """Gets the counter with the given name, creating it if needed.
+
+        Args:
+            name: Name of the metric.
+            documentation: Description of the metric.
+            label_names: Names of the labels that distinguish the counter's values.
+        """
+        return self._get_or_create(name, Counter, lambda: Counter(name, documentation,
+                                                                  label_names))
+
+    def histogram(self, name: str, documentation: str,
+                  label_names: typing.Sequence[str] = (),
+                  buckets: typing.Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        """Gets the histogram with the given name, creating it if needed.
+
+        Args:
+            name: Name of the metric.
+            documentation: Description of the metric.
+            label_names: Names of the labels that distinguish the histogram's values.
+            buckets: Upper bounds of the buckets.
+        """
+        return self._get_or_create(name, Histogram, lambda: Histogram(name, documentation,
+                                                                      label_names, buckets))
+
+    def gauge(self, name: str, documentation: str,
+              callback: typing.Callable[[], float]) -> Gauge:
+        """Registers a gauge, replacing any earlier gauge with the same name.
+
+        Args:
+            name: Name of the metric.
+            documentation: Description of the metric.
+            callback: Returns the current value.
+        """
+        gauge = Gauge(name, documentation, callback)
+        with self._lock:
+            if not isinstance(self._metrics.get(name, gauge), Gauge):
+                raise ValueError(f"Metric {name} is not a gauge!")
+            self._metrics[name] = gauge
+        return gauge
+
+    def _get_or_create(self, name: str, metric_type: typing.Type[_MetricType],
+                       create: typing.Callable[[], _MetricType]) -> _MetricType:
+        """Gets a metric of the given type, or registers the one returned by create."""
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = create()
+            if not isinstance(metric, metric_type):
+                raise ValueError(f"Metric {name} is not a {metric_type.metric_type}!")
+            return metric
+
+    def render(self) -> str:
+        """Renders all metrics in the Prometheus text format."""
+        with self._lock:
+            metrics = sorted(self._metrics.items())
+
+        lines: typing.List[str] = list()
+        for name, metric in metrics:
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.metric_type}")
+            lines.extend(metric.render())
+
+        return "\n".join(lines) + "\n"
+
+
+__all__ = ["CONTENT_TYPE", "DEFAULT_LATENCY_BUCKETS", "DEFAULT_SIZE_BUCKETS", "Counter",
+           "Histogram", "Gauge", "MetricsRegistry"]
@@ -0,0 +1,81 @@
+"""Record log file format of radar databases.
+
+A log starts with LOG_MAGIC, followed by length-prefixed records. Each record is a pickled tuple
+whose first element names its kind:
+
+    ("event_identifier", event_index, event_identifier)
+    ("freeze_frames", event_index, [(session_id, freeze_frame), ...], [timestamp, ...])
+    ("occurrences", event_index, count, first_seen, last_seen)
+    ("client_info", session_id, client_info)
+
+Files written before freeze frame timestamps were saved have no timestamp list. Files written
+before the log format are a single pickled dictionary, which read_legacy_records converts.
+"""
+import pickle  # nosec
+import struct
+import typing
+import uuid
+
+from . import radar_common
+
+# Putting nosec here is safe as long as the database files can be trusted. Since they are not
+# transferred over the network, any attacker would have to have local access.
+
+_EventDataList = typing.List[typing.Tuple[
+    radar_common.EventIdentifier,
+    typing.List[typing.Tuple[uuid.UUID, radar_common.FreezeFrameData]]]]
+
+_ClientInfoDict = typing.Dict[uuid.UUID,
+                              radar_common.ClientInfo]
+
+#: A record, its kind followed by its fields
+Record = typing.Tuple[typing.Any, ...]  # type: ignore
+
+#: Marks a file as a record log
+LOG_MAGIC = b"MLRE-RADAR-LOG-1\n"
+
+_RECORD_HEADER = struct.Struct(">I")
+
+
+def write_record(db_file: typing.BinaryIO, record: Record) -> None:
+    """Appends a length-prefixed record to a log file."""
+    payload = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+    db_file.write(_RECORD_HEADER.pack(len(payload)) + payload)
+
+
+def read_records(db_file: typing.BinaryIO) -> typing.Iterator[Record]:
+    """Reads records from a log file one by one.
+
+    A truncated record at the end of the file, e.g. from a crash during saving, is ignored.
+    """
+    while True:
+        header = db_file.read(_RECORD_HEADER.size)
+        if len(header) < _RECORD_HEADER.size:
+            return
+
+        length: int = _RECORD_HEADER.unpack(header)[0]  # type: ignore
+        payload = db_file.read(length)
+        if len(payload) < length:
+            return
+
+        yield pickle.loads(payload)  # type: ignore  # nosec
+
+
+def read_legacy_records(db_file: typing.BinaryIO) -> typing.Iterator[Record]:
+    """Converts a database file written as one pickled dictionary into records."""
+    db_dict: typing.Mapping[str, typing.Union[_EventDataList,
+                                              _ClientInfoDict]] =\
+        pickle.load(db_file)  # nosec
+    event_data: _EventDataList = db_dict["event_data"]  # type: ignore
+    client_info: _ClientInfoDict = db_dict["client_info"]  # type: ignore
+
+    for session_id, client_info_ in client_info.items():
+        yield ("client_info", session_id, client_info_)
+
+    for event_index, (event_identifier, freeze_frames) in enumerate(event_data):
+        yield ("event_identifier", event_index, event_identifier)
+        yield ("freeze_frames", event_index, freeze_frames)
+        yield ("occurrences", event_index, len(freeze_frames), None, None)
+
+
+__all__ = ["Record", "LOG_MAGIC", "write_record", "read_records", "read_legacy_records"]
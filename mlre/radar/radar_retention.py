@@ -0,0 +1,110 @@
+"""Retention policies, which bound the number and age of the freeze frames kept per event.
+
+Occurrences are always counted, so event statistics stay exact while freeze frames are evicted.
+"""
+import random
+import typing
+
+from . import radar_common
+
+
+class RetentionPolicy(typing.NamedTuple):
+    """Which freeze frames of an event are kept.
+
+    Attributes:
+        max_freeze_frames: Number of freeze frames to keep per event, or None for no limit.
+            Events may hold up to a quarter more between evictions, so evicting is cheap.
+        max_age: Age in seconds after which freeze frames are evicted, or None for no limit.
+            Ages are checked every quarter of max_age.
+        reservoir: If set, the kept freeze frames are a uniform random sample of all
+            occurrences of the event. Otherwise, the newest freeze frames are kept.
+    """
+    max_freeze_frames: typing.Optional[int] = None
+    max_age: typing.Optional[float] = None
+    reservoir: bool = False
+
+
+#: Retention policies by severity. Events of severities without a policy are kept completely.
+RetentionPolicies = typing.Mapping[radar_common.Severity, RetentionPolicy]
+
+
+def eviction_slack(policy: RetentionPolicy) -> int:
+    """Gets how many freeze frames an event may exceed its limit by before evicting."""
+    if policy.max_freeze_frames is None:
+        return 0
+
+    return max(1, policy.max_freeze_frames // 4)
+
+
+def sampled_freeze_frames(policy: RetentionPolicy,
+                          occurrences_before: int,
+                          occurrences: int,
+                          freeze_frame_count: int,
+                          rng: random.Random) -> typing.List[int]:
+    """Decides which freeze frames of new occurrences enter an event's reservoir sample.
+
+    This is the selection step of reservoir sampling. The freeze frames that are replaced are
+    chosen later, by select_evicted.
+
+    Args:
+        policy: Retention policy of the event.
+        occurrences_before: Number of occurrences of the event before the new ones.
+        occurrences: Number of new occurrences. If there are fewer freeze frames, e.g. because
+            the client aggregated the occurrences, each one stands for several occurrences.
+        freeze_frame_count: Number of freeze frames of the new occurrences.
+        rng: Source of randomness.
+
+    Returns:
+        Indices of the freeze frames to store.
+    """
+    if not policy.reservoir or policy.max_freeze_frames is None or freeze_frame_count == 0:
+        return list(range(freeze_frame_count))
+
+    occurrences_per_frame = occurrences / freeze_frame_count
+    return [frame_number for frame_number in range(freeze_frame_count)
+            if rng.random() * (occurrences_before + (frame_number + 1) * occurrences_per_frame)
+            < policy.max_freeze_frames]
+
+
+def select_evicted(policy: RetentionPolicy,
+                   timestamps: typing.Sequence[float],
+                   now: float,
+                   rng: random.Random) -> typing.List[int]:
+    """Selects the freeze frames of an event to evict.
+
+    Args:
+        policy: Retention policy of the event.
+        timestamps: UNIX timestamps of the event's freeze frames, in insertion order.
+        now: Current UNIX timestamp.
+        rng: Source of randomness.
+
+    Returns:
+        Positions of the freeze frames to evict, in ascending order.
+    """
+    positions: typing.List[int] = list(range(len(timestamps)))
+    evicted: typing.Set[int] = set()
+
+    if policy.max_age is not None:
+        # Processes sharing a storage backend may interleave their timestamps, so check all
+        oldest_kept = now - policy.max_age
+        evicted.update(position for position in positions if timestamps[position] < oldest_kept)
+        positions = [position for position in positions if position not in evicted]
+
+    limit = policy.max_freeze_frames
+    if limit is not None and len(positions) > limit:
+        if policy.reservoir and limit > 0:
+            # Each freeze frame stored since the last eviction replaces a random one of the
+            # sample, in insertion order, just as if it had been replaced right away
+            sample = positions[:limit]
+            for position in positions[limit:]:
+                replaced = rng.randrange(limit)
+                evicted.add(sample[replaced])
+                sample[replaced] = position
+        else:
+            evicted.update(positions[:len(positions) - limit])
+
+    return sorted(evicted)
+
+
+__all__ = ["RetentionPolicy", "RetentionPolicies", "eviction_slack", "sampled_freeze_frames",
+           "select_evicted"]
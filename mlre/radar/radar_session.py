@@ -2,51 +2,144 @@
 
 It also handles Radar server discovery.
 """
+import fnmatch
 import os
 import socket
 import typing
 import uuid
 
-from mlre.radar import radar_api_client, radar_common
+from mlre.radar import (radar_api_client, radar_background_reporter,
+                        radar_common, radar_spool, radar_wire_format)
 
 
-class RadarSession:
+def server_endpoint() -> str:
+    """Gets the radar server URL from the environment variable RADAR_SERVER, or the default."""
+    if 'RADAR_SERVER' in os.environ.keys():
+        return os.environ['RADAR_SERVER']
+
+    return "https://127.0.0.1:5000/"
+
+
+def environment_patterns(
+        patterns: typing.Optional[typing.Iterable[str]]) -> typing.Optional[typing.List[str]]:
+    """Copies shell-style environment variable patterns, which may be a one-shot iterable."""
+    return list(patterns) if patterns is not None else None
+
+
+def lifecycle_event(location: str, description: str) -> radar_common.EventIdentifier:
+    """Identifies an event that marks the start or end of a session.
+
+    Args:
+        location: Module of the session.
+        description: "Session started" or "Session ended".
+    """
+    return radar_common.EventIdentifier(severity=radar_common.Severity.INFO,
+                                        location=location,
+                                        description=description)
+
+
+class RadarSession:  # pylint: disable=R0902
     """Radar session object, to be used by clients."""
 
+    def __init__(self,  # pylint: disable=R0913
+                 background: bool = False,
+                 max_queue_size: int = 10000,
+                 queue_full_policy: radar_background_reporter.QueueFullPolicy =
+                 radar_background_reporter.QueueFullPolicy.DROP,
+                 aggregation_window: typing.Optional[float] = None,
+                 environment_allowlist: typing.Optional[typing.Iterable[str]] = None,
+                 environment_denylist: typing.Optional[typing.Iterable[str]] = None,
+                 compression: typing.Optional[str] = None,
+                 content_type: str = radar_wire_format.JSON,
+                 spool_directory: typing.Optional[str] = None):
+        """Configures the radar session.
+
+        Args:
+            background: Whether to send reports from a background thread. Reports are then
+                batched, and reporting does not wait for the server.
+            max_queue_size: Maximum number of reports waiting for the background thread.
+            queue_full_policy: Whether to block or to drop events while the queue is full.
+            aggregation_window: If set, identical events reported within this many seconds are
+                sent as one record with a count and sampled freeze frames.
+            environment_allowlist: If set, only environment variables matching one of these
+                shell-style patterns are reported, e.g. "CUDA_*".
+            environment_denylist: Environment variables matching one of these shell-style
+                patterns are not reported.
+            compression: If set, large reports are compressed with this content encoding,
+                "gzip" or "deflate".
+            content_type: Encoding of reports, e.g. radar_wire_format.MSGPACK for MessagePack.
+            spool_directory: If set, reports are spooled to files in this directory and uploaded
+                in the background, so they are not lost while the server is unreachable.
+        """
+        self._background: bool = background
+        self._max_queue_size: int = max_queue_size
+        self._queue_full_policy: radar_background_reporter.QueueFullPolicy = queue_full_policy
+        self._aggregation_window: typing.Optional[float] = aggregation_window
+        self._environment_allowlist: typing.Optional[typing.List[str]] =\
+            environment_patterns(environment_allowlist)
+        self._environment_denylist: typing.Optional[typing.List[str]] =\
+            environment_patterns(environment_denylist)
+        self._compression: typing.Optional[str] = compression
+        self._content_type: str = content_type
+        self._spool_directory: typing.Optional[str] = spool_directory
+
     def __enter__(self) -> None:
         """Creates a radar session by entering its context."""
         self.session_id = uuid.uuid4()  # pylint: disable=W0201
 
-        if 'RADAR_SERVER' in os.environ.keys():
-            endpoint = os.environ['RADAR_SERVER']
-        else:
-            endpoint = "https://127.0.0.1:5000/"
+        endpoint = server_endpoint()
+        spool = radar_spool.Spool(self._spool_directory)\
+            if self._spool_directory is not None else None
 
-        self.api_client =\
-            radar_api_client.APIClient(  # pylint: disable=W0201
-                endpoint, self.session_id)
+        api_client = radar_api_client.APIClient(
+            endpoint, self.session_id, buffered=self._background,
+            aggregation_window=self._aggregation_window, compression=self._compression,
+            content_type=self._content_type, spool=spool)
+        self.api_client: typing.Union[  # pylint: disable=W0201
+            radar_api_client.APIClient, radar_background_reporter.BackgroundReporter] =\
+            radar_background_reporter.BackgroundReporter(
+                api_client, self._max_queue_size, self._queue_full_policy)\
+            if self._background else api_client
 
         # Report client info
-        client_info = self.collect_client_info()
+        client_info = self.collect_client_info(
+            self._environment_allowlist, self._environment_denylist)
         self.api_client.report_client_info(client_info)
 
         # Report that the session has started
-        event_identifier = radar_common.EventIdentifier(severity=radar_common.Severity.INFO,
-                                                        location=__name__,
-                                                        description="Session started")
-        self.api_client.report_event(event_identifier, {})
+        self.api_client.report_event(lifecycle_event(__name__, "Session started"), {})
 
     def __exit__(self, exc_type: type,  # type: ignore
                  exc_val: Exception,
                  exc_tb: typing.Any) -> None:
 
         # Report that the session has ended
-        event_identifier = radar_common.EventIdentifier(severity=radar_common.Severity.INFO,
-                                                        location=__name__,
-                                                        description="Session ended")
-        self.api_client.report_event(event_identifier, {})
+        self.api_client.report_event(lifecycle_event(__name__, "Session ended"), {})
+
+        # Make sure everything reaches the server before the session is over
+        self.api_client.close()
 
     @staticmethod
-    def collect_client_info() -> radar_common.ClientInfo:
-        """Collects information on the running client."""
-        return radar_common.ClientInfo(socket.gethostname(), os.environ)  # type: ignore
+    def collect_client_info(
+            environment_allowlist: typing.Optional[typing.Iterable[str]] = None,
+            environment_denylist: typing.Optional[typing.Iterable[str]] = None,
+    ) -> radar_common.ClientInfo:
+        """Collects information on the running client.
+
+        The environment is copied, since reports may be sent after it changes.
+
+        Args:
+            environment_allowlist: If set, only environment variables matching one of these
+                shell-style patterns are collected.
+            environment_denylist: Environment variables matching one of these shell-style
+                patterns are not collected.
+        """
+        allowlist = list(environment_allowlist) if environment_allowlist is not None else None
+        denylist = list(environment_denylist) if environment_denylist is not None else []
+
+        environment_variables = {
+            name: value for name, value in os.environ.items()
+            if (allowlist is None or any(fnmatch.fnmatchcase(name, pattern)
+                                         for pattern in allowlist))
+            and not any(fnmatch.fnmatchcase(name, pattern) for pattern in denylist)}
+        return radar_common.ClientInfo(socket.gethostname(), environment_variables)
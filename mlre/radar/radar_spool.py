@@ -0,0 +1,363 @@
+"""Durable client-side spool of radar reports, which survives server outages and client crashes.
+
+Reports are appended to segment files in a local directory, and a worker thread uploads them in
+batches whenever the server is reachable. Each record is its length and CRC32 followed by the
+pickled request, so a record torn by a crash is detected and discarded when the spool is opened
+again. The upload position is kept in a cursor file, and segments are deleted once uploaded.
+
+Uploads are at least once: if the client crashes after a batch reached the server, but before
+the cursor was written, the batch is sent again by the next client using the spool. A spool
+directory must only be used by one client at a time.
+"""
+import logging
+import os
+import pickle  # nosec
+import struct
+import threading
+import time
+import typing
+import zlib
+
+_LOGGER = logging.getLogger(__name__)
+
+# Payload length and CRC32 of each record
+_HEADER = struct.Struct("<II")
+
+_SEGMENT_SUFFIX = ".spool"
+_CURSOR_FILE = "cursor"
+
+#: A spooled request, its API path and request body
+SpooledRequest = typing.Tuple[str, typing.Mapping[str, object]]
+
+#: A position in a spool, the segment number and the offset within it
+Position = typing.Tuple[int, int]
+
+
+def _records(path: str, offset: int, end: typing.Optional[int] = None
+             ) -> typing.Iterator[typing.Tuple[bytes, int]]:
+    """Reads the records of a segment file starting at an offset.
+
+    Stops at the end of the file, at the given end offset, or at the first torn record.
+
+    Yields:
+        The payload of each record and the offset of the record following it.
+    """
+    with open(path, "rb") as file:
+        file.seek(offset)
+        while end is None or offset < end:
+            header = file.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                return
+            length: int
+            checksum: int
+            length, checksum = _HEADER.unpack(header)  # type: ignore
+            payload = file.read(length)
+            if len(payload) < length or zlib.crc32(payload) != checksum:
+                return
+
+            offset += _HEADER.size + length
+            yield payload, offset
+
+
+class Spool:  # pylint: disable=R0902
+    """Append-only log of requests in segment files.
+
+    Appending, reading and committing are thread-safe, but there must only be one reader.
+    """
+
+    def __init__(self,
+                 directory: str,
+                 max_bytes: int = 256 << 20,
+                 max_segment_bytes: int = 4 << 20,
+                 sync: bool = False) -> None:
+        """Opens a spool directory, creating it if needed.
+
+        Records that were not uploaded before the spool was last closed are read again. A torn
+        record at the end, left by a crash while appending, is truncated.
+
+        Args:
+            directory: Directory holding the segment files.
+            max_bytes: Maximum total size of the segment files. Requests that do not fit are
+                dropped until uploaded segments are deleted.
+            max_segment_bytes: Size at which a new segment file is started.
+            sync: Whether to sync every record to disk, so it even survives power loss. Otherwise
+                records survive crashes of the client, but not of the operating system.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self._directory: str = directory
+        self._max_bytes: int = max_bytes
+        self._max_segment_bytes: int = max_segment_bytes
+        self._sync: bool = sync
+        self._lock = threading.Lock()
+        self.dropped_requests: int = 0
+
+        segments = sorted(int(name[:-len(_SEGMENT_SUFFIX)]) for name in os.listdir(directory)
+                          if name.endswith(_SEGMENT_SUFFIX))
+        cursor_segment, cursor_offset = self._read_cursor()
+
+        # Segments before the cursor are uploaded, but a crash kept them from being deleted
+        for segment in [segment for segment in segments if segment < cursor_segment]:
+            os.remove(self._segment_path(segment))
+            segments.remove(segment)
+
+        # Continue writing after the last complete record
+        self._write_segment: int = segments[-1] if segments else cursor_segment
+        self._write_offset: int = 0
+        if segments:
+            for _, self._write_offset in _records(self._segment_path(self._write_segment), 0):
+                pass
+
+        self._read_position: Position = (segments[0] if segments else cursor_segment, 0)
+        if segments and segments[0] == cursor_segment:
+            self._read_position = (cursor_segment, min(cursor_offset, self._write_offset)
+                                   if cursor_segment == self._write_segment else cursor_offset)
+
+        # Owned by the spool until close
+        self._file: typing.BinaryIO = open(self._segment_path(self._write_segment), "ab")
+        self._file.truncate(self._write_offset)
+        self._size: int = sum(os.path.getsize(self._segment_path(segment))
+                              for segment in segments)
+
+    def _segment_path(self, segment: int) -> str:
+        """Gets the path of a segment file."""
+        return os.path.join(self._directory, f"{segment:020d}{_SEGMENT_SUFFIX}")
+
+    def _read_cursor(self) -> Position:
+        """Reads the position of the first request that was not uploaded."""
+        try:
+            with open(os.path.join(self._directory, _CURSOR_FILE), "r") as file:
+                segment, offset = file.read().split()
+                return int(segment), int(offset)
+        except (OSError, ValueError):
+            return 0, 0
+
+    def append(self, request: SpooledRequest) -> bool:
+        """Appends a request to the spool.
+
+        Args:
+            request: API path and request body. The body is pickled.
+
+        Returns:
+            Whether the request was appended. It is dropped if the spool is full.
+        """
+        payload = pickle.dumps(request, protocol=pickle.HIGHEST_PROTOCOL)
+        record = _HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+        with self._lock:
+            if self._size + len(record) > self._max_bytes:
+                self.dropped_requests += 1
+                return False
+
+            if self._write_offset > 0 and\
+                    self._write_offset + len(record) > self._max_segment_bytes:
+                self._file.close()
+                self._write_segment += 1
+                self._write_offset = 0
+                self._file = open(self._segment_path(self._write_segment), "ab")
+
+            self._file.write(record)
+            self._file.flush()
+            if self._sync:
+                os.fsync(self._file.fileno())
+            self._write_offset += len(record)
+            self._size += len(record)
+
+        return True
+
+    def read(self, max_requests: int) -> typing.List[typing.Tuple[SpooledRequest, Position]]:
+        """Reads the oldest requests that were not committed.
+
+        Args:
+            max_requests: Maximum number of requests to read.
+
+        Returns:
+            The requests, each with the position to commit once it is uploaded.
+        """
+        with self._lock:
+            write_segment, write_offset = self._write_segment, self._write_offset
+            segment, offset = self._read_position
+
+        requests: typing.List[typing.Tuple[SpooledRequest, Position]] = list()
+        while len(requests) < max_requests:
+            end = write_offset if segment == write_segment else None
+            for payload, offset in _records(self._segment_path(segment), offset, end):
+                request: SpooledRequest = pickle.loads(payload)  # nosec
+                requests.append((request, (segment, offset)))
+                if len(requests) >= max_requests:
+                    break
+
+            # Earlier segments are complete, so continue with the next one
+            if segment >= write_segment or len(requests) >= max_requests:
+                break
+            segment, offset = segment + 1, 0
+
+        return requests
+
+    def commit(self, position: Position) -> None:
+        """Marks all requests up to a position as uploaded, and deletes uploaded segments.
+
+        Args:
+            position: Position returned by read for the last uploaded request.
+        """
+        with self._lock:
+            cursor_path = os.path.join(self._directory, _CURSOR_FILE)
+            with open(cursor_path + ".tmp", "w") as file:
+                file.write(f"{position[0]} {position[1]}")
+                if self._sync:
+                    file.flush()
+                    os.fsync(file.fileno())
+            os.replace(cursor_path + ".tmp", cursor_path)
+
+            for segment in range(self._read_position[0], position[0]):
+                self._size -= os.path.getsize(self._segment_path(segment))
+                os.remove(self._segment_path(segment))
+            self._read_position = position
+
+    def empty(self) -> bool:
+        """Checks whether all requests were committed."""
+        with self._lock:
+            return self._read_position == (self._write_segment, self._write_offset)
+
+    def close(self) -> None:
+        """Closes the current segment file. Uncommitted requests are kept for the next client."""
+        with self._lock:
+            self._file.close()
+
+
+def _merge(requests: typing.Sequence[typing.Tuple[SpooledRequest, Position]]
+           ) -> typing.List[typing.Tuple[SpooledRequest, Position]]:
+    """Merges consecutive event reports of the same session into one batch request.
+
+    Each merged request comes with the position after the last request it contains.
+    """
+    merged: typing.List[typing.Tuple[SpooledRequest, Position]] = list()
+    # Events of the last merged request, which may be extended by the following requests
+    merged_events: typing.List[object] = list()
+    for (path, request_body), position in requests:
+        events: typing.List[object]
+        if path == "report_event":
+            events = [(request_body["event_identifier"], request_body["freeze_frame"])]
+        elif path == "report_events":
+            events = list(typing.cast(typing.Iterable[object], request_body["events"]))
+        else:
+            merged.append(((path, request_body), position))
+            continue
+
+        if merged and merged[-1][0][0] == "report_events" and\
+                merged[-1][0][1]["session_id"] == request_body["session_id"]:
+            merged_events.extend(events)
+            merged[-1] = (merged[-1][0], position)
+        else:
+            merged_events = events
+            merged.append((("report_events", {"session_id": request_body["session_id"],
+                                              "events": merged_events}), position))
+
+    return merged
+
+
+class SpoolUploader:  # pylint: disable=R0902
+    """Uploads the requests of a spool from a worker thread.
+
+    While the server is unreachable or overloaded, uploads are retried with exponential backoff.
+    Requests the server rejects as invalid are logged and skipped, so they cannot block the spool.
+    """
+
+    def __init__(self,  # pylint: disable=R0913
+                 spool: Spool,
+                 upload: typing.Callable[[str, typing.Mapping[str, object]], int],
+                 max_batch_requests: int = 100,
+                 poll_interval: float = 0.1,
+                 max_backoff: float = 30.0) -> None:
+        """Starts the worker thread.
+
+        Args:
+            spool: Spool to upload from.
+            upload: Sends a request given its API path and body, and returns the HTTP status.
+            max_batch_requests: Maximum number of spooled requests uploaded together.
+            poll_interval: Time in seconds between checks for new requests while idle.
+            max_backoff: Maximum time in seconds between retries of a failed upload.
+        """
+        self._spool: Spool = spool
+        self._upload: typing.Callable[[str, typing.Mapping[str, object]], int] = upload
+        self._max_batch_requests: int = max_batch_requests
+        self._poll_interval: float = poll_interval
+        self._max_backoff: float = max_backoff
+        self._uploaded = threading.Condition()
+        self._stop = threading.Event()
+
+        self._thread = threading.Thread(
+            target=self._run, name="radar-spool-uploader", daemon=True)
+        self._thread.start()
+
+    def flush(self, timeout: typing.Optional[float] = None) -> bool:
+        """Blocks until all spooled requests are uploaded.
+
+        Args:
+            timeout: Maximum time to wait in seconds, or None to wait until the server is back.
+
+        Returns:
+            Whether all requests were uploaded.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._uploaded:
+            while not self._spool.empty():
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._uploaded.wait(remaining)
+        return True
+
+    def close(self, timeout: typing.Optional[float] = None) -> bool:
+        """Uploads the spooled requests, then stops the worker thread.
+
+        Requests that are not uploaded within the timeout stay in the spool.
+
+        Args:
+            timeout: Maximum time to wait for uploads in seconds, or None to wait until the
+                server is back.
+
+        Returns:
+            Whether all requests were uploaded.
+        """
+        uploaded = self.flush(timeout)
+        self._stop.set()
+        self._thread.join()
+        return uploaded
+
+    def _run(self) -> None:
+        """Uploads spooled requests until stopped."""
+        delay = 0.0
+        while not self._stop.wait(delay):
+            try:
+                delay = 0.0 if self._upload_batch() else self._poll_interval
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.warning("Failed to upload spooled radar reports, retrying.",
+                                exc_info=True)
+                delay = min(max(2 * delay, self._poll_interval), self._max_backoff)
+
+    def _upload_batch(self) -> bool:
+        """Uploads the oldest spooled requests.
+
+        Returns:
+            Whether any requests were uploaded.
+
+        Raises:
+            OSError: If the server is unreachable or overloaded, and the upload should be retried.
+        """
+        requests = self._spool.read(self._max_batch_requests)
+        for (path, request_body), position in _merge(requests):
+            status = self._upload(path, request_body)
+            if status == 429 or status >= 500:
+                raise OSError(f"Radar server responded with status {status}.")
+            if status >= 400:
+                _LOGGER.error("Radar server rejected spooled %s with status %d, skipping it.",
+                              path, status)
+
+            self._spool.commit(position)
+            with self._uploaded:
+                self._uploaded.notify_all()
+
+        return bool(requests)
+
+
+__all__ = ["SpooledRequest", "Position", "Spool", "SpoolUploader"]
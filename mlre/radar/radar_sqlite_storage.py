@@ -0,0 +1,383 @@
+"""SQLite storage backend for the radar database."""
+import json
+import sqlite3
+import threading
+import time
+import typing
+import uuid
+
+from . import radar_common, radar_storage
+
+# Number of most recent occurrence records kept in the change log
+_MAX_LOGGED_CHANGES = 1 << 16
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS event_identifiers (
+    event_index INTEGER PRIMARY KEY,
+    severity INTEGER NOT NULL,
+    location TEXT NOT NULL,
+    description TEXT NOT NULL,
+    occurrences INTEGER NOT NULL DEFAULT 0,
+    first_seen REAL,
+    last_seen REAL,
+    stored_frames INTEGER NOT NULL DEFAULT 0,
+    stored_sessions INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (severity, location, description)
+);
+CREATE TABLE IF NOT EXISTS freeze_frames (
+    frame_id INTEGER PRIMARY KEY,
+    event_index INTEGER NOT NULL REFERENCES event_identifiers (event_index),
+    session_id BLOB NOT NULL,
+    freeze_frame TEXT NOT NULL,
+    recorded_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS freeze_frames_by_event ON freeze_frames (event_index, frame_id);
+CREATE INDEX IF NOT EXISTS freeze_frames_by_session
+    ON freeze_frames (session_id, event_index, frame_id);
+CREATE TABLE IF NOT EXISTS event_sessions (
+    event_index INTEGER NOT NULL,
+    session_id BLOB NOT NULL,
+    frames INTEGER NOT NULL,
+    PRIMARY KEY (event_index, session_id)
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS count_inserted_freeze_frame AFTER INSERT ON freeze_frames BEGIN
+    INSERT OR IGNORE INTO event_sessions (event_index, session_id, frames)
+        VALUES (NEW.event_index, NEW.session_id, 0);
+    UPDATE event_identifiers SET stored_frames = stored_frames + 1,
+        stored_sessions = stored_sessions + (
+            SELECT frames = 0 FROM event_sessions
+            WHERE event_index = NEW.event_index AND session_id = NEW.session_id)
+        WHERE event_index = NEW.event_index;
+    UPDATE event_sessions SET frames = frames + 1
+        WHERE event_index = NEW.event_index AND session_id = NEW.session_id;
+END;
+CREATE TRIGGER IF NOT EXISTS count_deleted_freeze_frame AFTER DELETE ON freeze_frames BEGIN
+    UPDATE event_sessions SET frames = frames - 1
+        WHERE event_index = OLD.event_index AND session_id = OLD.session_id;
+    UPDATE event_identifiers SET stored_frames = stored_frames - 1,
+        stored_sessions = stored_sessions - (
+            SELECT frames = 0 FROM event_sessions
+            WHERE event_index = OLD.event_index AND session_id = OLD.session_id)
+        WHERE event_index = OLD.event_index;
+    DELETE FROM event_sessions
+        WHERE event_index = OLD.event_index AND session_id = OLD.session_id AND frames = 0;
+END;
+CREATE TABLE IF NOT EXISTS client_environments (
+    digest TEXT PRIMARY KEY,
+    hostname TEXT NOT NULL,
+    environment_variables TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS client_info (
+    session_id BLOB PRIMARY KEY,
+    digest TEXT NOT NULL REFERENCES client_environments (digest)
+);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+) WITHOUT ROWID;
+INSERT OR IGNORE INTO counters (name, value) VALUES ('client_info', 0);
+CREATE TRIGGER IF NOT EXISTS count_client_info AFTER INSERT ON client_info BEGIN
+    UPDATE counters SET value = value + 1 WHERE name = 'client_info';
+END;
+CREATE TABLE IF NOT EXISTS occurrence_changes (
+    sequence INTEGER PRIMARY KEY AUTOINCREMENT,
+    event_index INTEGER NOT NULL,
+    count INTEGER NOT NULL
+);
+"""
+
+
+def _decode_freeze_frame(freeze_frame: str) -> radar_common.FreezeFrameData:
+    """Decodes a freeze frame stored as JSON."""
+    decoded: radar_common.FreezeFrameData = json.loads(freeze_frame)
+    return decoded
+
+
+class SQLiteStorageBackend(radar_storage.StorageBackend):
+    """Stores radar data in an SQLite database file.
+
+    Every insert is committed immediately, so no data is lost if the server crashes. Several
+    processes can use the same file at once, e.g. the workers of a WSGI server.
+    """
+
+    shared = True
+
+    def __init__(self, path: str, timeout: float = 30.0) -> None:
+        """Opens or creates the database file.
+
+        Args:
+            path: Path of the SQLite database file.
+            timeout: Time in seconds to wait for other processes' writes to finish.
+        """
+        # The connection is shared between the server's threads, access is serialized by the lock.
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(_SCHEMA)
+
+        # Decoded client infos, shared by all sessions with the same digest
+        self._client_info_by_digest: typing.Dict[str,
+                                                 radar_common.ClientInfo] = dict()
+
+    def event_identifiers(self, start: int = 0) -> typing.Sequence[radar_common.EventIdentifier]:
+        with self._lock:
+            rows: typing.List[typing.Tuple[int, str, str]] = \
+                self._connection.execute(  # type: ignore
+                    "SELECT severity, location, description FROM event_identifiers "
+                    "WHERE event_index >= ? ORDER BY event_index", (start,)).fetchall()
+
+        return [radar_common.EventIdentifier(radar_common.Severity(severity), location, description)
+                for severity, location, description in rows]
+
+    def insert_event_identifier(self, event_identifier: radar_common.EventIdentifier) -> int:
+        severity, location, description = event_identifier
+        with self._lock:
+            # The next index is computed inside the statement, so concurrent writers can't race.
+            self._connection.execute(
+                "INSERT OR IGNORE INTO event_identifiers "
+                "(event_index, severity, location, description) "
+                "SELECT COALESCE(MAX(event_index) + 1, 0), ?, ?, ? FROM event_identifiers",
+                (int(severity), location, description))
+            event_index: int = self._connection.execute(  # type: ignore
+                "SELECT event_index FROM event_identifiers "
+                "WHERE severity = ? AND location = ? AND description = ?",
+                (int(severity), location, description)).fetchone()[0]
+
+        return event_index
+
+    def append_freeze_frame(self, event_index: int, session_id: uuid.UUID,
+                            freeze_frame: radar_common.FreezeFrameData,
+                            timestamp: typing.Optional[float] = None) -> None:
+        with self._lock:
+            self._connection.execute(
+                "INSERT INTO freeze_frames (event_index, session_id, freeze_frame, recorded_at) "
+                "VALUES (?, ?, ?, ?)",
+                (event_index, session_id.bytes, json.dumps(freeze_frame),
+                 time.time() if timestamp is None else timestamp))
+
+    def append_freeze_frames(self,
+                             freeze_frames: typing.Iterable[
+                                 typing.Tuple[int, uuid.UUID, radar_common.FreezeFrameData]],
+                             timestamp: typing.Optional[float] = None) -> None:
+        timestamp_ = time.time() if timestamp is None else timestamp
+        rows = [(event_index, session_id.bytes, json.dumps(freeze_frame), timestamp_)
+                for event_index, session_id, freeze_frame in freeze_frames]
+        with self._lock:
+            # One transaction for the whole batch instead of one per freeze frame
+            with self._connection:
+                self._connection.execute("BEGIN IMMEDIATE")
+                self._connection.executemany(
+                    "INSERT INTO freeze_frames "
+                    "(event_index, session_id, freeze_frame, recorded_at) "
+                    "VALUES (?, ?, ?, ?)", rows)
+
+    def freeze_frames(self, event_index: int, start: int = 0,  # pylint: disable=R0913
+                      limit: typing.Optional[int] = None,
+                      session_id: typing.Optional[uuid.UUID] = None,
+                      sort_key: typing.Optional[str] = None,
+                      descending: bool = False) -> radar_storage.FreezeFrameList:
+        # A negative limit means no limit in SQLite
+        limit_ = -1 if limit is None else limit
+        condition = "event_index = ?"
+        arguments: typing.List[object] = [event_index]
+        if session_id is not None:
+            condition = "session_id = ? AND event_index = ?"
+            arguments = [session_id.bytes, event_index]
+
+        order = "frame_id"
+        # JSON paths can't escape quotes, so such keys keep insertion order
+        if sort_key is not None and '"' not in sort_key:
+            # Numbers sort before strings, and freeze frames without the key come last
+            path = f'$."{sort_key}"'
+            order = f"json_extract(freeze_frame, ?) IS NULL, json_extract(freeze_frame, ?) " \
+                f"{'DESC' if descending else 'ASC'}, frame_id"
+            arguments += [path, path]
+        arguments += [limit_, start]
+
+        with self._lock:
+            rows: typing.List[typing.Tuple[bytes, str]] = self._connection.execute(  # type: ignore
+                "SELECT session_id, freeze_frame FROM freeze_frames "
+                f"WHERE {condition} ORDER BY {order} LIMIT ? OFFSET ?", arguments).fetchall()
+
+        return [(uuid.UUID(bytes=session_id_), _decode_freeze_frame(freeze_frame))
+                for session_id_, freeze_frame in rows]
+
+    def freeze_frame_summary(self, event_index: int) -> radar_common.FreezeFrameSummary:
+        with self._lock:
+            # Kept up to date by triggers, so large events are not scanned
+            row: typing.Tuple[int, int] = self._connection.execute(  # type: ignore
+                "SELECT stored_frames, stored_sessions FROM event_identifiers "
+                "WHERE event_index = ?", (event_index,)).fetchone()
+
+        return radar_common.FreezeFrameSummary(*row)
+
+    def freeze_frame_timestamps(self, event_index: int,
+                                start: int = 0) -> typing.Sequence[float]:
+        with self._lock:
+            rows: typing.List[typing.Tuple[float]] = self._connection.execute(  # type: ignore
+                "SELECT recorded_at FROM freeze_frames "
+                "WHERE event_index = ? ORDER BY frame_id LIMIT -1 OFFSET ?",
+                (event_index, start)).fetchall()
+
+        return [recorded_at for (recorded_at,) in rows]
+
+    def evict_freeze_frames(self, event_index: int,
+                            select: typing.Callable[[typing.Sequence[float]],
+                                                    typing.Iterable[int]]) -> int:
+        with self._lock:
+            # The write lock is taken before reading, so other processes can't evict concurrently
+            with self._connection:
+                self._connection.execute("BEGIN IMMEDIATE")
+                rows: typing.List[typing.Tuple[int, float]] = \
+                    self._connection.execute(  # type: ignore
+                        "SELECT frame_id, recorded_at FROM freeze_frames "
+                        "WHERE event_index = ? ORDER BY frame_id", (event_index,)).fetchall()
+                frame_ids: typing.List[typing.Tuple[int]] = [
+                    (rows[position][0],)
+                    for position in set(select([recorded_at for _, recorded_at in rows]))]
+                self._connection.executemany(
+                    "DELETE FROM freeze_frames WHERE frame_id = ?", frame_ids)
+
+        return len(frame_ids)
+
+    def session_event_indices(self, session_id: uuid.UUID) -> typing.AbstractSet[int]:
+        with self._lock:
+            rows: typing.List[typing.Tuple[int]] = self._connection.execute(  # type: ignore
+                "SELECT DISTINCT event_index FROM freeze_frames WHERE session_id = ?",
+                (session_id.bytes,)).fetchall()
+
+        return {event_index for (event_index,) in rows}
+
+    def record_occurrences(self, event_index: int, count: int,
+                           first_seen: typing.Optional[float],
+                           last_seen: typing.Optional[float]) -> None:
+        with self._lock:
+            with self._connection:
+                self._connection.execute("BEGIN IMMEDIATE")
+                # min and max return NULL if any argument is NULL, so fall back to the known value
+                self._connection.execute(
+                    "UPDATE event_identifiers SET occurrences = occurrences + ?, "
+                    "first_seen = COALESCE(MIN(first_seen, ?), first_seen, ?), "
+                    "last_seen = COALESCE(MAX(last_seen, ?), last_seen, ?) "
+                    "WHERE event_index = ?",
+                    (count, first_seen, first_seen, last_seen, last_seen, event_index))
+
+                # Writers are serialized, so every process sees the same change sequence
+                sequence: int = self._connection.execute(  # type: ignore
+                    "INSERT INTO occurrence_changes (event_index, count) VALUES (?, ?)",
+                    (event_index, count)).lastrowid
+                self._connection.execute(
+                    "DELETE FROM occurrence_changes WHERE sequence <= ?",
+                    (sequence - _MAX_LOGGED_CHANGES,))
+
+    def event_statistics(self, event_index: int) -> radar_common.EventStatistics:
+        with self._lock:
+            row: typing.Tuple[int, typing.Optional[float], typing.Optional[float]] =\
+                self._connection.execute(  # type: ignore
+                    "SELECT occurrences, first_seen, last_seen FROM event_identifiers "
+                    "WHERE event_index = ?", (event_index,)).fetchone()
+
+        return radar_common.EventStatistics(*row)
+
+    def occurrence_counts(self) -> typing.Sequence[int]:
+        with self._lock:
+            rows: typing.List[typing.Tuple[int]] = self._connection.execute(  # type: ignore
+                "SELECT occurrences FROM event_identifiers ORDER BY event_index").fetchall()
+
+        return [occurrences for (occurrences,) in rows]
+
+    def change_sequence(self) -> int:
+        with self._lock:
+            sequence: int = self._connection.execute(  # type: ignore
+                "SELECT COALESCE(MAX(sequence), 0) FROM occurrence_changes").fetchone()[0]
+
+        return sequence
+
+    def occurrence_changes(self, after: int) -> typing.Optional[
+            typing.Tuple[int, typing.Sequence[typing.Tuple[int, int]]]]:
+        with self._lock:
+            # All reads see the same snapshot, so the sequence matches the changes
+            with self._connection:
+                self._connection.execute("BEGIN")
+                bounds: typing.Tuple[int, typing.Optional[int]] = \
+                    self._connection.execute(  # type: ignore
+                        "SELECT (SELECT COALESCE(MAX(sequence), 0) FROM occurrence_changes), "
+                        "(SELECT MIN(sequence) FROM occurrence_changes)").fetchone()
+                sequence, oldest = bounds
+                if after > sequence or (oldest is not None and oldest > after + 1):
+                    return None
+
+                rows: typing.List[typing.Tuple[int, int]] = \
+                    self._connection.execute(  # type: ignore
+                        "SELECT event_index, SUM(count) FROM occurrence_changes "
+                        "WHERE sequence > ? GROUP BY event_index ORDER BY event_index",
+                        (after,)).fetchall()
+
+        return sequence, rows
+
+    def insert_client_info(self, session_id: uuid.UUID,
+                           client_info: radar_common.ClientInfo) -> None:
+        # Identical environments are stored once and referenced by their digest
+        digest = radar_storage.client_info_digest(client_info)
+        with self._lock:
+            with self._connection:
+                self._connection.execute("BEGIN IMMEDIATE")
+                self._connection.execute(
+                    "INSERT OR IGNORE INTO client_environments "
+                    "(digest, hostname, environment_variables) VALUES (?, ?, ?)",
+                    (digest, client_info.hostname, json.dumps(client_info.environment_variables)))
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO client_info (session_id, digest) VALUES (?, ?)",
+                    (session_id.bytes, digest))
+
+    def client_info_count(self) -> int:
+        with self._lock:
+            count: int = self._connection.execute(  # type: ignore
+                "SELECT value FROM counters WHERE name = 'client_info'").fetchone()[0]
+
+        return count
+
+    def client_info(self, session_id: uuid.UUID) -> radar_common.ClientInfo:
+        with self._lock:
+            row: typing.Optional[typing.Tuple[str, str, str]] = \
+                self._connection.execute(  # type: ignore
+                    "SELECT client_info.digest, hostname, environment_variables FROM client_info "
+                    "JOIN client_environments USING (digest) WHERE session_id = ?",
+                    (session_id.bytes,)).fetchone()
+
+        if row is None:
+            raise KeyError(session_id)
+
+        return self._decode_client_info(*row)
+
+    def client_infos(self) -> typing.Iterable[typing.Tuple[uuid.UUID, radar_common.ClientInfo]]:
+        with self._lock:
+            rows: typing.List[typing.Tuple[bytes, str, str, str]] = \
+                self._connection.execute(  # type: ignore
+                    "SELECT session_id, client_info.digest, hostname, environment_variables "
+                    "FROM client_info JOIN client_environments USING (digest)").fetchall()
+
+        return [(uuid.UUID(bytes=session_id),
+                 self._decode_client_info(digest, hostname, environment_variables))
+                for session_id, digest, hostname, environment_variables in rows]
+
+    def _decode_client_info(self, digest: str, hostname: str,
+                            environment_variables: str) -> radar_common.ClientInfo:
+        """Decodes a stored client info, or returns the copy decoded before."""
+        client_info = self._client_info_by_digest.get(digest)
+        if client_info is None:
+            environment: typing.Dict[str, str] = json.loads(environment_variables)
+            client_info = radar_storage.intern_client_info(
+                radar_common.ClientInfo(hostname, environment))
+            self._client_info_by_digest[digest] = client_info
+
+        return client_info
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+__all__ = ["SQLiteStorageBackend"]
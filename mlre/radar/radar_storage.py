@@ -0,0 +1,384 @@
+"""Storage backends for the radar database."""
+import abc
+import hashlib
+import json
+import sys
+import typing
+import uuid
+
+from . import radar_common, radar_freeze_frame_columns
+
+FreezeFrameList = typing.List[typing.Tuple[uuid.UUID,
+                                           radar_common.FreezeFrameData]]
+
+
+def merge_event_statistics(first: radar_common.EventStatistics,
+                           second: radar_common.EventStatistics) -> radar_common.EventStatistics:
+    """Combines the statistics of two sets of occurrences of the same event."""
+    first_seen = [timestamp for timestamp in (first.first_seen, second.first_seen)
+                  if timestamp is not None]
+    last_seen = [timestamp for timestamp in (first.last_seen, second.last_seen)
+                 if timestamp is not None]
+    return radar_common.EventStatistics(first.count + second.count,
+                                        min(first_seen) if first_seen else None,
+                                        max(last_seen) if last_seen else None)
+
+
+def client_info_digest(client_info: radar_common.ClientInfo) -> str:
+    """Computes a hash of hostname and environment, identical for identical client infos."""
+    fields: typing.Tuple[str, typing.Dict[str, str]] = (client_info.hostname,
+                                                        client_info.environment_variables)
+    content = json.dumps(fields, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _intern(value: str) -> str:
+    """Interns a string. Clients may report other values, which are returned unchanged."""
+    if type(value) is not str:  # pylint: disable=unidiomatic-typecheck
+        return value
+    return sys.intern(value)
+
+
+def intern_client_info(client_info: radar_common.ClientInfo) -> radar_common.ClientInfo:
+    """Copies a client info, interning its strings.
+
+    Environments of a fleet share most of their variable names and values, so these are only kept
+    in memory once.
+    """
+    return radar_common.ClientInfo(
+        _intern(client_info.hostname),
+        {_intern(name): _intern(value)
+         for name, value in client_info.environment_variables.items()})
+
+
+class StorageBackend(abc.ABC):
+    """Interface for the storage layer underneath a radar database.
+
+    Events are addressed by their index, which is assigned in insertion order starting at zero.
+
+    RadarDatabase serializes storing new identifiers and writes to the same event. Backends have
+    to allow concurrent writes to different events and reads during writes.
+    """
+
+    #: Whether other processes may write to the same storage. A radar database then has to pick up
+    #: identifiers it did not store itself, and can't count occurrences or changes in memory.
+    shared: bool = False
+
+    @abc.abstractmethod
+    def event_identifiers(self, start: int = 0) -> typing.Sequence[radar_common.EventIdentifier]:
+        """Gets the stored event identifiers, ordered by their index.
+
+        Args:
+            start: Index of the first identifier to return.
+        """
+
+    @abc.abstractmethod
+    def insert_event_identifier(self, event_identifier: radar_common.EventIdentifier) -> int:
+        """Stores a new event identifier and returns its index.
+
+        If the identifier is already stored, its existing index is returned.
+
+        Args:
+            event_identifier: Unique identifier of the event.
+        """
+
+    @abc.abstractmethod
+    def append_freeze_frame(self,
+                            event_index: int,
+                            session_id: uuid.UUID,
+                            freeze_frame: radar_common.FreezeFrameData,
+                            timestamp: typing.Optional[float] = None) -> None:
+        """Appends a freeze frame to an event.
+
+        Args:
+            event_index: Index of the event.
+            session_id: Unique session identifier.
+            freeze_frame: A dictionary of helpful measurements.
+            timestamp: UNIX timestamp of the freeze frame, used for retention. Defaults to now.
+        """
+
+    def append_freeze_frames(self,
+                             freeze_frames: typing.Iterable[
+                                 typing.Tuple[int, uuid.UUID, radar_common.FreezeFrameData]],
+                             timestamp: typing.Optional[float] = None) -> None:
+        """Appends several freeze frames at once.
+
+        Backends should override this if storing a batch is cheaper than storing its parts.
+
+        Args:
+            freeze_frames: Triplets of event index, session identifier and freeze frame.
+            timestamp: UNIX timestamp of the freeze frames. Defaults to now.
+        """
+        for event_index, session_id, freeze_frame in freeze_frames:
+            self.append_freeze_frame(event_index, session_id, freeze_frame, timestamp)
+
+    @abc.abstractmethod
+    def freeze_frames(  # pylint: disable=R0913
+            self,
+            event_index: int,
+            start: int = 0,
+            limit: typing.Optional[int] = None,
+            session_id: typing.Optional[uuid.UUID] = None,
+            sort_key: typing.Optional[str] = None,
+            descending: bool = False) -> FreezeFrameList:
+        """Gets the freeze frames of an event in insertion order.
+
+        Args:
+            event_index: Index of the event.
+            start: Number of freeze frames to skip.
+            limit: Maximum number of freeze frames to return.
+            session_id: If given, only freeze frames of this session are considered.
+            sort_key: If given, freeze frames are ordered by their measurement of this key
+                instead, numbers before strings. Freeze frames without it, or with null, come
+                last in insertion order.
+            descending: Whether to order by the measurement in descending order.
+        """
+
+    @abc.abstractmethod
+    def freeze_frame_summary(self, event_index: int) -> radar_common.FreezeFrameSummary:
+        """Counts the stored freeze frames of an event and the sessions they come from.
+
+        Args:
+            event_index: Index of the event.
+        """
+
+    @abc.abstractmethod
+    def freeze_frame_timestamps(self, event_index: int,
+                                start: int = 0) -> typing.Sequence[float]:
+        """Gets the timestamps of the freeze frames of an event in insertion order.
+
+        Args:
+            event_index: Index of the event.
+            start: Number of freeze frames to skip.
+        """
+
+    @abc.abstractmethod
+    def evict_freeze_frames(self, event_index: int,
+                            select: typing.Callable[[typing.Sequence[float]],
+                                                    typing.Iterable[int]]) -> int:
+        """Removes freeze frames of an event.
+
+        The selection and the removal are atomic, also with respect to other processes sharing
+        the storage.
+
+        Args:
+            event_index: Index of the event.
+            select: Gets the timestamps of the event's freeze frames in insertion order, and
+                returns the positions of the freeze frames to remove.
+
+        Returns:
+            The number of removed freeze frames.
+        """
+
+    @abc.abstractmethod
+    def session_event_indices(self, session_id: uuid.UUID) -> typing.AbstractSet[int]:
+        """Gets the indices of all events with freeze frames from the given session.
+
+        Args:
+            session_id: Unique session identifier.
+        """
+
+    @abc.abstractmethod
+    def record_occurrences(self,
+                           event_index: int,
+                           count: int,
+                           first_seen: typing.Optional[float],
+                           last_seen: typing.Optional[float]) -> None:
+        """Adds occurrences to the statistics of an event.
+
+        Args:
+            event_index: Index of the event.
+            count: Number of occurrences to add.
+            first_seen: UNIX timestamp of the first added occurrence, if known.
+            last_seen: UNIX timestamp of the last added occurrence, if known.
+        """
+
+    @abc.abstractmethod
+    def event_statistics(self, event_index: int) -> radar_common.EventStatistics:
+        """Gets the statistics of all occurrences of an event.
+
+        Args:
+            event_index: Index of the event.
+        """
+
+    def occurrence_counts(self) -> typing.Sequence[int]:
+        """Gets how often each event occurred, ordered by event index."""
+        return [self.event_statistics(event_index).count
+                for event_index in range(len(self.event_identifiers()))]
+
+    def change_sequence(self) -> int:
+        """Gets a number that grows whenever occurrences are recorded, by any process.
+
+        Radar databases only use this and occurrence_changes with shared backends, and keep track
+        of the changes themselves otherwise. By default, this is the total number of occurrences.
+        """
+        return sum(self.occurrence_counts())
+
+    def occurrence_changes(self, after: int) -> typing.Optional[
+            typing.Tuple[int, typing.Sequence[typing.Tuple[int, int]]]]:
+        """Gets the occurrences recorded after a change sequence number, by any process.
+
+        By default, no changes are kept, so only an unchanged sequence number can be answered.
+
+        Args:
+            after: Sequence number returned by change_sequence or an earlier call.
+
+        Returns:
+            The current sequence number and pairs of event index and number of new occurrences,
+            ordered by index. None if the changes after the given sequence number are no longer
+            kept.
+        """
+        sequence = self.change_sequence()
+        if after != sequence:
+            return None
+
+        return sequence, ()
+
+    def client_info_count(self) -> int:
+        """Gets the number of times client info was stored so far, by any process.
+
+        Radar databases only use this with shared backends, and count the inserts themselves
+        otherwise. By default, this is the number of sessions with client info, which does not
+        change when client info is replaced.
+        """
+        return sum(1 for _ in self.client_infos())
+
+    @abc.abstractmethod
+    def insert_client_info(self, session_id: uuid.UUID,
+                           client_info: radar_common.ClientInfo) -> None:
+        """Stores client info for a session, replacing any previous info.
+
+        Args:
+            session_id: Unique session identifier.
+            client_info: Client information structure.
+        """
+
+    @abc.abstractmethod
+    def client_info(self, session_id: uuid.UUID) -> radar_common.ClientInfo:
+        """Gets client info of a session. Raises a KeyError for unknown sessions.
+
+        The returned client info may be shared between sessions and must not be modified.
+        """
+
+    @abc.abstractmethod
+    def client_infos(self) -> typing.Iterable[typing.Tuple[uuid.UUID, radar_common.ClientInfo]]:
+        """Iterates over the client info of all sessions."""
+
+    def close(self) -> None:
+        """Releases resources held by the backend."""
+
+
+class MemoryStorageBackend(StorageBackend):
+    """Keeps all radar data in memory.
+
+    Freeze frames are stored column by column, see radar_freeze_frame_columns.
+    """
+
+    def __init__(self) -> None:
+        self._event_identifiers: typing.List[radar_common.EventIdentifier] = list()
+        self._event_index: typing.Dict[radar_common.EventIdentifier, int] = dict()
+        self._freeze_frames: typing.List[radar_freeze_frame_columns.FreezeFrameColumns] = list()
+        self._event_statistics: typing.List[radar_common.EventStatistics] = list()
+        self._events_by_session: typing.Dict[uuid.UUID,
+                                             typing.Set[int]] = dict()
+        self._client_info: typing.Dict[uuid.UUID,
+                                       radar_common.ClientInfo] = dict()
+
+        # Sessions with identical client info share one copy, addressed by its digest
+        self._client_info_by_digest: typing.Dict[str,
+                                                 radar_common.ClientInfo] = dict()
+
+    def event_identifiers(self, start: int = 0) -> typing.Sequence[radar_common.EventIdentifier]:
+        if start == 0:
+            return self._event_identifiers
+
+        return self._event_identifiers[start:]
+
+    def insert_event_identifier(self, event_identifier: radar_common.EventIdentifier) -> int:
+        event_index = self._event_index.get(event_identifier)
+        if event_index is not None:
+            return event_index
+
+        event_index = len(self._event_identifiers)
+        self._event_identifiers.append(event_identifier)
+        self._event_index[event_identifier] = event_index
+        self._freeze_frames.append(
+            radar_freeze_frame_columns.FreezeFrameColumns())
+        self._event_statistics.append(
+            radar_common.EventStatistics(0, None, None))
+        return event_index
+
+    def append_freeze_frame(self, event_index: int, session_id: uuid.UUID,
+                            freeze_frame: radar_common.FreezeFrameData,
+                            timestamp: typing.Optional[float] = None) -> None:
+        self._freeze_frames[event_index].append(session_id, freeze_frame, timestamp)
+        self._events_by_session.setdefault(session_id, set()).add(event_index)
+
+    def freeze_frames(self, event_index: int, start: int = 0,  # pylint: disable=R0913
+                      limit: typing.Optional[int] = None,
+                      session_id: typing.Optional[uuid.UUID] = None,
+                      sort_key: typing.Optional[str] = None,
+                      descending: bool = False) -> FreezeFrameList:
+        stop = None if limit is None else start + limit
+        # There is no per-session index of freeze frames, so filtering by session scans the event
+        return self._freeze_frames[event_index].frames(start, stop, session_id, sort_key,
+                                                       descending)
+
+    def freeze_frame_summary(self, event_index: int) -> radar_common.FreezeFrameSummary:
+        freeze_frames = self._freeze_frames[event_index]
+        return radar_common.FreezeFrameSummary(len(freeze_frames), freeze_frames.session_count())
+
+    def freeze_frame_timestamps(self, event_index: int,
+                                start: int = 0) -> typing.Sequence[float]:
+        return self._freeze_frames[event_index].timestamps(start)
+
+    def evict_freeze_frames(self, event_index: int,
+                            select: typing.Callable[[typing.Sequence[float]],
+                                                    typing.Iterable[int]]) -> int:
+        freeze_frames = self._freeze_frames[event_index]
+        positions = set(select(freeze_frames.timestamps()))
+        if not positions:
+            return 0
+
+        # Readers don't lock, so the freeze frames are replaced instead of modified
+        remaining = freeze_frames.without(positions)
+        self._freeze_frames[event_index] = remaining
+
+        remaining_sessions = remaining.session_ids()
+        for session_id in freeze_frames.session_ids() - remaining_sessions:
+            self._events_by_session[session_id].discard(event_index)
+
+        return len(freeze_frames) - len(remaining)
+
+    def session_event_indices(self, session_id: uuid.UUID) -> typing.AbstractSet[int]:
+        return self._events_by_session.get(session_id, set())
+
+    def record_occurrences(self, event_index: int, count: int,
+                           first_seen: typing.Optional[float],
+                           last_seen: typing.Optional[float]) -> None:
+        self._event_statistics[event_index] = merge_event_statistics(
+            self._event_statistics[event_index],
+            radar_common.EventStatistics(count, first_seen, last_seen))
+
+    def event_statistics(self, event_index: int) -> radar_common.EventStatistics:
+        return self._event_statistics[event_index]
+
+    def insert_client_info(self, session_id: uuid.UUID,
+                           client_info: radar_common.ClientInfo) -> None:
+        digest = client_info_digest(client_info)
+        shared_client_info = self._client_info_by_digest.get(digest)
+        if shared_client_info is None:
+            shared_client_info = intern_client_info(client_info)
+            self._client_info_by_digest[digest] = shared_client_info
+
+        self._client_info[session_id] = shared_client_info
+
+    def client_info(self, session_id: uuid.UUID) -> radar_common.ClientInfo:
+        return self._client_info[session_id]
+
+    def client_infos(self) -> typing.Iterable[typing.Tuple[uuid.UUID, radar_common.ClientInfo]]:
+        return self._client_info.items()
+
+
+__all__ = ["StorageBackend", "MemoryStorageBackend", "client_info_digest", "intern_client_info",
+           "merge_event_statistics"]
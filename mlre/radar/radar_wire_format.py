@@ -0,0 +1,85 @@
+"""Encodings of radar API request and response bodies.
+
+JSON is always supported. MessagePack is more compact, especially for numeric freeze frames, and
+faster to encode and decode. It requires msgpack, which is installed with the "msgpack" extra.
+Client and server agree on an encoding with the HTTP Content-Type and Accept headers.
+"""
+import json
+import typing
+import uuid
+
+try:
+    import msgpack
+except ImportError:  # type: ignore  # pragma: no cover
+    msgpack = None  # pylint: disable=invalid-name
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+
+
+def content_types() -> typing.Tuple[str, ...]:
+    """Gets the content types supported by this installation, JSON first."""
+    if msgpack is None:  # type: ignore
+        return (JSON,)
+
+    return (JSON, MSGPACK)
+
+
+def negotiate(content_type: str, server_content_types: typing.Optional[typing.List[str]]) -> str:
+    """Gets the content type to send reports in, falling back to JSON if the server lacks it.
+
+    Args:
+        content_type: Content type preferred by the client.
+        server_content_types: Content types listed in the server's version response, or None if
+            it lists none, like servers that predate content negotiation and only decode JSON.
+    """
+    if server_content_types is None or content_type not in server_content_types:
+        return JSON
+
+    return content_type
+
+
+def _encode_default(value: object) -> str:
+    """Encodes values that MessagePack does not support natively."""
+    if isinstance(value, uuid.UUID):
+        return str(value)
+
+    raise TypeError(f"Cannot encode {type(value).__name__}!")
+
+
+def encode(value: object, content_type: str) -> bytes:
+    """Encodes a body.
+
+    Args:
+        value: Structure of dictionaries, lists and primitive values. Named tuples such as
+            EventIdentifier are encoded as lists, and UUIDs as strings.
+        content_type: One of content_types().
+    """
+    if content_type == JSON:
+        return json.dumps(value, default=_encode_default).encode("utf-8")
+    if content_type == MSGPACK and msgpack is not None:  # type: ignore
+        return msgpack.packb(value, default=_encode_default, use_bin_type=True)  # type: ignore
+
+    raise ValueError(f"Unsupported content type {content_type}!")
+
+
+def decode(data: bytes, content_type: str) -> typing.Any:  # type: ignore
+    """Decodes a body.
+
+    Args:
+        data: The encoded body.
+        content_type: One of content_types().
+
+    Raises:
+        ValueError: If the content type is not supported, or the body is invalid.
+    """
+    if content_type == JSON:
+        return json.loads(data)  # type: ignore
+    if content_type == MSGPACK and msgpack is not None:  # type: ignore
+        # Malformed data raises subclasses of ValueError
+        return msgpack.unpackb(data, raw=False)  # type: ignore
+
+    raise ValueError(f"Unsupported content type {content_type}!")
+
+
+__all__ = ["JSON", "MSGPACK", "content_types", "negotiate", "encode", "decode"]
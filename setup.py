@@ -21,12 +21,13 @@ setuptools.setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     url="https://github.com/cabrust/mlre",
-    packages=setuptools.find_packages(),
+    packages=setuptools.find_packages(exclude=["benchmarks", "tests"]),
     classifiers=[
         "Programming Language :: Python :: 3",
         "Operating System :: OS Independent",
         "License :: OSI Approved :: BSD License"
     ],
     python_requires='>=3.7',
-    install_requires=["requests==2.22.0", "Flask==1.1.1"]
+    install_requires=["requests==2.22.0", "Flask==1.1.1"],
+    extras_require={"async": ["aiohttp==3.6.2"], "msgpack": ["msgpack==1.0.0"]}
 )
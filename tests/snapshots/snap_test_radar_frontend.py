@@ -8,6 +8,6 @@ snapshots = Snapshot()
 
 snapshots['RadarFrontendTestCase::test_client_info 1'] = b'<!DOCTYPE html>\n<html lang="en">\n<head>\n    <meta charset="UTF-8">\n    <meta name="viewport" content="width=device-width, initial-scale=1, shrink-to-fit=no">\n\n    <!-- Bootstrap CSS -->\n    <link rel="stylesheet" href="https://stackpath.bootstrapcdn.com/bootstrap/4.4.1/css/bootstrap.min.css"\n          integrity="sha384-Vkoo8x4CGsO3+Hhxv8T/Q5PaXtkKtu6ug5TOeNV6gBiFeWPGFN9MuhOf23Q9Ifjh" crossorigin="anonymous">\n\n    <title>MLRE Radar</title>\n</head>\n<body class="d-flex flex-column h-100">\n<main role="main" class="flex-shrink-0">\n    <div id="content" class="container">\n        \n<h1>MLRE Radar Client Info</h1>\n<h2>Information</h2>\n<p>Hostname: test_hostname</p>\n<h2>Environment Variables</h2>\n<table class="table">\n    <thead>\n    <tr>\n        <th>Variable</th>\n        <th>Value</th>\n    </tr>\n    </thead>\n    <tbody>\n    \n    <tr>\n        <td>ENV1</td>\n        <td>env1_test</td>\n    </tr>\n    \n    <tr>\n        <td>ENV2</td>\n        <td>ENV2</td>\n    </tr>\n    \n    </tbody>\n</table>\n\n    </div>\n</main>\n<!-- Optional JavaScript -->\n<!-- jQuery first, then Popper.js, then Bootstrap JS -->\n<script src="https://code.jquery.com/jquery-3.4.1.slim.min.js"\n        integrity="sha384-J6qa4849blE2+poT4WnyKhv5vZF5SrPo0iEjwBvKU7imGFAV0wwj1yYfoRSJoZ+n"\n        crossorigin="anonymous"></script>\n<script src="https://cdn.jsdelivr.net/npm/popper.js@1.16.0/dist/umd/popper.min.js"\n        integrity="sha384-Q6E9RHvbIyZFJoft+2mJbHaEWldlvI9IOYy5n3zV9zzTtmI3UksdQRVvoxMfooAo"\n        crossorigin="anonymous"></script>\n<script src="https://stackpath.bootstrapcdn.com/bootstrap/4.4.1/js/bootstrap.min.js"\n        integrity="sha384-wfSDF2E50Y2D1uUdj0O3uMBJnjuUD4Ih7YwaYd1iqfktj0Uod8GCExl3Og8ifwB6"\n        crossorigin="anonymous"></script>\n</body>\n</html>'
 
-snapshots['RadarFrontendTestCase::test_event_details 1'] = b'<!DOCTYPE html>\n<html lang="en">\n<head>\n    <meta charset="UTF-8">\n    <meta name="viewport" content="width=device-width, initial-scale=1, shrink-to-fit=no">\n\n    <!-- Bootstrap CSS -->\n    <link rel="stylesheet" href="https://stackpath.bootstrapcdn.com/bootstrap/4.4.1/css/bootstrap.min.css"\n          integrity="sha384-Vkoo8x4CGsO3+Hhxv8T/Q5PaXtkKtu6ug5TOeNV6gBiFeWPGFN9MuhOf23Q9Ifjh" crossorigin="anonymous">\n\n    <title>MLRE Radar</title>\n</head>\n<body class="d-flex flex-column h-100">\n<main role="main" class="flex-shrink-0">\n    <div id="content" class="container">\n        \n<h1>MLRE Radar Event Details</h1>\n<h2>Identifier</h2>\n<p>Severity: Severity.INFO</p>\n<p>Location: test_radar_common</p>\n<p>Description: This is a test event</p>\n<h2>Freeze Frame Data</h2>\n<!-- Assume that we always have freeze frames -->\n<table class="table">\n    <thead>\n    <tr>\n        <th>Session</th>\n        \n        <th>test_data</th>\n        \n    </tr>\n    </thead>\n    <tbody>\n    \n    <tr>\n        <td><a href="/client_info/0762a9c4-5717-11ea-b7cb-870634c4994e">0762a9c4-5717-11ea-b7cb-870634c4994e</a></td>\n        \n        <td>1.23456789</td>\n        \n    </tr>\n    \n    <tr>\n        <td><a href="/client_info/b2df89ee-347c-4120-9395-7775bb1be248">b2df89ee-347c-4120-9395-7775bb1be248</a></td>\n        \n        <td>1.23456789</td>\n        \n    </tr>\n    \n    </tbody>\n</table>\n\n    </div>\n</main>\n<!-- Optional JavaScript -->\n<!-- jQuery first, then Popper.js, then Bootstrap JS -->\n<script src="https://code.jquery.com/jquery-3.4.1.slim.min.js"\n        integrity="sha384-J6qa4849blE2+poT4WnyKhv5vZF5SrPo0iEjwBvKU7imGFAV0wwj1yYfoRSJoZ+n"\n        crossorigin="anonymous"></script>\n<script src="https://cdn.jsdelivr.net/npm/popper.js@1.16.0/dist/umd/popper.min.js"\n        integrity="sha384-Q6E9RHvbIyZFJoft+2mJbHaEWldlvI9IOYy5n3zV9zzTtmI3UksdQRVvoxMfooAo"\n        crossorigin="anonymous"></script>\n<script src="https://stackpath.bootstrapcdn.com/bootstrap/4.4.1/js/bootstrap.min.js"\n        integrity="sha384-wfSDF2E50Y2D1uUdj0O3uMBJnjuUD4Ih7YwaYd1iqfktj0Uod8GCExl3Og8ifwB6"\n        crossorigin="anonymous"></script>\n</body>\n</html>'
+snapshots['RadarFrontendTestCase::test_event_details 1'] = b'<!DOCTYPE html>\n<html lang="en">\n<head>\n    <meta charset="UTF-8">\n    <meta name="viewport" content="width=device-width, initial-scale=1, shrink-to-fit=no">\n\n    <!-- Bootstrap CSS -->\n    <link rel="stylesheet" href="https://stackpath.bootstrapcdn.com/bootstrap/4.4.1/css/bootstrap.min.css"\n          integrity="sha384-Vkoo8x4CGsO3+Hhxv8T/Q5PaXtkKtu6ug5TOeNV6gBiFeWPGFN9MuhOf23Q9Ifjh" crossorigin="anonymous">\n\n    <title>MLRE Radar</title>\n</head>\n<body class="d-flex flex-column h-100">\n<main role="main" class="flex-shrink-0">\n    <div id="content" class="container">\n        \n<h1>MLRE Radar Event Details</h1>\n<h2>Identifier</h2>\n<p>Severity: Severity.INFO</p>\n<p>Location: test_radar_common</p>\n<p>Description: This is a test event</p>\n<div id="live-notice" class="alert alert-info d-none">\n    <a href="/event_details/0"><span id="live-new-occurrences">0</span> new occurrences, reload to see their freeze frames.</a>\n</div>\n<h2>Summary</h2>\n<dl class="row">\n    <dt class="col-sm-3">Occurrences</dt>\n    <dd class="col-sm-9">2</dd>\n    <dt class="col-sm-3">First seen</dt>\n    <dd class="col-sm-9">2020-02-25 23:00:00 UTC</dd>\n    <dt class="col-sm-3">Last seen</dt>\n    <dd class="col-sm-9">2020-02-26 00:00:00 UTC</dd>\n    <dt class="col-sm-3">Stored freeze frames</dt>\n    <dd class="col-sm-9">2</dd>\n    <dt class="col-sm-3">Distinct sessions</dt>\n    <dd class="col-sm-9">2</dd>\n</dl>\n<h2>Freeze Frame Data</h2>\n<form class="form-inline mb-3" method="get" action="/event_details/0">\n    \n    <div class="form-check mr-3">\n        <input class="form-check-input" type="checkbox" id="column-1" name="column" value="test_data" checked>\n        <label class="form-check-label" for="column-1">test_data</label>\n    </div>\n    \n    <input type="hidden" name="per_page" value="100">\n    <input type="hidden" name="sort" value="">\n    <input type="hidden" name="order" value="asc">\n    <button type="submit" class="btn btn-secondary btn-sm">Show columns</button>\n</form>\n<table class="table">\n    <thead>\n    <tr>\n        <th><a href="/event_details/0?per_page=100">Session</a></th>\n        \n        <th><a href="/event_details/0?sort=test_data&amp;order=asc&amp;per_page=100">test_data</a></th>\n        \n    </tr>\n    </thead>\n    <tbody>\n    \n    <tr>\n        <td><a href="/client_info/0762a9c4-5717-11ea-b7cb-870634c4994e">0762a9c4-5717-11ea-b7cb-870634c4994e</a></td>\n        \n        <td>1.23456789</td>\n        \n    </tr>\n    \n    <tr>\n        <td><a href="/client_info/b2df89ee-347c-4120-9395-7775bb1be248">b2df89ee-347c-4120-9395-7775bb1be248</a></td>\n        \n        <td>1.23456789</td>\n        \n    </tr>\n    \n    </tbody>\n</table>\n<nav>\n    <ul class="pagination">\n        <li class="page-item disabled">\n            <a class="page-link" href="/event_details/0?page=0&amp;per_page=100&amp;sort=&amp;order=asc">Previous</a>\n        </li>\n        <li class="page-item disabled"><span class="page-link">Page 1 of 1</span></li>\n        <li class="page-item disabled">\n            <a class="page-link" href="/event_details/0?page=2&amp;per_page=100&amp;sort=&amp;order=asc">Next</a>\n        </li>\n    </ul>\n</nav>\n<script>\n(function () {\n    if (!window.EventSource) {\n        return;\n    }\n\n    var newOccurrences = 0;\n    function subscribe(url) {\n        var source = new EventSource(url);\n        source.onmessage = function (message) {\n            JSON.parse(message.data).events.forEach(function (event) {\n                newOccurrences += event.added;\n            });\n            document.getElementById("live-new-occurrences").textContent = newOccurrences;\n            document.getElementById("live-notice").classList.remove("d-none");\n        };\n        // Cached pages may be older than the known changes, while the event did not change\n        source.addEventListener("reset", function () {\n            source.close();\n            subscribe("/live?event=0");\n        });\n    }\n    subscribe("/live?after=7\\u0026event=0");\n})();\n</script>\n\n    </div>\n</main>\n<!-- Optional JavaScript -->\n<!-- jQuery first, then Popper.js, then Bootstrap JS -->\n<script src="https://code.jquery.com/jquery-3.4.1.slim.min.js"\n        integrity="sha384-J6qa4849blE2+poT4WnyKhv5vZF5SrPo0iEjwBvKU7imGFAV0wwj1yYfoRSJoZ+n"\n        crossorigin="anonymous"></script>\n<script src="https://cdn.jsdelivr.net/npm/popper.js@1.16.0/dist/umd/popper.min.js"\n        integrity="sha384-Q6E9RHvbIyZFJoft+2mJbHaEWldlvI9IOYy5n3zV9zzTtmI3UksdQRVvoxMfooAo"\n        crossorigin="anonymous"></script>\n<script src="https://stackpath.bootstrapcdn.com/bootstrap/4.4.1/js/bootstrap.min.js"\n        integrity="sha384-wfSDF2E50Y2D1uUdj0O3uMBJnjuUD4Ih7YwaYd1iqfktj0Uod8GCExl3Og8ifwB6"\n        crossorigin="anonymous"></script>\n</body>\n</html>'
 
-snapshots['RadarFrontendTestCase::test_index 1'] = b'<!DOCTYPE html>\n<html lang="en">\n<head>\n    <meta charset="UTF-8">\n    <meta name="viewport" content="width=device-width, initial-scale=1, shrink-to-fit=no">\n\n    <!-- Bootstrap CSS -->\n    <link rel="stylesheet" href="https://stackpath.bootstrapcdn.com/bootstrap/4.4.1/css/bootstrap.min.css"\n          integrity="sha384-Vkoo8x4CGsO3+Hhxv8T/Q5PaXtkKtu6ug5TOeNV6gBiFeWPGFN9MuhOf23Q9Ifjh" crossorigin="anonymous">\n\n    <title>MLRE Radar</title>\n</head>\n<body class="d-flex flex-column h-100">\n<main role="main" class="flex-shrink-0">\n    <div id="content" class="container">\n        \n<h1>MLRE Radar Overview</h1>\n<table class="table">\n    <thead>\n    <tr>\n        <th scope="col">#</th>\n        <th scope="col">Severity</th>\n        <th scope="col">Location</th>\n        <th scope="col">Description</th>\n        <th scope="col">Frequency</th>\n        <th scope="col"></th>\n    </tr>\n    </thead>\n    <tbody>\n    \n    <tr>\n        <th>0</th>\n        <td>Severity.INFO</td>\n        <td>test_radar_common</td>\n        <td>This is a test event</td>\n        <td>2</td>\n        <td><a href="/event_details/0">Details</a></td>\n    </tr>\n    \n    <tr>\n        <th>1</th>\n        <td>Severity.INFO</td>\n        <td>test_radar_common</td>\n        <td>This is another test event</td>\n        <td>2</td>\n        <td><a href="/event_details/1">Details</a></td>\n    </tr>\n    \n    </tbody>\n</table>\n\n    </div>\n</main>\n<!-- Optional JavaScript -->\n<!-- jQuery first, then Popper.js, then Bootstrap JS -->\n<script src="https://code.jquery.com/jquery-3.4.1.slim.min.js"\n        integrity="sha384-J6qa4849blE2+poT4WnyKhv5vZF5SrPo0iEjwBvKU7imGFAV0wwj1yYfoRSJoZ+n"\n        crossorigin="anonymous"></script>\n<script src="https://cdn.jsdelivr.net/npm/popper.js@1.16.0/dist/umd/popper.min.js"\n        integrity="sha384-Q6E9RHvbIyZFJoft+2mJbHaEWldlvI9IOYy5n3zV9zzTtmI3UksdQRVvoxMfooAo"\n        crossorigin="anonymous"></script>\n<script src="https://stackpath.bootstrapcdn.com/bootstrap/4.4.1/js/bootstrap.min.js"\n        integrity="sha384-wfSDF2E50Y2D1uUdj0O3uMBJnjuUD4Ih7YwaYd1iqfktj0Uod8GCExl3Og8ifwB6"\n        crossorigin="anonymous"></script>\n</body>\n</html>'
+snapshots['RadarFrontendTestCase::test_index 1'] = b'<!DOCTYPE html>\n<html lang="en">\n<head>\n    <meta charset="UTF-8">\n    <meta name="viewport" content="width=device-width, initial-scale=1, shrink-to-fit=no">\n\n    <!-- Bootstrap CSS -->\n    <link rel="stylesheet" href="https://stackpath.bootstrapcdn.com/bootstrap/4.4.1/css/bootstrap.min.css"\n          integrity="sha384-Vkoo8x4CGsO3+Hhxv8T/Q5PaXtkKtu6ug5TOeNV6gBiFeWPGFN9MuhOf23Q9Ifjh" crossorigin="anonymous">\n\n    <title>MLRE Radar</title>\n</head>\n<body class="d-flex flex-column h-100">\n<main role="main" class="flex-shrink-0">\n    <div id="content" class="container">\n        \n<h1>MLRE Radar Overview</h1>\n<p>\n    \n    <span class="badge badge-secondary" data-severity="1">Severity.INFO: <span class="frequency">4</span></span>\n    \n</p>\n<div id="live-notice" class="alert alert-info d-none">\n    <a href="/?page=1&amp;per_page=50&amp;sort=frequency"><span id="live-new-events">0</span> new events, reload to see them.</a>\n</div>\n<table class="table">\n    <thead>\n    <tr>\n        <th scope="col"><a href="/?sort=index&amp;per_page=50">#</a></th>\n        <th scope="col">Severity</th>\n        <th scope="col">Location</th>\n        <th scope="col">Description</th>\n        <th scope="col"><a href="/?sort=frequency&amp;per_page=50">Frequency</a></th>\n        <th scope="col"></th>\n    </tr>\n    </thead>\n    <tbody>\n    \n    <tr id="event-0">\n        <th>0</th>\n        <td>Severity.INFO</td>\n        <td>test_radar_common</td>\n        <td>This is a test event</td>\n        <td class="frequency">2</td>\n        <td><a href="/event_details/0">Details</a></td>\n    </tr>\n    \n    <tr id="event-1">\n        <th>1</th>\n        <td>Severity.INFO</td>\n        <td>test_radar_common</td>\n        <td>This is another test event</td>\n        <td class="frequency">2</td>\n        <td><a href="/event_details/1">Details</a></td>\n    </tr>\n    \n    </tbody>\n</table>\n<nav>\n    <ul class="pagination">\n        <li class="page-item disabled">\n            <a class="page-link" href="/?page=0&amp;per_page=50&amp;sort=frequency">Previous</a>\n        </li>\n        <li class="page-item disabled"><span class="page-link">Page 1 of 1</span></li>\n        <li class="page-item disabled">\n            <a class="page-link" href="/?page=2&amp;per_page=50&amp;sort=frequency">Next</a>\n        </li>\n    </ul>\n</nav>\n<script>\n(function () {\n    if (!window.EventSource) {\n        return;\n    }\n\n    // Update the counters in place, and point out events that are not shown yet\n    var knownEventCount = 2;\n    var newEventCount = 0;\n    var source = new EventSource("/live?after=7");\n    source.onmessage = function (message) {\n        var changes = JSON.parse(message.data);\n        changes.events.forEach(function (event) {\n            var row = document.getElementById("event-" + event.index);\n            if (row) {\n                var cell = row.querySelector(".frequency");\n                cell.textContent = Number(cell.textContent) + event.added;\n            } else if (event.index >= knownEventCount) {\n                knownEventCount = event.index + 1;\n                newEventCount += 1;\n                document.getElementById("live-new-events").textContent = newEventCount;\n                document.getElementById("live-notice").classList.remove("d-none");\n            }\n        });\n        Object.keys(changes.severities).forEach(function (severity) {\n            var badge = document.querySelector(\'[data-severity="\' + severity + \'"] .frequency\');\n            if (badge) {\n                badge.textContent = Number(badge.textContent) + changes.severities[severity];\n            }\n        });\n    };\n    source.addEventListener("reset", function () {\n        source.close();\n        window.location.reload();\n    });\n})();\n</script>\n\n    </div>\n</main>\n<!-- Optional JavaScript -->\n<!-- jQuery first, then Popper.js, then Bootstrap JS -->\n<script src="https://code.jquery.com/jquery-3.4.1.slim.min.js"\n        integrity="sha384-J6qa4849blE2+poT4WnyKhv5vZF5SrPo0iEjwBvKU7imGFAV0wwj1yYfoRSJoZ+n"\n        crossorigin="anonymous"></script>\n<script src="https://cdn.jsdelivr.net/npm/popper.js@1.16.0/dist/umd/popper.min.js"\n        integrity="sha384-Q6E9RHvbIyZFJoft+2mJbHaEWldlvI9IOYy5n3zV9zzTtmI3UksdQRVvoxMfooAo"\n        crossorigin="anonymous"></script>\n<script src="https://stackpath.bootstrapcdn.com/bootstrap/4.4.1/js/bootstrap.min.js"\n        integrity="sha384-wfSDF2E50Y2D1uUdj0O3uMBJnjuUD4Ih7YwaYd1iqfktj0Uod8GCExl3Og8ifwB6"\n        crossorigin="anonymous"></script>\n</body>\n</html>'
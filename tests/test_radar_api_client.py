@@ -1,14 +1,22 @@
 """Test for the radar API connection component."""
+import http.server
 import json
+import tempfile
+import threading
+import time
+import typing
 import unittest
 import urllib.parse
 import uuid
+import zlib
+from unittest import mock
 
 import responses
 
 import mlre
 import test_radar_common
-from mlre.radar import radar_api_client, radar_common
+from mlre.radar import (radar_api_client, radar_common, radar_spool,
+                        radar_wire_format)
 
 
 def _report_test_client_info(connection: radar_api_client.APIClient) -> None:
@@ -23,6 +31,16 @@ def _report_test_event(connection: radar_api_client.APIClient) -> None:
         test_radar_common.TEST_EVENT_FREEZE_FRAME)
 
 
+def _add_version_response(content_types: typing.Optional[typing.List[str]]) -> None:
+    """Adds a mocked version response listing content_types, or none like older servers."""
+    version: typing.Dict[str, object] = {'api': '1', 'mlre': mlre.__version__}
+    if content_types is not None:
+        version['content_types'] = content_types
+    responses.add(responses.GET,
+                  urllib.parse.urljoin(test_radar_common.TEST_ENDPOINT, "version"),
+                  json=version)
+
+
 class PatchedPostRequestRadarAPIClientTestCase(unittest.TestCase):
     """Base class for test cases which patches request.post to always return ok."""
 
@@ -35,6 +53,14 @@ class PatchedPostRequestRadarAPIClientTestCase(unittest.TestCase):
                       urllib.parse.urljoin(
                           test_radar_common.TEST_ENDPOINT, "report_event"),
                       status=200)
+        responses.add(responses.POST,
+                      urllib.parse.urljoin(
+                          test_radar_common.TEST_ENDPOINT, "report_events"),
+                      status=200)
+        responses.add(responses.POST,
+                      urllib.parse.urljoin(
+                          test_radar_common.TEST_ENDPOINT, "report_aggregated_events"),
+                      status=200)
         responses.add(responses.POST,
                       urllib.parse.urljoin(
                           test_radar_common.TEST_ENDPOINT, "report_client_info"),
@@ -74,6 +100,140 @@ class TestRadarAPIClientSessionFlow(PatchedPostRequestRadarAPIClientTestCase):
 class TestRadarAPIClientRequestBodies(PatchedPostRequestRadarAPIClientTestCase):
     """Test case for radar API connection component's request body contents."""
 
+    @responses.activate
+    def test_compressed_request_body(self) -> None:
+        """Check that request bodies above the threshold are compressed."""
+        self.connection = radar_api_client.APIClient(
+            test_radar_common.TEST_ENDPOINT, test_radar_common.TEST_SESSION_UUID,
+            compression="deflate", compression_threshold=1000)
+        _report_test_client_info(self.connection)
+        self.connection.report_event(test_radar_common.TEST_EVENT_IDENTIFIER,
+                                     {"log": "Loss is NaN\n" * 100})
+
+        # The client info is sent as is, only the large event is compressed
+        self.assertNotIn("Content-Encoding", responses.calls[0].request.headers)
+        decoded_request = json.loads(responses.calls[0].request.body)
+        self.assertEqual(test_radar_common.TEST_CLIENT_INFO,
+                         radar_common.ClientInfo(*decoded_request["client_info"]))
+
+        self.assertEqual("deflate", responses.calls[1].request.headers["Content-Encoding"])
+        decoded_request = json.loads(zlib.decompress(responses.calls[1].request.body))
+        self.assertEqual({"log": "Loss is NaN\n" * 100}, decoded_request["freeze_frame"])
+
+        with self.assertRaises(ValueError):
+            radar_api_client.APIClient(test_radar_common.TEST_ENDPOINT,
+                                       test_radar_common.TEST_SESSION_UUID, compression="br")
+
+    @responses.activate
+    @unittest.skipUnless(test_radar_common.MSGPACK_INSTALLED, "msgpack is not installed")
+    def test_msgpack_request_body(self) -> None:
+        """Check that request bodies are encoded in MessagePack if requested."""
+        self.connection = radar_api_client.APIClient(
+            test_radar_common.TEST_ENDPOINT, test_radar_common.TEST_SESSION_UUID,
+            content_type=radar_wire_format.MSGPACK)
+        _add_version_response([radar_wire_format.JSON, radar_wire_format.MSGPACK])
+        _report_test_client_info(self.connection)
+        _report_test_event(self.connection)
+
+        # The server is only asked for its content types once
+        self.assertEqual(3, len(responses.calls))
+        request = responses.calls[2].request
+        self.assertEqual(radar_wire_format.MSGPACK, request.headers["Content-Type"])
+        decoded_request = radar_wire_format.decode(request.body, radar_wire_format.MSGPACK)
+        self.assertEqual(test_radar_common.TEST_EVENT_IDENTIFIER,
+                         radar_common.EventIdentifier(*decoded_request["event_identifier"]))
+        self.assertEqual(test_radar_common.TEST_EVENT_FREEZE_FRAME,
+                         decoded_request["freeze_frame"])
+
+    @responses.activate
+    @unittest.skipUnless(test_radar_common.MSGPACK_INSTALLED, "msgpack is not installed")
+    def test_msgpack_fallback(self) -> None:
+        """Check that the client falls back to JSON if the server does not support MessagePack."""
+        self.connection = radar_api_client.APIClient(
+            test_radar_common.TEST_ENDPOINT, test_radar_common.TEST_SESSION_UUID,
+            content_type=radar_wire_format.MSGPACK)
+        responses.reset()
+        _add_version_response([radar_wire_format.JSON, radar_wire_format.MSGPACK])
+        for status in (415, 200, 200):
+            responses.add(responses.POST,
+                          urllib.parse.urljoin(
+                              test_radar_common.TEST_ENDPOINT, "report_client_info"),
+                          status=status)
+
+        _report_test_client_info(self.connection)
+
+        self.assertEqual(3, len(responses.calls))
+        self.assertEqual(radar_wire_format.JSON,
+                         responses.calls[2].request.headers["Content-Type"])
+        decoded_request = json.loads(responses.calls[2].request.body)
+        self.assertEqual(test_radar_common.TEST_CLIENT_INFO,
+                         radar_common.ClientInfo(*decoded_request["client_info"]))
+
+    @responses.activate
+    @unittest.skipUnless(test_radar_common.MSGPACK_INSTALLED, "msgpack is not installed")
+    def test_msgpack_older_server(self) -> None:
+        """Check that servers listing no content types are only sent JSON."""
+        self.connection = radar_api_client.APIClient(
+            test_radar_common.TEST_ENDPOINT, test_radar_common.TEST_SESSION_UUID,
+            content_type=radar_wire_format.MSGPACK)
+        _add_version_response(None)
+
+        _report_test_client_info(self.connection)
+        _report_test_event(self.connection)
+
+        self.assertEqual([radar_wire_format.JSON, radar_wire_format.JSON],
+                         [call.request.headers["Content-Type"] for call in responses.calls[1:]])
+
+    @responses.activate
+    @unittest.skipUnless(test_radar_common.MSGPACK_INSTALLED, "msgpack is not installed")
+    def test_msgpack_server_error(self) -> None:
+        """Check that reports answered with 500 are not sent again, they may have been stored."""
+        self.connection = radar_api_client.APIClient(
+            test_radar_common.TEST_ENDPOINT, test_radar_common.TEST_SESSION_UUID,
+            content_type=radar_wire_format.MSGPACK)
+        responses.reset()
+        _add_version_response([radar_wire_format.JSON, radar_wire_format.MSGPACK])
+        responses.add(responses.POST,
+                      urllib.parse.urljoin(test_radar_common.TEST_ENDPOINT, "report_client_info"),
+                      status=500)
+
+        _report_test_client_info(self.connection)
+
+        self.assertEqual(2, len(responses.calls))
+        self.assertEqual(radar_wire_format.MSGPACK,
+                         responses.calls[1].request.headers["Content-Type"])
+
+    @responses.activate
+    def test_spool(self) -> None:
+        """Check that spooled reports survive an outage and are uploaded in one batch."""
+        with tempfile.TemporaryDirectory() as directory:
+            # The server is down, so the reports stay in the spool
+            responses.reset()
+            responses.add(responses.POST, urllib.parse.urljoin(
+                test_radar_common.TEST_ENDPOINT, "report_client_info"), status=503)
+            self.connection = radar_api_client.APIClient(
+                test_radar_common.TEST_ENDPOINT, test_radar_common.TEST_SESSION_UUID,
+                spool=radar_spool.Spool(directory), spool_close_timeout=0.0, max_retries=0)
+            _report_test_client_info(self.connection)
+            _report_test_event(self.connection)
+            _report_test_event(self.connection)
+            self.connection.close()
+
+            # The next client using the spool uploads them once the server is back
+            responses.reset()
+            self.setUp()
+            self.connection = radar_api_client.APIClient(
+                test_radar_common.TEST_ENDPOINT, uuid.uuid4(),
+                spool=radar_spool.Spool(directory))
+            self.connection.close()
+
+        self.assertEqual(["report_client_info", "report_events"],
+                         [call.request.url.rsplit("/", 1)[1] for call in responses.calls])
+        decoded_request = json.loads(responses.calls[1].request.body)
+        self.assertEqual(str(test_radar_common.TEST_SESSION_UUID),
+                         decoded_request["session_id"])
+        self.assertEqual(2, len(decoded_request["events"]))
+
     @responses.activate
     def test_report_client_info(self) -> None:
         """Check the request body of a client info report for compliance."""
@@ -121,6 +281,261 @@ class TestRadarAPIClientRequestBodies(PatchedPostRequestRadarAPIClientTestCase):
                          decoded_request["freeze_frame"])
 
 
+class TestRadarAPIClientBuffering(PatchedPostRequestRadarAPIClientTestCase):
+    """Test case for radar API connection component's buffered mode."""
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.connection = radar_api_client.APIClient(
+            test_radar_common.TEST_ENDPOINT, test_radar_common.TEST_SESSION_UUID,
+            buffered=True, max_batch_events=3, max_batch_delay=3600.0)
+
+    def _decode_batch(self, call_index: int) -> typing.List[
+            typing.Tuple[radar_common.EventIdentifier, radar_common.FreezeFrameData]]:
+        """Checks URL and session of a batch request and decodes its events."""
+        self.assertEqual(
+            urllib.parse.urljoin(test_radar_common.TEST_ENDPOINT, "report_events"),
+            responses.calls[call_index].request.url)
+
+        decoded_request = json.loads(responses.calls[call_index].request.body)
+        self.assertEqual(test_radar_common.TEST_SESSION_UUID, uuid.UUID(
+            decoded_request["session_id"]))
+        return [(radar_common.EventIdentifier(*event_identifier), freeze_frame)
+                for event_identifier, freeze_frame in decoded_request["events"]]
+
+    @responses.activate
+    def test_flushes_by_count(self) -> None:
+        """Events should be sent in one request once the batch is full."""
+        _report_test_client_info(self.connection)
+        _report_test_event(self.connection)
+        _report_test_event(self.connection)
+        self.assertEqual(1, len(responses.calls),
+                         "Events should be buffered.")
+
+        _report_test_event(self.connection)
+        self.assertEqual(2, len(responses.calls),
+                         "The full batch should be sent.")
+        self.assertEqual(3 * [(test_radar_common.TEST_EVENT_IDENTIFIER,
+                               test_radar_common.TEST_EVENT_FREEZE_FRAME)],
+                         self._decode_batch(1))
+
+    @responses.activate
+    def test_flushes_by_size(self) -> None:
+        """Events should be sent once the batch exceeds its size limit."""
+        self.connection = radar_api_client.APIClient(
+            test_radar_common.TEST_ENDPOINT, test_radar_common.TEST_SESSION_UUID,
+            buffered=True, max_batch_bytes=1, max_batch_delay=3600.0)
+        _report_test_client_info(self.connection)
+        _report_test_event(self.connection)
+
+        self.assertEqual(2, len(responses.calls))
+        self.assertEqual(1, len(self._decode_batch(1)))
+
+    @responses.activate
+    def test_flushes_by_time(self) -> None:
+        """Events should be sent once the oldest buffered event is too old."""
+        self.connection = radar_api_client.APIClient(
+            test_radar_common.TEST_ENDPOINT, test_radar_common.TEST_SESSION_UUID,
+            buffered=True, max_batch_delay=0.0)
+        _report_test_client_info(self.connection)
+        _report_test_event(self.connection)
+
+        self.assertEqual(2, len(responses.calls))
+        self.assertEqual(1, len(self._decode_batch(1)))
+
+    @responses.activate
+    def test_flush(self) -> None:
+        """Flushing should send the partial batch once."""
+        _report_test_client_info(self.connection)
+        _report_test_event(self.connection)
+        self.connection.flush()
+        self.connection.flush()
+
+        self.assertEqual(2, len(responses.calls))
+        self.assertEqual([(test_radar_common.TEST_EVENT_IDENTIFIER,
+                           test_radar_common.TEST_EVENT_FREEZE_FRAME)],
+                         self._decode_batch(1))
+
+
+class TestRadarAPIClientAggregation(PatchedPostRequestRadarAPIClientTestCase):
+    """Test case for radar API connection component's aggregation mode."""
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.connection = radar_api_client.APIClient(
+            test_radar_common.TEST_ENDPOINT, test_radar_common.TEST_SESSION_UUID,
+            aggregation_window=3600.0, max_aggregated_samples=2)
+
+    def _decode_aggregates(self, call_index: int) -> typing.List[radar_common.AggregatedEvent]:
+        """Checks URL of an aggregated request and decodes its events."""
+        self.assertEqual(
+            urllib.parse.urljoin(test_radar_common.TEST_ENDPOINT, "report_aggregated_events"),
+            responses.calls[call_index].request.url)
+
+        decoded_request = json.loads(responses.calls[call_index].request.body)
+        self.assertEqual(test_radar_common.TEST_SESSION_UUID, uuid.UUID(
+            decoded_request["session_id"]))
+        return [radar_common.AggregatedEvent(radar_common.EventIdentifier(*event_identifier),
+                                             *aggregate)
+                for event_identifier, *aggregate in decoded_request["events"]]
+
+    @responses.activate
+    def test_aggregates_identical_events(self) -> None:
+        """Identical events within the window should be sent as one record on flush."""
+        _report_test_client_info(self.connection)
+        for value in range(5):
+            self.connection.report_event(
+                test_radar_common.TEST_EVENT_IDENTIFIER, {"value": value})
+        self.connection.report_event(
+            test_radar_common.TEST_EVENT_IDENTIFIER_ALTERNATIVE, {"value": 5})
+        self.assertEqual(1, len(responses.calls),
+                         "Events should be aggregated.")
+
+        self.connection.flush()
+
+        self.assertEqual(2, len(responses.calls))
+        aggregates = self._decode_aggregates(1)
+        self.assertEqual([test_radar_common.TEST_EVENT_IDENTIFIER,
+                          test_radar_common.TEST_EVENT_IDENTIFIER_ALTERNATIVE],
+                         [aggregate.event_identifier for aggregate in aggregates])
+        self.assertEqual([5, 1], [aggregate.count for aggregate in aggregates])
+        self.assertEqual(2, len(aggregates[0].freeze_frames),
+                         "Only a sample should be sent.")
+        self.assertLessEqual(aggregates[0].first_seen,
+                             aggregates[0].last_seen)
+        for freeze_frame in aggregates[0].freeze_frames:
+            self.assertIn(freeze_frame["value"], range(5))
+        self.assertEqual([{"value": 5}], aggregates[1].freeze_frames)
+
+    @responses.activate
+    def test_poll_sends_after_window(self) -> None:
+        """Polling should send the aggregates once the window is over."""
+        _report_test_client_info(self.connection)
+        _report_test_event(self.connection)
+        self.connection.poll()
+        self.assertEqual(1, len(responses.calls))
+
+        with mock.patch('time.time', return_value=time.time() + 7200.0):
+            self.connection.poll()
+
+        self.assertEqual(2, len(responses.calls))
+        self.assertEqual(1, self._decode_aggregates(1)[0].count)
+
+
+class _StatusServer(http.server.HTTPServer):
+    """Local HTTP server that answers requests with queued statuses and records their paths."""
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), _StatusHandler)
+        self.statuses: typing.List[int] = list()
+        self.paths: typing.List[str] = list()
+
+
+class _StatusHandler(http.server.BaseHTTPRequestHandler):
+    """Answers with the next queued status, or 200 once there are none left."""
+
+    def do_POST(self) -> None:  # pylint: disable=invalid-name
+        """Records the request and answers it."""
+        server = typing.cast(_StatusServer, self.server)
+        self.rfile.read(int(self.headers["Content-Length"]))
+        server.paths.append(self.path)
+        self.send_response(server.statuses.pop(0) if server.statuses else 200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *_: object) -> None:  # pylint: disable=arguments-differ
+        """Keeps the test output clean."""
+
+
+class TestRadarAPIClientRetries(unittest.TestCase):
+    """Test case for retried requests of the radar API connection component."""
+
+    def setUp(self) -> None:
+        """Starts a local server."""
+        self.server = _StatusServer()
+        self.server_thread = threading.Thread(target=self.server.serve_forever)
+        self.server_thread.start()
+        self.connection = radar_api_client.APIClient(
+            f"http://127.0.0.1:{self.server.server_address[1]}/",
+            test_radar_common.TEST_SESSION_UUID, max_retries=2, retry_backoff=0.0)
+
+    def tearDown(self) -> None:
+        """Stops the local server."""
+        self.connection.close()
+        self.server.shutdown()
+        self.server_thread.join()
+        self.server.server_close()
+
+    def test_retry_unavailable(self) -> None:
+        """Reports answered with 503 should be sent again."""
+        self.server.statuses = [503, 200]
+        _report_test_client_info(self.connection)
+
+        self.assertEqual(["/report_client_info"] * 2, self.server.paths)
+
+    def test_no_retry_after_gateway_error(self) -> None:
+        """Reports answered with 502 may have been stored already and should not be sent again."""
+        self.server.statuses = [502, 200]
+        _report_test_client_info(self.connection)
+
+        self.assertEqual(["/report_client_info"], self.server.paths)
+
+    def test_saturated_queue(self) -> None:
+        """Reports still answered with 503 after the last retry should raise OSError."""
+        self.server.statuses = [503] * 3
+        with self.assertRaises(OSError):
+            _report_test_client_info(self.connection)
+
+        self.assertEqual(["/report_client_info"] * 3, self.server.paths)
+
+
+class TestRadarAPIClientConnectionReuse(unittest.TestCase):
+    """Test case for radar API connection component's HTTP session handling."""
+
+    def setUp(self) -> None:
+        """Patches the requests session type."""
+        self.patcher = mock.patch('requests.Session')
+        self.patched_session_type = self.patcher.start()
+
+        self.connection = radar_api_client.APIClient(
+            test_radar_common.TEST_ENDPOINT, test_radar_common.TEST_SESSION_UUID,
+            pool_size=4, max_retries=2, timeout=5.0)
+
+    def tearDown(self) -> None:
+        """Removes the patch."""
+        self.patcher.stop()
+
+    def test_one_session_for_all_requests(self) -> None:
+        """All requests should go through one keep-alive session with a timeout."""
+        _report_test_client_info(self.connection)
+        _report_test_event(self.connection)
+        self.connection.get_api_version()
+
+        self.assertEqual(1, self.patched_session_type.call_count)
+        http_session = self.patched_session_type.return_value
+        self.assertEqual(2, http_session.post.call_count)
+        self.assertEqual(1, http_session.get.call_count)
+        for call in http_session.post.call_args_list + http_session.get.call_args_list:
+            self.assertEqual(5.0, call[1]['timeout'])
+
+    def test_adapter_configuration(self) -> None:
+        """The session should use a pooled adapter with retries for both schemes."""
+        http_session = self.patched_session_type.return_value
+        self.assertEqual(["http://", "https://"],
+                         [call[0][0] for call in http_session.mount.call_args_list])
+
+        adapter = http_session.mount.call_args[0][1]
+        self.assertEqual(2, adapter.max_retries.total)
+        self.assertEqual(4, adapter._pool_maxsize)  # pylint: disable=protected-access
+
+    def test_close(self) -> None:
+        """Closing should flush and close the session."""
+        self.connection.close()
+
+        self.assertEqual(
+            1, self.patched_session_type.return_value.close.call_count)
+
+
 class TestRadarAPIClientVersionDecode(unittest.TestCase):
     """Test case for the version API call."""
 
@@ -1,12 +1,17 @@
 """Test for radar API server component."""
+import gzip
+import json
 import typing
+import unittest
 import uuid
+from unittest import mock
 
 from flask import Flask, url_for
 
 import mlre
 import test_radar_common
-from mlre.radar import radar_api_server, radar_common
+from mlre.radar import (radar_api_server, radar_common, radar_metrics,
+                        radar_wire_format)
 
 
 class TestRadarAPIServer(test_radar_common.MockedDatabaseTestCase):
@@ -19,8 +24,9 @@ class TestRadarAPIServer(test_radar_common.MockedDatabaseTestCase):
         super().setUp()
 
         # Start test client
+        self.metrics = radar_metrics.MetricsRegistry()
         self.api_server_blueprint = radar_api_server.create_api_server_blueprint(
-            self.database)
+            self.database, self.metrics, compression_threshold=0)
 
         server = Flask(__name__)
         server.register_blueprint(self.api_server_blueprint)
@@ -45,6 +51,8 @@ class TestRadarAPIServer(test_radar_common.MockedDatabaseTestCase):
         self.assertEqual('1', result['api'], "There is only this API version.")
         self.assertEqual(mlre.__version__,
                          result['mlre'], "MLRE version should match module.")
+        self.assertEqual(list(radar_wire_format.content_types()), result['content_types'],
+                         "All supported content types should be listed.")
 
     def test_report_event(self) -> None:
         """Test if the event reporting API calls the database correctly."""
@@ -69,6 +77,107 @@ class TestRadarAPIServer(test_radar_common.MockedDatabaseTestCase):
         self.assertEqual(
             test_radar_common.TEST_EVENT_FREEZE_FRAME, arguments[2])
 
+    def test_report_event_queued(self) -> None:
+        """Test if reports are acknowledged once queued, and rejected while the queue is full."""
+        ingestion_queue = mock.Mock()
+        server = Flask(__name__)
+        server.register_blueprint(radar_api_server.create_api_server_blueprint(
+            self.database, ingestion_queue=ingestion_queue))
+        request_body = {"session_id": str(test_radar_common.TEST_SESSION_UUID),
+                        "event_identifier": test_radar_common.TEST_EVENT_IDENTIFIER,
+                        "freeze_frame": test_radar_common.TEST_EVENT_FREEZE_FRAME}
+
+        with server.test_client() as api_test_client:
+            ingestion_queue.insert_event.return_value = True
+            response = api_test_client.post('/report_event', json=request_body)
+            self.assertEqual(202, response.status_code)
+
+            ingestion_queue.insert_event.return_value = False
+            response = api_test_client.post('/report_event', json=request_body)
+            self.assertEqual(503, response.status_code)
+            self.assertEqual('1', response.headers['Retry-After'])
+
+        ingestion_queue.insert_event.assert_called_with(
+            test_radar_common.TEST_SESSION_UUID, test_radar_common.TEST_EVENT_IDENTIFIER,
+            test_radar_common.TEST_EVENT_FREEZE_FRAME)
+        self.assertEqual([], self.database.method_calls)
+
+    def test_malformed_reports(self) -> None:
+        """Test if reports that can't be written are rejected before they are acknowledged."""
+        ingestion_queue = mock.Mock()
+        server = Flask(__name__)
+        server.register_blueprint(radar_api_server.create_api_server_blueprint(
+            self.database, ingestion_queue=ingestion_queue))
+        session_id = str(test_radar_common.TEST_SESSION_UUID)
+
+        with server.test_client() as api_test_client:
+            for path, request_body in [
+                    ('/report_event', {"session_id": session_id,
+                                       "event_identifier": ["warning", "a", "b"],
+                                       "freeze_frame": {}}),
+                    ('/report_event', {"session_id": session_id,
+                                       "event_identifier": test_radar_common.TEST_EVENT_IDENTIFIER,
+                                       "freeze_frame": [1, 2]}),
+                    ('/report_events', {"session_id": 5, "events": []}),
+                    ('/report_aggregated_events', {"session_id": session_id, "events": [
+                        [test_radar_common.TEST_EVENT_IDENTIFIER, "many", 0.0, 1.0, []]]}),
+                    ('/report_client_info', {"session_id": session_id,
+                                             "client_info": ["host", ["A", "1"]]})]:
+                response = api_test_client.post(path, json=request_body)
+                self.assertEqual(400, response.status_code, path)
+
+        self.assertEqual([], ingestion_queue.method_calls)
+
+    def test_report_events(self) -> None:
+        """Test if the batch event reporting API calls the database correctly."""
+        request_body = {"session_id": str(test_radar_common.TEST_SESSION_UUID),
+                        "events": [(test_radar_common.TEST_EVENT_IDENTIFIER,
+                                    test_radar_common.TEST_EVENT_FREEZE_FRAME),
+                                   (test_radar_common.TEST_EVENT_IDENTIFIER_ALTERNATIVE,
+                                    test_radar_common.TEST_EVENT_FREEZE_FRAME_ALTERNATIVE)]}
+
+        response = self.api_test_client.post(
+            '/report_events', json=request_body)
+
+        self.assertEqual(200, response.status_code)
+
+        self.assertEqual(1, len(self.database.method_calls),
+                         "Number of database calls should be 1")
+
+        # Test if method was called correctly
+        target_method, arguments, _ = self.database.method_calls[0]
+
+        self.assertEqual('insert_events', target_method)
+        self.assertEqual(test_radar_common.TEST_SESSION_UUID, arguments[0])
+        self.assertEqual([(test_radar_common.TEST_EVENT_IDENTIFIER,
+                           test_radar_common.TEST_EVENT_FREEZE_FRAME),
+                          (test_radar_common.TEST_EVENT_IDENTIFIER_ALTERNATIVE,
+                           test_radar_common.TEST_EVENT_FREEZE_FRAME_ALTERNATIVE)],
+                         arguments[1])
+
+    def test_report_aggregated_events(self) -> None:
+        """Test if the aggregated event reporting API calls the database correctly."""
+        aggregated_event = radar_common.AggregatedEvent(
+            test_radar_common.TEST_EVENT_IDENTIFIER, 12, 100.0, 200.0,
+            [test_radar_common.TEST_EVENT_FREEZE_FRAME])
+        request_body = {"session_id": str(test_radar_common.TEST_SESSION_UUID),
+                        "events": [aggregated_event]}
+
+        response = self.api_test_client.post(
+            '/report_aggregated_events', json=request_body)
+
+        self.assertEqual(200, response.status_code)
+
+        self.assertEqual(1, len(self.database.method_calls),
+                         "Number of database calls should be 1")
+
+        # Test if method was called correctly
+        target_method, arguments, _ = self.database.method_calls[0]
+
+        self.assertEqual('insert_aggregated_events', target_method)
+        self.assertEqual(test_radar_common.TEST_SESSION_UUID, arguments[0])
+        self.assertEqual([aggregated_event], arguments[1])
+
     def test_report_client_info(self) -> None:
         """Test if the client info reporting API calls the database correctly."""
         request_body = {"session_id": str(test_radar_common.TEST_SESSION_UUID),
@@ -165,3 +274,140 @@ class TestRadarAPIServer(test_radar_common.MockedDatabaseTestCase):
                          uuid.UUID(result_freeze_frames[1][0]))
         self.assertEqual(test_radar_common.TEST_EVENT_FREEZE_FRAME_ALTERNATIVE,
                          result_freeze_frames[1][1])
+
+    def test_event_identifiers_query(self) -> None:
+        """Test if filters and the page cursor are passed to the database."""
+        response = self.api_test_client.get(
+            url_for("mlre.radar.radar_api_server.event_identifiers",
+                    severity="warning", location_prefix="mlre", description="Loss is NaN",
+                    session_id=str(test_radar_common.TEST_SESSION_UUID), cursor=3, limit=2))
+
+        self.assertEqual(200, response.status_code)
+
+        _, _, keyword_arguments = self.database.method_calls[0]
+        self.assertEqual({"severity": radar_common.Severity.WARNING,
+                          "location_prefix": "mlre",
+                          "description": "Loss is NaN",
+                          "session_id": test_radar_common.TEST_SESSION_UUID,
+                          "after": 3,
+                          "limit": 2}, keyword_arguments)
+
+        # The mocked page is full, so there is a next page after its last index
+        self.assertEqual(1, response.get_json()["next_cursor"])
+
+    def test_event_identifiers_invalid_query(self) -> None:
+        """Test if invalid filters are rejected."""
+        response = self.api_test_client.get(
+            url_for("mlre.radar.radar_api_server.event_identifiers", severity="loud"))
+        self.assertEqual(400, response.status_code)
+
+        response = self.api_test_client.get(
+            url_for("mlre.radar.radar_api_server.event_identifiers", session_id="1234"))
+        self.assertEqual(400, response.status_code)
+
+        self.assertEqual(0, len(self.database.method_calls))
+
+    def test_event_query(self) -> None:
+        """Test if the freeze frame page is passed to the database."""
+        response = self.api_test_client.get(
+            url_for("mlre.radar.radar_api_server.event", event_index=5, offset=10, limit=2,
+                    session_id=str(test_radar_common.TEST_SESSION_UUID)))
+
+        self.assertEqual(200, response.status_code)
+
+        _, arguments, keyword_arguments = self.database.method_calls[0]
+        self.assertEqual((5,), arguments)
+        self.assertEqual({"offset": 10, "limit": 2,
+                          "session_id": test_radar_common.TEST_SESSION_UUID}, keyword_arguments)
+        self.assertEqual(12, response.get_json()["next_offset"])
+
+    def test_metrics(self) -> None:
+        """Test if handled requests are counted and served in the Prometheus format."""
+        self.api_test_client.get('/version')
+        self.api_test_client.get(url_for("mlre.radar.radar_api_server.event", event_index=5))
+        self.api_test_client.get(url_for("mlre.radar.radar_api_server.event", event_index=6))
+
+        response = self.api_test_client.get('/metrics')
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(radar_metrics.CONTENT_TYPE, response.content_type)
+
+        text = response.get_data(as_text=True)
+        self.assertIn('radar_http_requests_total{endpoint="/version",method="GET",status="200"} 1',
+                      text)
+
+        # Requests are labelled by route, not by URL
+        self.assertIn('radar_http_requests_total{endpoint="/event/<event_index>",method="GET",'
+                      'status="200"} 2', text)
+        self.assertIn('radar_http_request_duration_seconds_count{endpoint="/event/<event_index>"}'
+                      ' 2', text)
+
+    def test_compressed_request(self) -> None:
+        """Test if compressed request bodies are decoded."""
+        request_body = {"session_id": str(test_radar_common.TEST_SESSION_UUID),
+                        "client_info": test_radar_common.TEST_CLIENT_INFO}
+
+        response = self.api_test_client.post(
+            '/report_client_info', data=gzip.compress(json.dumps(request_body).encode()),
+            headers={"Content-Encoding": "gzip", "Content-Type": "application/json"})
+
+        self.assertEqual(200, response.status_code)
+        _, arguments, _ = self.database.method_calls[0]
+        self.assertEqual(test_radar_common.TEST_CLIENT_INFO, arguments[1])
+
+    def test_invalid_compressed_request(self) -> None:
+        """Test if unsupported or broken compressed request bodies are rejected."""
+        response = self.api_test_client.post(
+            '/report_client_info', data=b"{}", headers={"Content-Encoding": "br"})
+        self.assertEqual(415, response.status_code)
+
+        response = self.api_test_client.post(
+            '/report_client_info', data=b"{}", headers={"Content-Encoding": "gzip"})
+        self.assertEqual(400, response.status_code)
+
+        self.assertEqual(0, len(self.database.method_calls))
+
+    def test_compressed_response(self) -> None:
+        """Test if event queries are compressed if the client accepts it."""
+        url = url_for("mlre.radar.radar_api_server.event", event_index=5)
+        plain_response = self.api_test_client.get(url)
+        self.assertNotIn("Content-Encoding", plain_response.headers)
+
+        response = self.api_test_client.get(url, headers={"Accept-Encoding": "gzip, deflate"})
+        self.assertEqual(200, response.status_code)
+        self.assertEqual("gzip", response.headers["Content-Encoding"])
+        self.assertIn("Accept-Encoding", response.headers["Vary"])
+        self.assertEqual(plain_response.get_json(),
+                         json.loads(gzip.decompress(response.get_data())))
+
+    @unittest.skipUnless(test_radar_common.MSGPACK_INSTALLED, "msgpack is not installed")
+    def test_msgpack_request(self) -> None:
+        """Test if MessagePack request bodies are decoded."""
+        request_body = {"session_id": str(test_radar_common.TEST_SESSION_UUID),
+                        "event_identifier": test_radar_common.TEST_EVENT_IDENTIFIER,
+                        "freeze_frame": test_radar_common.TEST_EVENT_FREEZE_FRAME}
+
+        response = self.api_test_client.post(
+            '/report_event', data=radar_wire_format.encode(request_body, radar_wire_format.MSGPACK),
+            content_type=radar_wire_format.MSGPACK)
+
+        self.assertEqual(200, response.status_code)
+        _, arguments, _ = self.database.method_calls[0]
+        self.assertEqual(test_radar_common.TEST_EVENT_IDENTIFIER, arguments[1])
+        self.assertEqual(test_radar_common.TEST_EVENT_FREEZE_FRAME, arguments[2])
+
+        response = self.api_test_client.post(
+            '/report_event', data=b"{}", content_type="application/xml")
+        self.assertEqual(415, response.status_code)
+
+    @unittest.skipUnless(test_radar_common.MSGPACK_INSTALLED, "msgpack is not installed")
+    def test_msgpack_response(self) -> None:
+        """Test if event queries are answered in MessagePack if the client prefers it."""
+        url = url_for("mlre.radar.radar_api_server.event", event_index=5)
+        json_response = self.api_test_client.get(url, headers={"Accept": "*/*"})
+        self.assertEqual(radar_wire_format.JSON, json_response.mimetype)
+
+        response = self.api_test_client.get(
+            url, headers={"Accept": "application/msgpack, application/json;q=0.5"})
+        self.assertEqual(radar_wire_format.MSGPACK, response.mimetype)
+        self.assertEqual(json_response.get_json(),
+                         radar_wire_format.decode(response.get_data(), radar_wire_format.MSGPACK))
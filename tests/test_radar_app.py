@@ -1,8 +1,10 @@
 """Test for radar app entry point."""
+import os
 import unittest
 from unittest import mock
 
-from mlre.radar import radar_app, radar_database
+import test_radar_common
+from mlre.radar import radar_app, radar_database, radar_sqlite_storage
 
 
 class TestRadarApp(unittest.TestCase):
@@ -42,3 +44,23 @@ class TestRadarApp(unittest.TestCase):
             create_api_arguments[0], radar_database.RadarDatabase))
         self.assertTrue(isinstance(
             create_frontend_arguments[0], radar_database.RadarDatabase))
+
+    def test_create_default_app_sqlite(self) -> None:
+        """Tests if the default app stores its data in SQLite if RADAR_DATABASE is set."""
+        test_radar_common.remove_sqlite_files(
+            test_radar_common.TEST_SQLITE_FILENAME)
+        os.environ['RADAR_DATABASE'] = test_radar_common.TEST_SQLITE_FILENAME
+        try:
+            radar_app.create_default_app()
+        finally:
+            del os.environ['RADAR_DATABASE']
+
+        create_api_arguments, _ = self.patched_create_api_server_blueprint.call_args
+        database: radar_database.RadarDatabase = create_api_arguments[0]
+        self.assertTrue(isinstance(
+            database._storage,  # pylint: disable=protected-access
+            radar_sqlite_storage.SQLiteStorageBackend))
+
+        database.close()
+        test_radar_common.remove_sqlite_files(
+            test_radar_common.TEST_SQLITE_FILENAME)
@@ -0,0 +1,207 @@
+"""Test for the asyncio radar API connection component."""
+import asyncio
+import typing
+import unittest
+
+from aiohttp import test_utils, web
+
+import mlre
+import test_radar_common
+from mlre.radar import radar_async_api_client, radar_common, radar_wire_format
+
+
+class RecordingServer:
+    """Local HTTP server that records the decoded bodies of radar API requests.
+
+    It lists content_types in its version response, or none like servers that predate content
+    negotiation.
+    """
+
+    def __init__(self, content_types: typing.Optional[typing.List[str]] = None) -> None:
+        self.requests: typing.List[typing.Tuple[str, test_radar_common.DecodedReport]] = list()
+        self.content_encodings: typing.List[typing.Optional[str]] = list()
+        self.content_types: typing.List[str] = list()
+        self.statuses: typing.List[int] = list()
+        self._supported_content_types: typing.Optional[typing.List[str]] = content_types
+        app = web.Application()
+        app.router.add_get('/version', self._version)
+        app.router.add_post('/{path}', self._record)
+        self.server = test_utils.TestServer(app)
+
+    async def __aenter__(self) -> "RecordingServer":
+        await self.server.start_server()
+        return self
+
+    async def __aexit__(self, *_: object) -> None:
+        await self.server.close()
+
+    @property
+    def endpoint(self) -> str:
+        """Base URL of the server."""
+        return str(self.server.make_url('/'))
+
+    @property
+    def paths(self) -> typing.List[str]:
+        """API paths of the recorded requests."""
+        return [path for path, _ in self.requests]
+
+    async def _version(self, _: web.Request) -> web.Response:
+        version: typing.Dict[str, object] = {'api': '1', 'mlre': mlre.__version__}
+        if self._supported_content_types is not None:
+            version['content_types'] = self._supported_content_types
+        return web.json_response(version)
+
+    async def _record(self, request: web.Request) -> web.Response:
+        report = test_radar_common.decode_report(await request.read(), request.content_type)
+        path: str = request.match_info['path']  # type: ignore
+        content_encoding: typing.Optional[str] = \
+            request.headers.get('Content-Encoding')  # type: ignore
+        self.requests.append((path, report))
+        self.content_encodings.append(content_encoding)
+        self.content_types.append(request.content_type)
+
+        # Answers with the queued statuses first, 503 like a server with a full ingestion queue
+        status = self.statuses.pop(0) if self.statuses else 200
+        return web.Response(status=status, headers={'Retry-After': '0'} if status == 503 else {})
+
+
+class TestAsyncAPIClient(unittest.TestCase):
+    """Test case for the asyncio radar API connection component."""
+
+    def test_session_flow(self) -> None:
+        """Events can only be reported after reporting client info exactly once."""
+        async def _run() -> None:
+            async with RecordingServer() as server:
+                async with radar_async_api_client.AsyncAPIClient(
+                        server.endpoint, test_radar_common.TEST_SESSION_UUID) as client:
+                    with self.assertRaises(ValueError):
+                        await client.report_event(test_radar_common.TEST_EVENT_IDENTIFIER,
+                                                  test_radar_common.TEST_EVENT_FREEZE_FRAME)
+
+                    await client.report_client_info(test_radar_common.TEST_CLIENT_INFO)
+                    with self.assertRaises(ValueError):
+                        await client.report_client_info(test_radar_common.TEST_CLIENT_INFO)
+
+        asyncio.run(_run())
+
+    def test_request_bodies(self) -> None:
+        """Requests should have the same bodies as the ones of the blocking client."""
+        async def _run() -> RecordingServer:
+            async with RecordingServer() as server:
+                async with radar_async_api_client.AsyncAPIClient(
+                        server.endpoint, test_radar_common.TEST_SESSION_UUID) as client:
+                    await client.report_client_info(test_radar_common.TEST_CLIENT_INFO)
+                    reports = [asyncio.ensure_future(
+                        client.report_event(test_radar_common.TEST_EVENT_IDENTIFIER,
+                                            test_radar_common.TEST_EVENT_FREEZE_FRAME))
+                               for _ in range(10)]
+                    for report in reports:
+                        await report
+            return server
+
+        server = asyncio.run(_run())
+
+        self.assertEqual(11, len(server.requests))
+        path, report = server.requests[0]
+        self.assertEqual("report_client_info", path)
+        self.assertEqual(test_radar_common.TEST_SESSION_UUID, report.session_id)
+        self.assertEqual(test_radar_common.TEST_CLIENT_INFO, report.client_info)
+
+        for path, report in server.requests[1:]:
+            self.assertEqual("report_event", path)
+            self.assertEqual(test_radar_common.TEST_EVENT_IDENTIFIER, report.event_identifier)
+            self.assertEqual(test_radar_common.TEST_EVENT_FREEZE_FRAME, report.freeze_frame)
+
+    def test_compressed_request_bodies(self) -> None:
+        """Request bodies above the threshold should be compressed."""
+        freeze_frame: radar_common.FreezeFrameData = {"log": "Loss is NaN\n" * 100}
+
+        async def _run() -> RecordingServer:
+            async with RecordingServer() as server:
+                async with radar_async_api_client.AsyncAPIClient(
+                        server.endpoint, test_radar_common.TEST_SESSION_UUID,
+                        compression="gzip", compression_threshold=1000) as client:
+                    await client.report_client_info(test_radar_common.TEST_CLIENT_INFO)
+                    await client.report_event(test_radar_common.TEST_EVENT_IDENTIFIER,
+                                              freeze_frame)
+            return server
+
+        server = asyncio.run(_run())
+
+        content_encodings: typing.List[typing.Optional[str]] = [None, "gzip"]
+        self.assertEqual(content_encodings, server.content_encodings)
+        self.assertEqual(freeze_frame, server.requests[1][1].freeze_frame)
+
+    @unittest.skipUnless(  # type: ignore
+        test_radar_common.MSGPACK_INSTALLED, "msgpack is not installed")
+    def test_msgpack_request_bodies(self) -> None:
+        """Reports should be sent as MessagePack to servers that list it."""
+        async def _run() -> RecordingServer:
+            async with RecordingServer([radar_wire_format.JSON,
+                                        radar_wire_format.MSGPACK]) as server:
+                async with radar_async_api_client.AsyncAPIClient(
+                        server.endpoint, test_radar_common.TEST_SESSION_UUID,
+                        content_type=radar_wire_format.MSGPACK) as client:
+                    await client.report_client_info(test_radar_common.TEST_CLIENT_INFO)
+                    await client.report_event(test_radar_common.TEST_EVENT_IDENTIFIER,
+                                              test_radar_common.TEST_EVENT_FREEZE_FRAME)
+            return server
+
+        server = asyncio.run(_run())
+
+        content_types = [radar_wire_format.MSGPACK] * 2
+        self.assertEqual(content_types, server.content_types)
+        self.assertEqual(test_radar_common.TEST_EVENT_FREEZE_FRAME,
+                         server.requests[1][1].freeze_frame)
+
+    @unittest.skipUnless(  # type: ignore
+        test_radar_common.MSGPACK_INSTALLED, "msgpack is not installed")
+    def test_msgpack_older_server(self) -> None:
+        """Reports should be sent as JSON to servers that list no content types."""
+        async def _run() -> RecordingServer:
+            async with RecordingServer() as server:
+                async with radar_async_api_client.AsyncAPIClient(
+                        server.endpoint, test_radar_common.TEST_SESSION_UUID,
+                        content_type=radar_wire_format.MSGPACK) as client:
+                    await client.report_client_info(test_radar_common.TEST_CLIENT_INFO)
+                    await client.report_event(test_radar_common.TEST_EVENT_IDENTIFIER,
+                                              test_radar_common.TEST_EVENT_FREEZE_FRAME)
+            return server
+
+        server = asyncio.run(_run())
+
+        content_types = [radar_wire_format.JSON] * 2
+        self.assertEqual(content_types, server.content_types)
+        self.assertEqual(test_radar_common.TEST_EVENT_FREEZE_FRAME,
+                         server.requests[1][1].freeze_frame)
+
+    def test_saturated_queue(self) -> None:
+        """Reports answered with 503 should be retried, and raise OSError after the last retry."""
+        async def _run() -> RecordingServer:
+            async with RecordingServer() as server:
+                async with radar_async_api_client.AsyncAPIClient(
+                        server.endpoint, test_radar_common.TEST_SESSION_UUID,
+                        max_retries=2) as client:
+                    server.statuses = [503, 200]
+                    await client.report_client_info(test_radar_common.TEST_CLIENT_INFO)
+
+                    server.statuses = [503] * 3
+                    with self.assertRaises(OSError):
+                        await client.report_event(test_radar_common.TEST_EVENT_IDENTIFIER,
+                                                  test_radar_common.TEST_EVENT_FREEZE_FRAME)
+            return server
+
+        server = asyncio.run(_run())
+
+        paths = ["report_client_info"] * 2 + ["report_event"] * 3
+        self.assertEqual(paths, server.paths)
+
+    def test_versions(self) -> None:
+        """API and MLRE versions should be decoded correctly."""
+        async def _run() -> typing.Tuple[typing.Optional[str], typing.Optional[str]]:
+            async with RecordingServer() as server:
+                async with radar_async_api_client.AsyncAPIClient(
+                        server.endpoint, test_radar_common.TEST_SESSION_UUID) as client:
+                    return await client.get_api_version(), await client.get_mlre_version()
+
+        self.assertEqual(('1', mlre.__version__), asyncio.run(_run()))
@@ -0,0 +1,33 @@
+"""Tests for the asyncio radar session object."""
+import asyncio
+import os
+import unittest
+
+from mlre.radar import radar_async_session, radar_session
+from test_radar_async_api_client import RecordingServer
+
+
+class TestAsyncRadarSession(unittest.TestCase):
+    """Tests for the asyncio radar session object."""
+
+    def test_reports_session(self) -> None:
+        """Tests if the Session reports client info, start and end events to RADAR_SERVER."""
+        async def _run() -> RecordingServer:
+            async with RecordingServer() as server:
+                os.environ['RADAR_SERVER'] = server.endpoint
+                try:
+                    async with radar_async_session.AsyncRadarSession():
+                        self.assertEqual(2, len(server.requests))
+                finally:
+                    del os.environ['RADAR_SERVER']
+            return server
+
+        server = asyncio.run(_run())
+
+        paths = ["report_client_info", "report_event", "report_event"]
+        self.assertEqual(paths, server.paths)
+        event_identifiers = [
+            radar_session.lifecycle_event(radar_async_session.__name__, "Session started"),
+            radar_session.lifecycle_event(radar_async_session.__name__, "Session ended")]
+        reported_event_identifiers = [report.event_identifier for _, report in server.requests]
+        self.assertEqual(event_identifiers, reported_event_identifiers[1:])
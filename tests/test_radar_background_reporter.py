@@ -0,0 +1,145 @@
+"""Tests for the background reporter."""
+import threading
+import typing
+import unittest
+
+import test_radar_common
+from mlre.radar import (radar_api_client, radar_background_reporter,
+                        radar_common)
+
+_Call = typing.Tuple[str, typing.Tuple[object, ...]]
+
+
+class _RecordingAPIClient(radar_api_client.APIClient):
+    """API client that records the calls of the worker thread instead of sending anything."""
+
+    def __init__(self) -> None:
+        super().__init__(test_radar_common.TEST_ENDPOINT, test_radar_common.TEST_SESSION_UUID)
+        self.calls: typing.List[_Call] = list()
+        self.on_call: typing.Callable[[str], None] = lambda name: None
+
+    def _record(self, name: str, *args: object) -> None:
+        """Records a call, then runs the test's hook for it."""
+        self.calls.append((name, args))
+        self.on_call(name)
+
+    def call_count(self, name: str) -> int:
+        """Counts the recorded calls of a method."""
+        return len([call for call in self.calls if call[0] == name])
+
+    def report_client_info(self, client_info: radar_common.ClientInfo) -> None:
+        self._record("report_client_info", client_info)
+
+    def report_event(self, event_identifier: radar_common.EventIdentifier,
+                     freeze_frame: radar_common.FreezeFrameData) -> None:
+        self._record("report_event", event_identifier, freeze_frame)
+
+    def poll(self) -> None:
+        self._record("poll")
+
+    def flush(self) -> None:
+        self._record("flush")
+
+    def close(self) -> None:
+        self._record("close")
+
+
+class TestBackgroundReporter(unittest.TestCase):
+    """Tests for the background reporter."""
+
+    def setUp(self) -> None:
+        """Creates a reporter on top of a recording API client."""
+        self.api_client = _RecordingAPIClient()
+        self.reporter = radar_background_reporter.BackgroundReporter(
+            self.api_client, max_queue_size=2)
+
+    def tearDown(self) -> None:
+        """Stops the worker thread."""
+        self.reporter.close()
+
+    def test_forwards_reports_in_order(self) -> None:
+        """Test if reports reach the API client in order after flushing."""
+        self.reporter.report_client_info(test_radar_common.TEST_CLIENT_INFO)
+        self.reporter.report_event(test_radar_common.TEST_EVENT_IDENTIFIER,
+                                   test_radar_common.TEST_EVENT_FREEZE_FRAME)
+        self.reporter.flush()
+
+        reports: typing.List[_Call] = [
+            ("report_client_info", (test_radar_common.TEST_CLIENT_INFO,)),
+            ("report_event", (test_radar_common.TEST_EVENT_IDENTIFIER,
+                              test_radar_common.TEST_EVENT_FREEZE_FRAME))]
+        forwarded = [call for call in self.api_client.calls if call[0].startswith("report_")]
+        self.assertEqual(reports, forwarded)
+        self.assertGreater(self.api_client.call_count("flush"), 0)
+
+    def test_close_closes_api_client(self) -> None:
+        """Test if closing sends the remaining reports and closes the API client."""
+        self.reporter.report_event(test_radar_common.TEST_EVENT_IDENTIFIER,
+                                   test_radar_common.TEST_EVENT_FREEZE_FRAME)
+        self.reporter.close()
+
+        self.assertEqual(1, self.api_client.call_count("report_event"))
+        self.assertEqual("close", self.api_client.calls[-1][0])
+
+        # Closing again in tearDown should not block
+        self.reporter = radar_background_reporter.BackgroundReporter(
+            self.api_client)
+
+    def test_drops_events_when_full(self) -> None:
+        """Test if events are dropped while the worker is busy and the queue is full."""
+        release = threading.Event()
+        started = threading.Event()
+
+        def _block(name: str) -> None:
+            if name == "report_client_info":
+                started.set()
+                release.wait()
+
+        self.api_client.on_call = _block
+        self.reporter.report_client_info(test_radar_common.TEST_CLIENT_INFO)
+        started.wait()
+
+        for _ in range(5):
+            self.reporter.report_event(test_radar_common.TEST_EVENT_IDENTIFIER,
+                                       test_radar_common.TEST_EVENT_FREEZE_FRAME)
+        release.set()
+        self.reporter.flush()
+
+        self.assertEqual(3, self.reporter.dropped_events)
+        self.assertEqual(2, self.api_client.call_count("report_event"))
+
+    def test_survives_failing_reports(self) -> None:
+        """Test if the worker keeps going when a report fails."""
+        failures = [ValueError("failed")]
+
+        def _fail_once(name: str) -> None:
+            if name == "report_event" and failures:
+                raise failures.pop()
+
+        self.api_client.on_call = _fail_once
+
+        with self.assertLogs(radar_background_reporter.__name__):
+            self.reporter.report_event(test_radar_common.TEST_EVENT_IDENTIFIER,
+                                       test_radar_common.TEST_EVENT_FREEZE_FRAME)
+            self.reporter.flush()
+
+        self.reporter.report_event(test_radar_common.TEST_EVENT_IDENTIFIER,
+                                   test_radar_common.TEST_EVENT_FREEZE_FRAME)
+        self.reporter.flush()
+
+        self.assertEqual(2, self.api_client.call_count("report_event"))
+
+    def test_polls_while_idle(self) -> None:
+        """Test if the worker lets the API client send due batches while no reports arrive."""
+        polled = threading.Event()
+
+        def _notify(name: str) -> None:
+            if name == "poll":
+                polled.set()
+
+        self.api_client.on_call = _notify
+        self.reporter.close()
+        self.reporter = radar_background_reporter.BackgroundReporter(
+            self.api_client, poll_interval=0.01)
+
+        self.assertTrue(polled.wait(5.0))
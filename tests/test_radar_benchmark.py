@@ -0,0 +1,71 @@
+"""Tests for the radar benchmarks."""
+import os
+import tempfile
+import typing
+import unittest
+
+from benchmarks import radar_benchmark
+
+TINY_WORKLOAD = radar_benchmark.Workload(event_count=30, identifier_count=5,
+                                         freeze_frame_size=4, session_count=3,
+                                         query_count=5, repetitions=2)
+
+
+class TestRadarBenchmark(unittest.TestCase):
+    """Tests for the radar benchmarks."""
+
+    def test_synthetic_events(self) -> None:
+        """Test if the workload is generated as configured and reproducibly."""
+        events = radar_benchmark.synthetic_events(TINY_WORKLOAD)
+
+        self.assertEqual(30, len(events))
+        self.assertEqual(5, len({event_identifier for _, event_identifier, _ in events}))
+        self.assertTrue(all(len(freeze_frame) == 4 for _, _, freeze_frame in events))
+        self.assertEqual(events, radar_benchmark.synthetic_events(TINY_WORKLOAD))
+
+    def test_run_benchmarks(self) -> None:
+        """Test if every benchmark runs and reports sensible numbers."""
+        results = radar_benchmark.run_benchmarks(TINY_WORKLOAD)
+
+        benchmarks: typing.List[str] = list(radar_benchmark.BENCHMARKS)
+        names: typing.List[str] = [result.name for result in results]
+        self.assertEqual(benchmarks, names)
+        for result in results:
+            self.assertGreater(result.operations, 0)
+            self.assertGreater(result.throughput, 0.0)
+            self.assertLessEqual(result.p50, result.p95)
+            self.assertLessEqual(result.p95, result.p99)
+            self.assertGreaterEqual(result.peak_memory, 0)
+
+    def test_compare_with_baseline(self) -> None:
+        """Test if slower, more variable or bigger results are reported as regressions."""
+        result = radar_benchmark.BenchmarkResult("event", 10, 1000.0, 0.001, 0.002, 0.003, 1000)
+        baseline = {"event": {"throughput": 1100.0, "p95": 0.0019, "peak_memory": 1000.0}}
+
+        results: typing.List[radar_benchmark.BenchmarkResult] = [result]
+        self.assertEqual(0, len(radar_benchmark.compare_with_baseline(results, baseline)))
+        results = [result._replace(throughput=500.0, p95=0.004, peak_memory=2000)]
+        self.assertEqual(3, len(radar_benchmark.compare_with_baseline(results, baseline)))
+        results = [result._replace(name="unknown", throughput=1.0)]
+        self.assertEqual(0, len(radar_benchmark.compare_with_baseline(results, baseline)))
+
+    def test_main_with_baseline(self) -> None:
+        """Test if the command line saves a baseline and compares later runs with it."""
+        arguments = ["--events", "30", "--identifiers", "5", "--queries", "5",
+                     "--repetitions", "2", "--only", "insert_event", "event"]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "baseline.json")
+            self.assertEqual(0, radar_benchmark.main(arguments + ["--save-baseline", path]))
+
+            workload, baseline = radar_benchmark.load_baseline(path)
+            self.assertEqual(30, workload.event_count)
+            names: typing.Set[str] = {"insert_event", "event"}
+            baseline_names: typing.Set[str] = set(baseline)
+            self.assertEqual(names, baseline_names)
+
+            # Nothing can be as fast as an infinitely fast baseline
+            radar_benchmark.save_baseline(path, workload, [
+                radar_benchmark.BenchmarkResult(name=name, operations=1, throughput=float("inf"),
+                                                p50=0.0, p95=0.0, p99=0.0, peak_memory=0)
+                for name in baseline])
+            self.assertEqual(1, radar_benchmark.main(arguments + ["--baseline", path]))
@@ -6,10 +6,12 @@ import unittest
 import uuid
 from unittest import mock
 
-from mlre.radar import radar_common
+from mlre.radar import radar_common, radar_wire_format
 
 TEST_ENDPOINT: str = "https://api.test_url.org/"
 
+MSGPACK_INSTALLED: bool = radar_wire_format.MSGPACK in radar_wire_format.content_types()
+
 TEST_HOSTNAME: str = "test_hostname"
 TEST_HOSTNAME_ALTERNATIVE: str = "test_hostname2"
 
@@ -45,6 +47,35 @@ TEST_DATABASE_FILENAME_1: str = os.path.join(
     tempfile.gettempdir(), 'temp_db_1.radardb')
 TEST_DATABASE_FILENAME_2: str = os.path.join(
     tempfile.gettempdir(), 'temp_db_2.radardb')
+TEST_SQLITE_FILENAME: str = os.path.join(
+    tempfile.gettempdir(), 'temp_db.sqlite')
+
+
+def remove_sqlite_files(path: str) -> None:
+    """Removes an SQLite database file including its write-ahead log."""
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+class DecodedReport(typing.NamedTuple):
+    """Fields of a report request body, None for those the report does not have."""
+
+    session_id: uuid.UUID
+    client_info: typing.Optional[radar_common.ClientInfo]
+    event_identifier: typing.Optional[radar_common.EventIdentifier]
+    freeze_frame: typing.Optional[radar_common.FreezeFrameData]
+
+
+def decode_report(data: bytes, content_type: str) -> DecodedReport:
+    """Decodes the body of a report_client_info or report_event request."""
+    body = radar_wire_format.decode(data, content_type)
+    return DecodedReport(
+        uuid.UUID(body["session_id"]),
+        radar_common.ClientInfo(*body["client_info"]) if "client_info" in body else None,
+        radar_common.EventIdentifier(*body["event_identifier"])
+        if "event_identifier" in body else None,
+        body.get("freeze_frame"))
 
 
 class MockedDatabaseTestCase(unittest.TestCase):
@@ -71,6 +102,27 @@ class MockedDatabaseTestCase(unittest.TestCase):
         patched_database_type.return_value.client_info.return_value = \
             TEST_CLIENT_INFO
 
+        patched_database_type.return_value.event_frequencies.return_value = [
+            (0, TEST_EVENT_IDENTIFIER, 2),
+            (1, TEST_EVENT_IDENTIFIER_ALTERNATIVE, 2)]
+
+        patched_database_type.return_value.event_count.return_value = 2
+
+        patched_database_type.return_value.sequence.return_value = 7
+
+        patched_database_type.return_value.event_version.return_value = 3
+
+        patched_database_type.return_value.event_statistics.return_value = \
+            radar_common.EventStatistics(2, 1582671600.0, 1582675200.0)
+
+        patched_database_type.return_value.freeze_frame_summary.return_value = \
+            radar_common.FreezeFrameSummary(2, 2)
+
+        patched_database_type.return_value.client_info_version.return_value = 1
+
+        patched_database_type.return_value.severity_frequencies.return_value = {
+            TEST_EVENT_SEVERITY: 4}
+
         # Create instance of mock
         self.database = patched_database_type()
 
@@ -0,0 +1,42 @@
+"""Test for radar request and response compression."""
+import unittest
+
+from mlre.radar import radar_compression
+
+
+class TestRadarCompression(unittest.TestCase):
+    """Test for radar request and response compression."""
+
+    DATA = b'{"freeze_frame": {"loss": 0.5}}' * 100
+
+    def test_round_trip(self) -> None:
+        """Test if compressed bodies decompress to the original."""
+        for encoding in radar_compression.ENCODINGS:
+            compressed = radar_compression.compress(self.DATA, encoding)
+            self.assertLess(len(compressed), len(self.DATA))
+            self.assertEqual(self.DATA, radar_compression.decompress(compressed, encoding))
+
+        self.assertEqual(self.DATA, radar_compression.decompress(self.DATA, "identity"))
+
+    def test_unsupported_encoding(self) -> None:
+        """Test if unsupported encodings are rejected."""
+        with self.assertRaises(ValueError):
+            radar_compression.compress(self.DATA, "br")
+        with self.assertRaises(ValueError):
+            radar_compression.decompress(self.DATA, "br")
+
+    def test_invalid_body(self) -> None:
+        """Test if broken and truncated bodies are rejected."""
+        compressed = radar_compression.compress(self.DATA, "gzip")
+        with self.assertRaises(ValueError):
+            radar_compression.decompress(b"not gzip", "gzip")
+        with self.assertRaises(ValueError):
+            radar_compression.decompress(compressed[:len(compressed) // 2], "gzip")
+
+    def test_max_size(self) -> None:
+        """Test if bodies that decompress to too many bytes are rejected."""
+        compressed = radar_compression.compress(self.DATA, "deflate")
+        self.assertEqual(self.DATA, radar_compression.decompress(compressed, "deflate",
+                                                                 len(self.DATA)))
+        with self.assertRaises(ValueError):
+            radar_compression.decompress(compressed, "deflate", len(self.DATA) - 1)
@@ -1,13 +1,25 @@
 """Test for radar database component."""
 import os
+import pickle  # nosec
+import threading
 import typing
 import unittest
+import uuid
+from unittest import mock
 
 import test_radar_common
-from mlre.radar import radar_common, radar_database
+from mlre.radar import (radar_common, radar_database, radar_metrics,
+                        radar_retention, radar_storage)
 
 
-class TestRadarDatabase(unittest.TestCase):
+def _load_fresh(path: str) -> radar_database.RadarDatabase:
+    """Loads the given file into a new database."""
+    database = radar_database.RadarDatabase()
+    database.load(path)
+    return database
+
+
+class TestRadarDatabase(unittest.TestCase):  # pylint: disable=R0904
     """Test for radar database component."""
 
     def setUp(self) -> None:
@@ -192,6 +204,305 @@ class TestRadarDatabase(unittest.TestCase):
         self.assertNotEqual(
             index_1, index_2, "The indices of different events should be different.")
 
+    def test_insert_events(self) -> None:
+        """Test if inserting a batch of events works like inserting them one by one."""
+        indices = self.database.insert_events(
+            test_radar_common.TEST_SESSION_UUID,
+            [(test_radar_common.TEST_EVENT_IDENTIFIER,
+              test_radar_common.TEST_EVENT_FREEZE_FRAME),
+             (test_radar_common.TEST_EVENT_IDENTIFIER_ALTERNATIVE,
+              test_radar_common.TEST_EVENT_FREEZE_FRAME_ALTERNATIVE),
+             (test_radar_common.TEST_EVENT_IDENTIFIER,
+              test_radar_common.TEST_EVENT_FREEZE_FRAME_ALTERNATIVE)])
+
+        self.assertEqual(indices[0], indices[2])
+        self.assertNotEqual(indices[0], indices[1])
+        self.assertEqual(2, len(self.database.event_identifiers()))
+        freeze_frames: radar_storage.FreezeFrameList = [
+            (test_radar_common.TEST_SESSION_UUID, test_radar_common.TEST_EVENT_FREEZE_FRAME),
+            (test_radar_common.TEST_SESSION_UUID,
+             test_radar_common.TEST_EVENT_FREEZE_FRAME_ALTERNATIVE)]
+        self.assertEqual(freeze_frames, self.database.event(indices[0])[1])
+
+    def test_event_identifier_filters(self) -> None:
+        """Test if event identifiers can be filtered and paged through."""
+        warning = radar_common.EventIdentifier(
+            radar_common.Severity.WARNING, "mlre.radar.other", "Warning")
+        events: typing.List[
+            typing.Tuple[radar_common.EventIdentifier, radar_common.FreezeFrameData]]
+        events = [(test_radar_common.TEST_EVENT_IDENTIFIER, {}), (warning, {})]
+        indices = self.database.insert_events(test_radar_common.TEST_SESSION_UUID, events)
+        self.database.insert_event(test_radar_common.TEST_SESSION_UUID_ALTERNATIVE,
+                                   test_radar_common.TEST_EVENT_IDENTIFIER_ALTERNATIVE, {})
+        index_3 = self.database.event_identifiers()[-1][0]
+
+        warnings: typing.List[typing.Tuple[int, radar_common.EventIdentifier]] = [
+            (indices[1], warning)]
+        self.assertEqual(warnings, self.database.event_identifiers(
+            severity=radar_common.Severity.WARNING))
+        self.assertEqual(warnings, self.database.event_identifiers(location_prefix="mlre.radar"))
+        alternatives: typing.List[typing.Tuple[int, radar_common.EventIdentifier]] = [
+            (index_3, test_radar_common.TEST_EVENT_IDENTIFIER_ALTERNATIVE)]
+        self.assertEqual(alternatives, self.database.event_identifiers(
+            description=test_radar_common.TEST_EVENT_DESCRIPTION_ALTERNATIVE))
+        session_indices: typing.List[int] = [
+            index for index, _ in self.database.event_identifiers(
+                session_id=test_radar_common.TEST_SESSION_UUID)]
+        self.assertEqual(indices[:2], session_indices)
+
+        # Page through all identifiers one at a time
+        first_page = self.database.event_identifiers(limit=1)
+        first_indices: typing.List[int] = [index for index, _ in first_page]
+        self.assertEqual(indices[:1], first_indices)
+        second_page = self.database.event_identifiers(after=first_page[-1][0], limit=2)
+        second_indices: typing.List[int] = [index for index, _ in second_page]
+        expected_indices: typing.List[int] = [indices[1], index_3]
+        self.assertEqual(expected_indices, second_indices)
+        self.assertEqual(0, len(self.database.event_identifiers(after=index_3)))
+
+    def test_event_pages(self) -> None:
+        """Test if freeze frames of an event can be paged through and filtered by session."""
+        index = self.test_insert_1()
+        self.database.insert_event(test_radar_common.TEST_SESSION_UUID_ALTERNATIVE,
+                                   test_radar_common.TEST_EVENT_IDENTIFIER,
+                                   test_radar_common.TEST_EVENT_FREEZE_FRAME_ALTERNATIVE)
+
+        event_identifier, freeze_frames = self.database.event(index, offset=1, limit=1)
+        self.assertEqual(test_radar_common.TEST_EVENT_IDENTIFIER, event_identifier)
+        expected_freeze_frames: typing.List[typing.Tuple[uuid.UUID, radar_common.FreezeFrameData]]
+        expected_freeze_frames = [(test_radar_common.TEST_SESSION_UUID_ALTERNATIVE,
+                                   test_radar_common.TEST_EVENT_FREEZE_FRAME_ALTERNATIVE)]
+        self.assertEqual(expected_freeze_frames, freeze_frames)
+
+        _, freeze_frames = self.database.event(
+            index, session_id=test_radar_common.TEST_SESSION_UUID)
+        expected_freeze_frames = [(test_radar_common.TEST_SESSION_UUID,
+                                   test_radar_common.TEST_EVENT_FREEZE_FRAME)]
+        self.assertEqual(expected_freeze_frames, freeze_frames)
+
+    def test_insert_aggregated_events(self) -> None:
+        """Test if aggregated events store their sample and count every occurrence."""
+        index_1 = self.test_insert_1()
+        events: typing.List[radar_common.AggregatedEvent] = [
+            radar_common.AggregatedEvent(test_radar_common.TEST_EVENT_IDENTIFIER, 100, 0.0, 1.0,
+                                         [test_radar_common.TEST_EVENT_FREEZE_FRAME_ALTERNATIVE])]
+        indices = self.database.insert_aggregated_events(
+            test_radar_common.TEST_SESSION_UUID_ALTERNATIVE, events)
+
+        expected_indices: typing.List[int] = [index_1]
+        self.assertEqual(expected_indices, indices)
+        self.assertEqual(2, len(self.database.event(index_1)[1]))
+
+        statistics = self.database.event_statistics(index_1)
+        self.assertEqual(101, statistics.count)
+        self.assertEqual(0.0, statistics.first_seen)
+        self.assertIsNotNone(statistics.last_seen)
+        self.assertGreater(statistics.last_seen, 1.0)  # type: ignore
+
+    def test_event_frequencies(self) -> None:
+        """Test if events can be paged through by frequency and occurrences are rolled up."""
+        warning = radar_common.EventIdentifier(
+            radar_common.Severity.WARNING, "mlre.radar.other", "Warning")
+        events: typing.List[
+            typing.Tuple[radar_common.EventIdentifier, radar_common.FreezeFrameData]]
+        events = [(test_radar_common.TEST_EVENT_IDENTIFIER, {}), (warning, {}), (warning, {})]
+        indices = self.database.insert_events(test_radar_common.TEST_SESSION_UUID, events)
+        aggregated_events: typing.List[radar_common.AggregatedEvent] = [
+            radar_common.AggregatedEvent(test_radar_common.TEST_EVENT_IDENTIFIER_ALTERNATIVE,
+                                         5, 0.0, 1.0, [])]
+        self.database.insert_aggregated_events(test_radar_common.TEST_SESSION_UUID,
+                                               aggregated_events)
+        index_3 = self.database.event_identifiers()[-1][0]
+
+        self.assertEqual(3, self.database.event_count())
+        frequencies: typing.List[typing.Tuple[int, radar_common.EventIdentifier, int]]
+        frequencies = [(indices[0], test_radar_common.TEST_EVENT_IDENTIFIER, 1),
+                       (indices[1], warning, 2)]
+        self.assertEqual(frequencies, self.database.event_frequencies(limit=2))
+        frequencies = [(index_3, test_radar_common.TEST_EVENT_IDENTIFIER_ALTERNATIVE, 5),
+                       (indices[1], warning, 2)]
+        self.assertEqual(frequencies,
+                         self.database.event_frequencies(limit=2, sort_by_frequency=True))
+        frequencies = [(indices[0], test_radar_common.TEST_EVENT_IDENTIFIER, 1)]
+        self.assertEqual(frequencies,
+                         self.database.event_frequencies(offset=2, sort_by_frequency=True))
+
+        severities: typing.Dict[radar_common.Severity, int] = {
+            radar_common.Severity.INFO: 6, radar_common.Severity.WARNING: 2}
+        self.assertEqual(severities, self.database.severity_frequencies())
+        locations: typing.Dict[str, int] = {
+            test_radar_common.TEST_EVENT_LOCATION: 6, "mlre.radar.other": 2}
+        self.assertEqual(locations, self.database.location_frequencies())
+
+    def test_frequencies_survive_save_and_load(self) -> None:
+        """Test if the counters are rebuilt when loading and when opening a storage backend."""
+        self.test_event_frequencies()
+        self.database.save(test_radar_common.TEST_DATABASE_FILENAME_1)
+
+        database = _load_fresh(test_radar_common.TEST_DATABASE_FILENAME_1)
+        self.assertEqual(self.database.event_frequencies(), database.event_frequencies())
+        self.assertEqual(self.database.severity_frequencies(), database.severity_frequencies())
+
+        # pylint: disable=protected-access
+        reopened = radar_database.RadarDatabase(database._storage)
+        self.assertEqual(self.database.event_frequencies(), reopened.event_frequencies())
+        self.assertEqual(self.database.location_frequencies(), reopened.location_frequencies())
+
+    def test_statistics_survive_save_and_load(self) -> None:
+        """Test if occurrence counts are kept by full and incremental saves."""
+        self.test_insert_aggregated_events()
+        self.database.save(test_radar_common.TEST_DATABASE_FILENAME_1)
+        self.database.insert_event(
+            test_radar_common.TEST_SESSION_UUID,
+            test_radar_common.TEST_EVENT_IDENTIFIER,
+            test_radar_common.TEST_EVENT_FREEZE_FRAME)
+        self.database.save(test_radar_common.TEST_DATABASE_FILENAME_1)
+
+        loaded = _load_fresh(test_radar_common.TEST_DATABASE_FILENAME_1)
+        self.assertEqual(self.database.event_statistics(0),
+                         loaded.event_statistics(0))
+        self.assertEqual(102, loaded.event_statistics(0).count)
+
+    def test_concurrent_inserts(self) -> None:
+        """Test if inserts from several threads neither duplicate identifiers nor lose events."""
+        thread_count = 8
+        inserts_per_thread = 200
+        identifiers = [radar_common.EventIdentifier(radar_common.Severity.INFO, "test",
+                                                    f"Event {number}")
+                       for number in range(10)]
+        stop_reading = threading.Event()
+
+        def insert() -> None:
+            for number in range(inserts_per_thread):
+                identifier = identifiers[number % len(identifiers)]
+                if number % 2 == 0:
+                    self.database.insert_event(test_radar_common.TEST_SESSION_UUID,
+                                               identifier, {"number": number})
+                else:
+                    self.database.insert_events(test_radar_common.TEST_SESSION_UUID,
+                                                [(identifier, {"number": number}),
+                                                 (identifiers[0], {"number": number})])
+
+        def read() -> None:
+            while not stop_reading.is_set():
+                for event_index, _ in self.database.event_identifiers(location_prefix="test"):
+                    self.database.event(event_index)
+                self.database.event_frequencies(sort_by_frequency=True)
+
+        reader = threading.Thread(target=read)
+        reader.start()
+        threads = [threading.Thread(target=insert) for _ in range(thread_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stop_reading.set()
+        reader.join()
+
+        total = thread_count * inserts_per_thread * 3 // 2
+        self.assertEqual(len(identifiers), self.database.event_count())
+        frame_count: int = sum(len(self.database.event(event_index)[1])
+                               for event_index, _ in self.database.event_identifiers())
+        self.assertEqual(total, frame_count)
+        frequency_sum: int = sum(frequency
+                                 for _, _, frequency in self.database.event_frequencies())
+        self.assertEqual(total, frequency_sum)
+        severities: typing.Dict[radar_common.Severity, int] = {radar_common.Severity.INFO: total}
+        self.assertEqual(severities, self.database.severity_frequencies())
+
+    def test_changes(self) -> None:
+        """Test if the occurrences recorded after a sequence number are summed up per event."""
+        self.assertIsNone(self.database.changes(1))
+        start = self.database.sequence()
+        self.assertEqual((start, []), self.database.changes(start))
+
+        index_1 = self.database.insert_event(test_radar_common.TEST_SESSION_UUID,
+                                             test_radar_common.TEST_EVENT_IDENTIFIER,
+                                             test_radar_common.TEST_EVENT_FREEZE_FRAME)
+        middle = self.database.sequence()
+        index_2, _ = self.database.insert_events(
+            test_radar_common.TEST_SESSION_UUID,
+            [(test_radar_common.TEST_EVENT_IDENTIFIER_ALTERNATIVE,
+              test_radar_common.TEST_EVENT_FREEZE_FRAME),
+             (test_radar_common.TEST_EVENT_IDENTIFIER, test_radar_common.TEST_EVENT_FREEZE_FRAME)])
+        end = self.database.sequence()
+
+        self.assertLess(start, middle)
+        self.assertLess(middle, end)
+        self.assertEqual((end, [(index_1, test_radar_common.TEST_EVENT_IDENTIFIER, 2),
+                                (index_2, test_radar_common.TEST_EVENT_IDENTIFIER_ALTERNATIVE, 1)]),
+                         self.database.changes(start))
+        self.assertEqual((end, [(index_1, test_radar_common.TEST_EVENT_IDENTIFIER, 1),
+                                (index_2, test_radar_common.TEST_EVENT_IDENTIFIER_ALTERNATIVE, 1)]),
+                         self.database.changes(middle))
+
+    def test_changes_wait(self) -> None:
+        """Test if waiting for changes returns as soon as an event occurs."""
+        start = self.database.sequence()
+
+        def insert_event() -> None:
+            self.database.insert_event(test_radar_common.TEST_SESSION_UUID,
+                                       test_radar_common.TEST_EVENT_IDENTIFIER,
+                                       test_radar_common.TEST_EVENT_FREEZE_FRAME)
+
+        timer = threading.Timer(0.05, insert_event)
+        timer.start()
+
+        changes = self.database.changes(start, timeout=10.0)
+        timer.join()
+
+        self.assertEqual((start + 1, [(0, test_radar_common.TEST_EVENT_IDENTIFIER, 1)]), changes)
+
+    def test_changes_forgotten(self) -> None:
+        """Test if callers have to start over once old changes are forgotten."""
+        with mock.patch("mlre.radar.radar_database._MAX_CHANGES", 2):
+            database = radar_database.RadarDatabase()
+        start = database.sequence()
+        for _ in range(3):
+            database.insert_event(test_radar_common.TEST_SESSION_UUID,
+                                  test_radar_common.TEST_EVENT_IDENTIFIER,
+                                  test_radar_common.TEST_EVENT_FREEZE_FRAME)
+
+        self.assertIsNone(database.changes(start))
+        self.assertEqual((start + 3, [(0, test_radar_common.TEST_EVENT_IDENTIFIER, 2)]),
+                         database.changes(start + 1))
+
+    def test_event_version(self) -> None:
+        """Test if an event's version only changes with its occurrences and evictions."""
+        database = radar_database.RadarDatabase(retention={
+            radar_common.Severity.INFO: radar_retention.RetentionPolicy(max_freeze_frames=1)})
+        index = database.insert_event(test_radar_common.TEST_SESSION_UUID,
+                                      test_radar_common.TEST_EVENT_IDENTIFIER,
+                                      test_radar_common.TEST_EVENT_FREEZE_FRAME)
+        version = database.event_version(index)
+
+        database.insert_event(test_radar_common.TEST_SESSION_UUID,
+                              test_radar_common.TEST_EVENT_IDENTIFIER_ALTERNATIVE,
+                              test_radar_common.TEST_EVENT_FREEZE_FRAME)
+        self.assertEqual(version, database.event_version(index))
+
+        database.insert_aggregated_events(test_radar_common.TEST_SESSION_UUID, [
+            radar_common.AggregatedEvent(test_radar_common.TEST_EVENT_IDENTIFIER, 3, 0.0, 1.0, [
+                test_radar_common.TEST_EVENT_FREEZE_FRAME])])
+        self.assertNotEqual(version, database.event_version(index))
+
+        version = database.event_version(index)
+        self.assertEqual(1, database.apply_retention())
+        self.assertNotEqual(version, database.event_version(index))
+
+    def test_client_info_version(self) -> None:
+        """Test if the client info version changes with inserts and loads."""
+        version = self.database.client_info_version()
+        self.database.insert_client_info(test_radar_common.TEST_SESSION_UUID,
+                                         test_radar_common.TEST_CLIENT_INFO)
+        self.assertNotEqual(version, self.database.client_info_version())
+        self.database.save(test_radar_common.TEST_DATABASE_FILENAME_1)
+
+        database = radar_database.RadarDatabase()
+        version = database.client_info_version()
+        database.load(test_radar_common.TEST_DATABASE_FILENAME_1)
+        self.assertNotEqual(version, database.client_info_version())
+
     def test_insert_1_client_info(self) -> None:
         """Tests if inserting client information works."""
         self.database.insert_client_info(test_radar_common.TEST_SESSION_UUID,
@@ -242,3 +553,311 @@ class TestRadarDatabase(unittest.TestCase):
         self.assertEqual(test_radar_common.TEST_CLIENT_INFO_ALTERNATIVE,
                          actual_client_info,
                          "Client information for first test session UUID should be overwritten.")
+
+    def test_insert_known_event_after_load(self) -> None:
+        """Test if the identifier index is rebuilt after loading.
+
+        Inserting an event that was saved before should not create a new index."""
+        index_1 = self.database.insert_event(
+            test_radar_common.TEST_SESSION_UUID,
+            test_radar_common.TEST_EVENT_IDENTIFIER,
+            test_radar_common.TEST_EVENT_FREEZE_FRAME)
+
+        self.database.save(test_radar_common.TEST_DATABASE_FILENAME_1)
+        self.database = radar_database.RadarDatabase()
+        self.database.load(test_radar_common.TEST_DATABASE_FILENAME_1)
+
+        index_2 = self.database.insert_event(
+            test_radar_common.TEST_SESSION_UUID_ALTERNATIVE,
+            test_radar_common.TEST_EVENT_IDENTIFIER,
+            test_radar_common.TEST_EVENT_FREEZE_FRAME_ALTERNATIVE)
+
+        self.assertEqual(index_1, index_2,
+                         "The indices of identical events should survive loading.")
+        self.assertEqual(1, len(self.database.event_identifiers()))
+        self.assertEqual(2, len(self.database.event(index_2)[1]))
+
+    def test_insert_appends_freeze_frames_in_place(self) -> None:
+        """Test if inserting an existing event appends to its stored freeze frames.
+
+        Freeze frames obtained earlier are copies and should not change."""
+        index_1 = self.test_insert_1()
+        freeze_frames = self.database.event(index_1)[1]
+        freeze_frames[0][1]["test_data"] = 0
+
+        self.database.insert_event(
+            test_radar_common.TEST_SESSION_UUID_ALTERNATIVE,
+            test_radar_common.TEST_EVENT_IDENTIFIER,
+            test_radar_common.TEST_EVENT_FREEZE_FRAME_ALTERNATIVE)
+
+        self.assertEqual(1, len(freeze_frames))
+        expected_freeze_frames: typing.List[typing.Tuple[uuid.UUID, radar_common.FreezeFrameData]]
+        expected_freeze_frames = [(test_radar_common.TEST_SESSION_UUID,
+                                   test_radar_common.TEST_EVENT_FREEZE_FRAME),
+                                  (test_radar_common.TEST_SESSION_UUID_ALTERNATIVE,
+                                   test_radar_common.TEST_EVENT_FREEZE_FRAME_ALTERNATIVE)]
+        self.assertEqual(expected_freeze_frames, self.database.event(index_1)[1])
+
+    def test_incremental_save(self) -> None:
+        """Test if saving to the same file again only appends new records."""
+        self.test_insert_1()
+        self.database.save(test_radar_common.TEST_DATABASE_FILENAME_1)
+        size_1 = os.path.getsize(test_radar_common.TEST_DATABASE_FILENAME_1)
+        with open(test_radar_common.TEST_DATABASE_FILENAME_1, "rb") as db_file:
+            content_1 = db_file.read()
+
+        self.database.insert_client_info(test_radar_common.TEST_SESSION_UUID,
+                                         test_radar_common.TEST_CLIENT_INFO)
+        index_2 = self.database.insert_event(
+            test_radar_common.TEST_SESSION_UUID_ALTERNATIVE,
+            test_radar_common.TEST_EVENT_IDENTIFIER_ALTERNATIVE,
+            test_radar_common.TEST_EVENT_FREEZE_FRAME_ALTERNATIVE)
+        self.database.save(test_radar_common.TEST_DATABASE_FILENAME_1)
+
+        # The file should have been appended to, not rewritten
+        with open(test_radar_common.TEST_DATABASE_FILENAME_1, "rb") as db_file:
+            content_2 = db_file.read()
+        self.assertGreater(len(content_2), size_1)
+        self.assertEqual(content_1, content_2[:size_1])
+
+        # Saving without changes appends nothing
+        self.database.save(test_radar_common.TEST_DATABASE_FILENAME_1)
+        self.assertEqual(len(content_2), os.path.getsize(
+            test_radar_common.TEST_DATABASE_FILENAME_1))
+
+        loaded = _load_fresh(test_radar_common.TEST_DATABASE_FILENAME_1)
+        self.assertEqual(self.database.event_identifiers(),
+                         loaded.event_identifiers())
+        self.assertEqual(self.database.event(index_2), loaded.event(index_2))
+        self.assertEqual(test_radar_common.TEST_CLIENT_INFO,
+                         loaded.client_info(test_radar_common.TEST_SESSION_UUID))
+
+    def test_incremental_save_after_load(self) -> None:
+        """Test if a loaded database appends to the file it was loaded from."""
+        index_1 = self.test_insert_1()
+        self.database.save(test_radar_common.TEST_DATABASE_FILENAME_1)
+
+        self.database = _load_fresh(
+            test_radar_common.TEST_DATABASE_FILENAME_1)
+        self.database.insert_event(
+            test_radar_common.TEST_SESSION_UUID_ALTERNATIVE,
+            test_radar_common.TEST_EVENT_IDENTIFIER,
+            test_radar_common.TEST_EVENT_FREEZE_FRAME_ALTERNATIVE)
+        self.database.save(test_radar_common.TEST_DATABASE_FILENAME_1)
+
+        loaded = _load_fresh(test_radar_common.TEST_DATABASE_FILENAME_1)
+        freeze_frames: radar_storage.FreezeFrameList = [
+            (test_radar_common.TEST_SESSION_UUID, test_radar_common.TEST_EVENT_FREEZE_FRAME),
+            (test_radar_common.TEST_SESSION_UUID_ALTERNATIVE,
+             test_radar_common.TEST_EVENT_FREEZE_FRAME_ALTERNATIVE)]
+        self.assertEqual(freeze_frames, loaded.event(index_1)[1])
+
+    def test_compact(self) -> None:
+        """Test if compaction drops replaced records but keeps the data."""
+        self.database.insert_client_info(test_radar_common.TEST_SESSION_UUID,
+                                         test_radar_common.TEST_CLIENT_INFO)
+        self.database.save(test_radar_common.TEST_DATABASE_FILENAME_1)
+        self.database.insert_client_info(test_radar_common.TEST_SESSION_UUID,
+                                         test_radar_common.TEST_CLIENT_INFO_ALTERNATIVE)
+        self.database.save(test_radar_common.TEST_DATABASE_FILENAME_1)
+        size_before = os.path.getsize(
+            test_radar_common.TEST_DATABASE_FILENAME_1)
+
+        self.database.compact(test_radar_common.TEST_DATABASE_FILENAME_1)
+
+        self.assertLess(os.path.getsize(
+            test_radar_common.TEST_DATABASE_FILENAME_1), size_before)
+        loaded = _load_fresh(test_radar_common.TEST_DATABASE_FILENAME_1)
+        self.assertEqual(test_radar_common.TEST_CLIENT_INFO_ALTERNATIVE,
+                         loaded.client_info(test_radar_common.TEST_SESSION_UUID))
+
+    def test_save_to_other_file_is_complete(self) -> None:
+        """Test if saving to a different file writes the whole database."""
+        index_1 = self.test_insert_1()
+        self.database.save(test_radar_common.TEST_DATABASE_FILENAME_1)
+        self.database.save(test_radar_common.TEST_DATABASE_FILENAME_2)
+
+        loaded = _load_fresh(test_radar_common.TEST_DATABASE_FILENAME_2)
+        self.assertEqual(self.database.event(index_1), loaded.event(index_1))
+
+    def test_load_ignores_truncated_record(self) -> None:
+        """Test if a record cut off by a crash during saving is ignored."""
+        index_1 = self.test_insert_1()
+        self.database.save(test_radar_common.TEST_DATABASE_FILENAME_1)
+        size_1 = os.path.getsize(test_radar_common.TEST_DATABASE_FILENAME_1)
+
+        self.database.insert_event(
+            test_radar_common.TEST_SESSION_UUID_ALTERNATIVE,
+            test_radar_common.TEST_EVENT_IDENTIFIER,
+            test_radar_common.TEST_EVENT_FREEZE_FRAME_ALTERNATIVE)
+        self.database.save(test_radar_common.TEST_DATABASE_FILENAME_1)
+        with open(test_radar_common.TEST_DATABASE_FILENAME_1, "r+b") as db_file:
+            db_file.truncate(size_1 + 5)
+
+        loaded = _load_fresh(test_radar_common.TEST_DATABASE_FILENAME_1)
+        self.assertEqual(1, len(loaded.event(index_1)[1]))
+
+    def test_save_after_truncated_record(self) -> None:
+        """Test if a file with a torn record is rewritten instead of appended to."""
+        self.test_insert_1()
+        self.database.save(test_radar_common.TEST_DATABASE_FILENAME_1)
+        self.database.insert_event(
+            test_radar_common.TEST_SESSION_UUID_ALTERNATIVE,
+            test_radar_common.TEST_EVENT_IDENTIFIER,
+            test_radar_common.TEST_EVENT_FREEZE_FRAME_ALTERNATIVE)
+        self.database.save(test_radar_common.TEST_DATABASE_FILENAME_1)
+        with open(test_radar_common.TEST_DATABASE_FILENAME_1, "r+b") as db_file:
+            db_file.truncate(os.path.getsize(test_radar_common.TEST_DATABASE_FILENAME_1) - 5)
+
+        loaded = _load_fresh(test_radar_common.TEST_DATABASE_FILENAME_1)
+        index = loaded.insert_event(test_radar_common.TEST_SESSION_UUID,
+                                    test_radar_common.TEST_EVENT_IDENTIFIER_ALTERNATIVE,
+                                    test_radar_common.TEST_EVENT_FREEZE_FRAME)
+        loaded.save(test_radar_common.TEST_DATABASE_FILENAME_1)
+
+        reloaded = _load_fresh(test_radar_common.TEST_DATABASE_FILENAME_1)
+        self.assertEqual(loaded.event(index), reloaded.event(index))
+        self.assertEqual(loaded.event_frequencies(), reloaded.event_frequencies())
+
+    def test_load_legacy_file(self) -> None:
+        """Test if databases pickled as a single dictionary can still be loaded."""
+        legacy_database: typing.Dict[str, object] = {
+            "client_info": {test_radar_common.TEST_SESSION_UUID:
+                            test_radar_common.TEST_CLIENT_INFO},
+            "event_data": [(test_radar_common.TEST_EVENT_IDENTIFIER,
+                            [(test_radar_common.TEST_SESSION_UUID,
+                              test_radar_common.TEST_EVENT_FREEZE_FRAME)])]}
+        with open(test_radar_common.TEST_DATABASE_FILENAME_1, "wb") as db_file:
+            pickle.dump(legacy_database, db_file)
+
+        self.database.load(test_radar_common.TEST_DATABASE_FILENAME_1)
+        self._check_event_data(0)
+        self.assertEqual(radar_common.EventStatistics(1, None, None),
+                         self.database.event_statistics(0))
+        self.assertEqual(test_radar_common.TEST_CLIENT_INFO,
+                         self.database.client_info(test_radar_common.TEST_SESSION_UUID))
+
+        # The next save converts the file to the log format
+        self.database.save(test_radar_common.TEST_DATABASE_FILENAME_1)
+        loaded = _load_fresh(test_radar_common.TEST_DATABASE_FILENAME_1)
+        self.assertEqual(self.database.event(0), loaded.event(0))
+
+    def test_metrics(self) -> None:
+        """Test if operation durations and the database size are recorded."""
+        metrics = radar_metrics.MetricsRegistry()
+        database = radar_database.RadarDatabase(metrics=metrics)
+        database.insert_event(test_radar_common.TEST_SESSION_UUID,
+                              test_radar_common.TEST_EVENT_IDENTIFIER,
+                              test_radar_common.TEST_EVENT_FREEZE_FRAME)
+        database.event(0)
+        database.event(0)
+
+        histogram = metrics.histogram("radar_database_operation_duration_seconds", "")
+        self.assertEqual(1, histogram.count(("insert_event",)))
+        self.assertEqual(2, histogram.count(("event",)))
+
+        text = metrics.render()
+        self.assertIn("radar_database_events 1\n", text)
+        self.assertIn("radar_database_unsaved_events 1\n", text)
+
+        database.save(test_radar_common.TEST_DATABASE_FILENAME_1)
+        self.assertIn("radar_database_unsaved_events 0\n", metrics.render())
+
+    def test_retention_keeps_newest(self) -> None:
+        """Test if freeze frames are evicted beyond the limit, but occurrences are counted."""
+        database = radar_database.RadarDatabase(retention={
+            radar_common.Severity.INFO: radar_retention.RetentionPolicy(max_freeze_frames=4)})
+        warning = radar_common.EventIdentifier(radar_common.Severity.WARNING, "mlre", "NaN")
+        for count in range(20):
+            database.insert_event(test_radar_common.TEST_SESSION_UUID,
+                                  test_radar_common.TEST_EVENT_IDENTIFIER, {"count": count})
+            database.insert_event(test_radar_common.TEST_SESSION_UUID, warning, {"count": count})
+
+        # Freeze frames are evicted once the slack of one frame is used up
+        _, freeze_frames = database.event(0)
+        self.assertLessEqual(len(freeze_frames), 5)
+        newest: radar_common.FreezeFrameData = {"count": 19}
+        self.assertEqual(newest, freeze_frames[-1][1])
+        self.assertEqual(20, database.event_statistics(0).count)
+
+        database.apply_retention()
+        expected_freeze_frames: typing.List[radar_common.FreezeFrameData] = [
+            {"count": count} for count in range(16, 20)]
+        retained: typing.List[radar_common.FreezeFrameData] = [
+            freeze_frame for _, freeze_frame in database.event(0)[1]]
+        self.assertEqual(expected_freeze_frames, retained)
+
+        # Events of other severities are kept completely
+        self.assertEqual(20, len(database.event(1)[1]))
+
+    def test_retention_reservoir(self) -> None:
+        """Test if a reservoir sample of all occurrences is kept."""
+        database = radar_database.RadarDatabase(retention={
+            radar_common.Severity.INFO: radar_retention.RetentionPolicy(
+                max_freeze_frames=10, reservoir=True)})
+        database.insert_events(test_radar_common.TEST_SESSION_UUID,
+                               [(test_radar_common.TEST_EVENT_IDENTIFIER, {"count": count})
+                                for count in range(1000)])
+        database.apply_retention()
+
+        _, freeze_frames = database.event(0)
+        self.assertEqual(10, len(freeze_frames))
+        self.assertEqual(1000, database.event_frequencies()[0][2])
+
+        # It is very unlikely that only the first or last occurrences are sampled
+        counts = [freeze_frame["count"] for _, freeze_frame in freeze_frames]
+        self.assertLess(min(counts), 900)
+        self.assertGreater(max(counts), 100)
+
+    def test_retention_max_age(self) -> None:
+        """Test if old freeze frames expire, also for events that stopped occurring."""
+        database = radar_database.RadarDatabase(retention={
+            radar_common.Severity.INFO: radar_retention.RetentionPolicy(max_age=60.0)})
+        with mock.patch("time.time", return_value=1000.0):
+            database.insert_event(test_radar_common.TEST_SESSION_UUID,
+                                  test_radar_common.TEST_EVENT_IDENTIFIER, {"count": 1})
+        with mock.patch("time.time", return_value=1050.0):
+            database.insert_event(test_radar_common.TEST_SESSION_UUID,
+                                  test_radar_common.TEST_EVENT_IDENTIFIER_ALTERNATIVE,
+                                  {"count": 2})
+        self.assertEqual(1, len(database.event(0)[1]))
+
+        # Events take turns in being checked on inserts
+        with mock.patch("time.time", return_value=1070.0):
+            for _ in range(2):
+                database.insert_event(test_radar_common.TEST_SESSION_UUID,
+                                      test_radar_common.TEST_EVENT_IDENTIFIER_ALTERNATIVE,
+                                      {"count": 3})
+
+        self.assertEqual(0, len(database.event(0)[1]))
+        self.assertEqual(3, len(database.event(1)[1]))
+        self.assertEqual(1, database.event_statistics(0).count)
+
+    def test_retention_save_and_load(self) -> None:
+        """Test if saving after an eviction rewrites the file, and timestamps are kept."""
+        metrics = radar_metrics.MetricsRegistry()
+        retention = {radar_common.Severity.INFO: radar_retention.RetentionPolicy(
+            max_freeze_frames=2)}
+        database = radar_database.RadarDatabase(metrics=metrics, retention=retention)
+        with mock.patch("time.time", return_value=1000.0):
+            for count in range(2):
+                database.insert_event(test_radar_common.TEST_SESSION_UUID,
+                                      test_radar_common.TEST_EVENT_IDENTIFIER, {"count": count})
+            database.save(test_radar_common.TEST_DATABASE_FILENAME_1)
+
+            for count in range(2, 6):
+                database.insert_event(test_radar_common.TEST_SESSION_UUID,
+                                      test_radar_common.TEST_EVENT_IDENTIFIER, {"count": count})
+            database.apply_retention()
+            database.save(test_radar_common.TEST_DATABASE_FILENAME_1)
+
+        self.assertIn("radar_database_evicted_freeze_frames_total 4", metrics.render())
+
+        loaded = radar_database.RadarDatabase(retention=retention)
+        loaded.load(test_radar_common.TEST_DATABASE_FILENAME_1)
+        self.assertEqual(database.event(0), loaded.event(0))
+        self.assertEqual(6, loaded.event_statistics(0).count)
+        timestamps: typing.List[float] = [1000.0, 1000.0]
+        stored_timestamps: typing.List[float] = list(
+            loaded._storage.freeze_frame_timestamps(0))  # pylint: disable=protected-access
+        self.assertEqual(timestamps, stored_timestamps)
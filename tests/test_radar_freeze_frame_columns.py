@@ -0,0 +1,119 @@
+"""Tests for the columnar freeze frame storage."""
+import typing
+import unittest
+import uuid
+
+import test_radar_common
+from mlre.radar import radar_common, radar_freeze_frame_columns
+
+
+class TestFreezeFrameColumns(unittest.TestCase):
+    """Tests for the columnar freeze frame storage."""
+
+    def setUp(self) -> None:
+        self.columns = radar_freeze_frame_columns.FreezeFrameColumns()
+
+    def test_initial_state(self) -> None:
+        """Test if new columns are empty."""
+        self.assertEqual(0, len(self.columns))
+        self.assertEqual(0, len(self.columns.frames()))
+
+    def test_round_trip(self) -> None:
+        """Test if frames come back with the same values, types and key order."""
+        freeze_frames: typing.List[radar_common.FreezeFrameData] = [
+            {"epoch": 1, "loss": 0.5, "phase": "train"},
+            {"phase": "test", "epoch": 2},
+            {},
+            {"epoch": 3, "loss": 0.25, "phase": "train", "converged": True}]
+        for freeze_frame in freeze_frames:
+            self.columns.append(test_radar_common.TEST_SESSION_UUID, freeze_frame)
+
+        frames = self.columns.frames()
+        self.assertEqual(4, len(self.columns))
+        expected_frames: typing.List[typing.Tuple[uuid.UUID, radar_common.FreezeFrameData]] = [
+            (test_radar_common.TEST_SESSION_UUID, freeze_frame) for freeze_frame in freeze_frames]
+        self.assertEqual(expected_frames, frames)
+        keys: typing.List[str] = ["phase", "epoch"]
+        stored_keys: typing.List[str] = list(frames[1][1])
+        self.assertEqual(keys, stored_keys)
+        self.assertIs(True, frames[3][1]["converged"])
+
+    def test_mixed_types(self) -> None:
+        """Test if a key whose values change their type keeps every value intact."""
+        values: typing.List[object] = [1, 2.5, "three", 1 << 70, None, [4]]
+        for value in values:
+            self.columns.append(test_radar_common.TEST_SESSION_UUID,
+                                {"value": value})  # type: ignore
+
+        frames = self.columns.frames()
+        stored_values: typing.List[object] = [freeze_frame["value"] for _, freeze_frame in frames]
+        self.assertEqual(values, stored_values)
+        types: typing.List[type] = [type(value) for value in values]
+        stored_types: typing.List[type] = [type(value) for value in stored_values]
+        self.assertEqual(types, stored_types)
+
+    def test_frames_window(self) -> None:
+        """Test if frames can be sliced and filtered by session."""
+        for count in range(5):
+            session_id = test_radar_common.TEST_SESSION_UUID if count % 2 == 0 else\
+                test_radar_common.TEST_SESSION_UUID_ALTERNATIVE
+            self.columns.append(session_id, {"count": count})
+
+        freeze_frames: typing.List[radar_common.FreezeFrameData] = [{"count": 1}, {"count": 2}]
+        window: typing.List[radar_common.FreezeFrameData] = [
+            freeze_frame for _, freeze_frame in self.columns.frames(1, 3)]
+        self.assertEqual(freeze_frames, window)
+        frames: typing.List[typing.Tuple[uuid.UUID, radar_common.FreezeFrameData]] = [
+            (test_radar_common.TEST_SESSION_UUID, {"count": 2}),
+            (test_radar_common.TEST_SESSION_UUID, {"count": 4})]
+        self.assertEqual(frames, self.columns.frames(
+            1, session_id=test_radar_common.TEST_SESSION_UUID))
+
+    def test_frames_are_copies(self) -> None:
+        """Test if modifying a returned frame does not change the stored one."""
+        self.columns.append(test_radar_common.TEST_SESSION_UUID,
+                            test_radar_common.TEST_EVENT_FREEZE_FRAME)
+        self.columns.frames()[0][1]["test_data"] = 0
+
+        self.assertEqual(test_radar_common.TEST_EVENT_FREEZE_FRAME,
+                         self.columns.frames()[0][1])
+
+    def test_without(self) -> None:
+        """Test if frames can be removed, keeping the others with their timestamps."""
+        for count in range(5):
+            self.columns.append(test_radar_common.TEST_SESSION_UUID if count % 2 == 0
+                                else test_radar_common.TEST_SESSION_UUID_ALTERNATIVE,
+                                {"count": count}, float(count))
+
+        remaining = self.columns.without([1, 3, 4])
+
+        self.assertEqual(5, len(self.columns))
+        frames: typing.List[typing.Tuple[uuid.UUID, radar_common.FreezeFrameData]] = [
+            (test_radar_common.TEST_SESSION_UUID, {"count": 0}),
+            (test_radar_common.TEST_SESSION_UUID, {"count": 2})]
+        self.assertEqual(frames, remaining.frames())
+        timestamps: typing.List[float] = [0.0, 2.0]
+        self.assertEqual(timestamps, remaining.timestamps())
+        session_ids: typing.Set[uuid.UUID] = {test_radar_common.TEST_SESSION_UUID}
+        self.assertEqual(session_ids, remaining.session_ids())
+
+    def test_without_strings(self) -> None:
+        """Test if frames can be appended after the frames holding a key's strings are removed."""
+        for count in range(3):
+            self.columns.append(test_radar_common.TEST_SESSION_UUID, {"name": f"name {count}"})
+        self.columns.append(test_radar_common.TEST_SESSION_UUID, {"other": 1})
+
+        remaining = self.columns.without([0, 1, 2])
+        remaining.append(test_radar_common.TEST_SESSION_UUID, {"other": 2})
+        remaining.append(test_radar_common.TEST_SESSION_UUID, {"name": 3})
+        remaining.append(test_radar_common.TEST_SESSION_UUID, {"name": "name 4"})
+
+        freeze_frames: typing.List[radar_common.FreezeFrameData] = [
+            {"other": 1}, {"other": 2}, {"name": 3}, {"name": "name 4"}]
+        remaining_freeze_frames: typing.List[radar_common.FreezeFrameData] = [
+            freeze_frame for _, freeze_frame in remaining.frames()]
+        self.assertEqual(freeze_frames, remaining_freeze_frames)
+        remaining = self.columns.without([0, 1])
+        freeze_frames = [{"name": "name 2"}, {"other": 1}]
+        remaining_freeze_frames = [freeze_frame for _, freeze_frame in remaining.frames()]
+        self.assertEqual(freeze_frames, remaining_freeze_frames)
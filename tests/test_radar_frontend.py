@@ -1,9 +1,11 @@
 """Tests for the radar frontend component."""
+import json
+
 from flask import Flask
 
 import snapshottest
 import test_radar_common
-from mlre.radar import radar_frontend
+from mlre.radar import radar_common, radar_frontend
 
 
 class RadarFrontendTestCase(test_radar_common.MockedDatabaseTestCase, snapshottest.TestCase):
@@ -30,6 +32,104 @@ class RadarFrontendTestCase(test_radar_common.MockedDatabaseTestCase, snapshotte
         content = self.frontend_test_client.get('/')
         self.assertMatchSnapshot(content.data)
 
+    def test_index_page(self) -> None:
+        """Test if the index page asks the database for the requested page only."""
+        self.database.event_count.return_value = 25
+        content = self.frontend_test_client.get('/?page=3&per_page=10&sort=index')
+        self.assertEqual(200, content.status_code)
+
+        self.database.event_frequencies.assert_called_once_with(
+            offset=20, limit=10, sort_by_frequency=False)
+        self.database.event.assert_not_called()
+        self.assertIn(b'Page 3 of 3', content.data)
+
+        # Pages past the end show the last one
+        content = self.frontend_test_client.get('/?page=9&per_page=10&sort=index')
+        self.database.event_frequencies.assert_called_with(
+            offset=20, limit=10, sort_by_frequency=False)
+        self.assertIn(b'Page 3 of 3', content.data)
+
+    def test_cached_pages(self) -> None:
+        """Test if pages are rendered again only once the database versions they show change."""
+        first = self.frontend_test_client.get('/event_details/0')
+        second = self.frontend_test_client.get('/event_details/0')
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(first.headers['ETag'], second.headers['ETag'])
+        self.assertEqual(1, self.database.event.call_count)
+        self.database.event_version.assert_called_with(0)
+
+        self.database.event_version.return_value = 4
+        third = self.frontend_test_client.get('/event_details/0')
+        self.assertNotEqual(first.headers['ETag'], third.headers['ETag'])
+        self.assertEqual(2, self.database.event.call_count)
+
+        self.frontend_test_client.get('/event_details/1')
+        self.assertEqual(3, self.database.event.call_count)
+
+    def test_not_modified(self) -> None:
+        """Test if clients that have the current page get an empty response."""
+        content = self.frontend_test_client.get('/')
+        self.assertEqual('no-cache', content.headers['Cache-Control'])
+
+        content = self.frontend_test_client.get(
+            '/', headers={'If-None-Match': content.headers['ETag']})
+        self.assertEqual(304, content.status_code)
+        self.assertEqual(b'', content.data)
+        self.assertEqual(1, self.database.event_frequencies.call_count)
+
+        self.database.sequence.return_value = 8
+        content = self.frontend_test_client.get(
+            '/', headers={'If-None-Match': content.headers['ETag']})
+        self.assertEqual(200, content.status_code)
+
+    def test_live(self) -> None:
+        """Test if the live stream sends the changes after the given sequence number."""
+        self.database.changes.side_effect = [
+            (3, [(1, test_radar_common.TEST_EVENT_IDENTIFIER_ALTERNATIVE, 2)]),
+            (3, []),
+            (4, [(0, test_radar_common.TEST_EVENT_IDENTIFIER, 1)]),
+            None]
+
+        content = self.frontend_test_client.get('/live?after=1&event=1',
+                                                environ_overrides={'wsgi.multithread': True})
+
+        self.assertEqual(200, content.status_code)
+        self.assertEqual('text/event-stream', content.mimetype)
+        messages = content.data.decode("utf-8").split("\n\n")
+        self.assertEqual("retry: 1000", messages[0])
+        self.assertTrue(messages[1].startswith("id: 3\ndata: "))
+        severity = int(test_radar_common.TEST_EVENT_SEVERITY)
+        self.assertEqual({"sequence": 3,
+                          "events": [{"index": 1, "severity": severity,
+                                      "location": test_radar_common.TEST_EVENT_LOCATION,
+                                      "description":
+                                          test_radar_common.TEST_EVENT_DESCRIPTION_ALTERNATIVE,
+                                      "added": 2}],
+                          "severities": {str(severity): 2}},
+                         json.loads(messages[1][len("id: 3\ndata: "):]))
+        self.assertEqual([": keepalive", "id: 4", "event: reset\ndata: {}", ""], messages[2:])
+        self.assertEqual([1, 3, 3, 4], [call[0][0]
+                                        for call in self.database.changes.call_args_list])
+
+    def test_live_reconnect(self) -> None:
+        """Test if a reconnecting browser continues after the last message it received."""
+        self.database.changes.return_value = None
+
+        content = self.frontend_test_client.get('/live?after=1', headers={'Last-Event-ID': '5'})
+
+        self.assertIn(b"event: reset", content.data)
+        self.assertEqual(5, self.database.changes.call_args[0][0])
+
+    def test_live_single_threaded(self) -> None:
+        """Test if servers without threads answer with the changes so far instead of streaming."""
+        self.database.changes.return_value = (1, [])
+
+        content = self.frontend_test_client.get('/live?after=1')
+
+        self.assertEqual(["retry: 1000", ": keepalive", ""],
+                         content.data.decode("utf-8").split("\n\n"))
+        self.database.changes.assert_called_once_with(1, 0.0)
+
     def test_event_details(self) -> None:
         """Snapshot tests event details page for index 0.
 
@@ -39,6 +139,27 @@ class RadarFrontendTestCase(test_radar_common.MockedDatabaseTestCase, snapshotte
 
         self.assertMatchSnapshot(content.data)
 
+    def test_event_details_page(self) -> None:
+        """Test if the event details page only loads the requested page of freeze frames."""
+        self.database.freeze_frame_summary.return_value = radar_common.FreezeFrameSummary(25, 2)
+        content = self.frontend_test_client.get(
+            '/event_details/0?page=3&per_page=10&sort=test_data&order=desc&column=other')
+        self.assertEqual(200, content.status_code)
+
+        self.database.event.assert_called_once_with(
+            0, offset=20, limit=10, sort_key='test_data', descending=True)
+        self.database.freeze_frame_summary.assert_called_once_with(0)
+        self.assertIn(b'<th><a href="/event_details/0?sort=other&amp;order=asc&amp;per_page=10'
+                      b'&amp;column=other">other</a></th>', content.data)
+        self.assertNotIn(b'>test_data</a></th>', content.data)
+        self.assertIn(b'Page 3 of 3', content.data)
+
+        # Pages past the end show the last one
+        content = self.frontend_test_client.get('/event_details/0?page=9&per_page=10')
+        self.database.event.assert_called_with(
+            0, offset=20, limit=10, sort_key=None, descending=False)
+        self.assertIn(b'Page 3 of 3', content.data)
+
     def test_client_info(self) -> None:
         """Snapshot client details page for the first session uuid.
 
@@ -0,0 +1,189 @@
+"""Tests for the ingestion queue."""
+import threading
+import typing
+import unittest
+import uuid
+
+import test_radar_common
+from mlre.radar import (radar_common, radar_database, radar_ingestion,
+                        radar_metrics)
+
+_Event = typing.Tuple[radar_common.EventIdentifier, radar_common.FreezeFrameData]
+_Call = typing.Tuple[str, uuid.UUID, typing.List[object]]
+
+
+class _RecordingDatabase(radar_database.RadarDatabase):
+    """Database that records the inserts of the writer thread instead of storing anything."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls: typing.List[_Call] = list()
+        self.on_call: typing.Callable[[str, typing.List[object]], None] =\
+            lambda name, arguments: None
+
+    def _record(self, name: str, session_id: uuid.UUID, arguments: typing.List[object]) -> None:
+        """Records an insert, then runs the test's hook for it."""
+        self.calls.append((name, session_id, arguments))
+        self.on_call(name, arguments)
+
+    def call_count(self, name: str) -> int:
+        """Counts the recorded inserts of a method."""
+        return len([call for call in self.calls if call[0] == name])
+
+    def insert_client_info(self, session_id: uuid.UUID,
+                           client_info: radar_common.ClientInfo) -> None:
+        self._record("insert_client_info", session_id, [client_info])
+
+    def insert_events(self, session_id: uuid.UUID,
+                      events: typing.Sequence[_Event]) -> typing.List[int]:
+        self._record("insert_events", session_id, list(events))
+        return list()
+
+    def insert_aggregated_events(
+            self, session_id: uuid.UUID,
+            aggregated_events: typing.Sequence[radar_common.AggregatedEvent]
+    ) -> typing.List[int]:
+        self._record("insert_aggregated_events", session_id, list(aggregated_events))
+        return list()
+
+
+class TestIngestionQueue(unittest.TestCase):
+    """Tests for the ingestion queue."""
+
+    def setUp(self) -> None:
+        """Creates a queue on top of a recording database."""
+        self.database = _RecordingDatabase()
+        self.metrics = radar_metrics.MetricsRegistry()
+        self.release = threading.Event()
+        self.ingestion_queue = radar_ingestion.IngestionQueue(
+            self.database, max_queued_events=4, metrics=self.metrics)
+
+    def tearDown(self) -> None:
+        """Stops the writer thread."""
+        self.release.set()
+        self.ingestion_queue.close()
+
+    def _block_writer(self) -> threading.Event:
+        """Makes the writer wait in its next database call until the returned event is set."""
+        started = threading.Event()
+
+        def _block(name: str, _: typing.List[object]) -> None:
+            if name == "insert_client_info":
+                started.set()
+                self.release.wait()
+
+        self.database.on_call = _block
+        self.ingestion_queue.insert_client_info(test_radar_common.TEST_SESSION_UUID,
+                                                test_radar_common.TEST_CLIENT_INFO)
+        self.assertTrue(started.wait(5.0))
+        return self.release
+
+    def test_groups_reports_by_session(self) -> None:
+        """Test if reports queued while writing are written together, grouped by session."""
+        release = self._block_writer()
+
+        aggregated_event = radar_common.AggregatedEvent(
+            test_radar_common.TEST_EVENT_IDENTIFIER, 2, 0.0, 1.0,
+            [test_radar_common.TEST_EVENT_FREEZE_FRAME])
+        event: _Event = (test_radar_common.TEST_EVENT_IDENTIFIER,
+                         test_radar_common.TEST_EVENT_FREEZE_FRAME)
+        self.assertTrue(self.ingestion_queue.insert_event(
+            test_radar_common.TEST_SESSION_UUID, *event))
+        self.assertTrue(self.ingestion_queue.insert_aggregated_events(
+            test_radar_common.TEST_SESSION_UUID_ALTERNATIVE, [aggregated_event]))
+        self.assertTrue(self.ingestion_queue.insert_events(
+            test_radar_common.TEST_SESSION_UUID, [event]))
+        release.set()
+        self.ingestion_queue.flush()
+
+        calls: typing.List[_Call] = [
+            ("insert_client_info", test_radar_common.TEST_SESSION_UUID,
+             [test_radar_common.TEST_CLIENT_INFO]),
+            ("insert_events", test_radar_common.TEST_SESSION_UUID, [event, event]),
+            ("insert_aggregated_events", test_radar_common.TEST_SESSION_UUID_ALTERNATIVE,
+             [aggregated_event])]
+        self.assertEqual(calls, self.database.calls)
+
+    def test_isolates_failing_reports(self) -> None:
+        """Test if a report that fails to be written does not take the rest of its batch along."""
+        release = self._block_writer()
+        bad_event: _Event = (test_radar_common.TEST_EVENT_IDENTIFIER_ALTERNATIVE,
+                             test_radar_common.TEST_EVENT_FREEZE_FRAME)
+        good_event: _Event = (test_radar_common.TEST_EVENT_IDENTIFIER,
+                              test_radar_common.TEST_EVENT_FREEZE_FRAME)
+
+        def _insert_events(name: str, events: typing.List[object]) -> None:
+            if name == "insert_events" and bad_event in events:
+                raise ValueError("Bad event")
+
+        self.database.on_call = _insert_events
+        self.ingestion_queue.insert_event(test_radar_common.TEST_SESSION_UUID, *good_event)
+        self.ingestion_queue.insert_event(test_radar_common.TEST_SESSION_UUID, *bad_event)
+        self.ingestion_queue.insert_event(test_radar_common.TEST_SESSION_UUID_ALTERNATIVE,
+                                          *good_event)
+        with self.assertLogs(radar_ingestion.__name__) as logs:
+            release.set()
+            self.ingestion_queue.flush()
+
+        calls: typing.List[_Call] = [
+            ("insert_events", test_radar_common.TEST_SESSION_UUID, [good_event, bad_event]),
+            ("insert_events", test_radar_common.TEST_SESSION_UUID, [good_event]),
+            ("insert_events", test_radar_common.TEST_SESSION_UUID, [bad_event]),
+            ("insert_events", test_radar_common.TEST_SESSION_UUID_ALTERNATIVE, [good_event])]
+        self.assertEqual(calls, self.database.calls[1:])
+        expected_levels: typing.List[str] = ["WARNING", "ERROR"]
+        levels: typing.List[str] = [record.levelname for record in logs.records]
+        self.assertEqual(expected_levels, levels)
+
+    def test_rejects_when_full(self) -> None:
+        """Test if reports are rejected while the queue is full, and counted."""
+        release = self._block_writer()
+
+        event: _Event = (test_radar_common.TEST_EVENT_IDENTIFIER,
+                         test_radar_common.TEST_EVENT_FREEZE_FRAME)
+        self.assertTrue(self.ingestion_queue.insert_events(
+            test_radar_common.TEST_SESSION_UUID, [event, event, event]))
+        self.assertFalse(self.ingestion_queue.insert_event(
+            test_radar_common.TEST_SESSION_UUID, *event))
+        self.assertIn("radar_ingestion_queue_depth 4\n", self.metrics.render())
+        self.assertIn("radar_ingestion_rejected_events_total 1\n", self.metrics.render())
+
+        release.set()
+        self.ingestion_queue.flush()
+        self.assertIn("radar_ingestion_queue_depth 0\n", self.metrics.render())
+        self.assertTrue(self.ingestion_queue.insert_event(
+            test_radar_common.TEST_SESSION_UUID, *event))
+
+    def test_close_writes_queued_reports(self) -> None:
+        """Test if closing writes the remaining reports, and later reports raise."""
+        release = self._block_writer()
+        self.ingestion_queue.insert_event(test_radar_common.TEST_SESSION_UUID,
+                                          test_radar_common.TEST_EVENT_IDENTIFIER,
+                                          test_radar_common.TEST_EVENT_FREEZE_FRAME)
+        release.set()
+        self.ingestion_queue.close()
+
+        self.assertEqual(1, self.database.call_count("insert_events"))
+        with self.assertRaises(ValueError):
+            self.ingestion_queue.insert_client_info(test_radar_common.TEST_SESSION_UUID,
+                                                    test_radar_common.TEST_CLIENT_INFO)
+
+    def test_survives_failing_writes(self) -> None:
+        """Test if the writer continues after a database error."""
+        failures = [RuntimeError("Disk full")]
+
+        def _fail_once(name: str, _: typing.List[object]) -> None:
+            if name == "insert_events" and failures:
+                raise failures.pop()
+
+        self.database.on_call = _fail_once
+        event: _Event = (test_radar_common.TEST_EVENT_IDENTIFIER,
+                         test_radar_common.TEST_EVENT_FREEZE_FRAME)
+
+        with self.assertLogs(radar_ingestion.__name__):
+            self.ingestion_queue.insert_event(test_radar_common.TEST_SESSION_UUID, *event)
+            self.ingestion_queue.flush()
+        self.ingestion_queue.insert_event(test_radar_common.TEST_SESSION_UUID, *event)
+        self.ingestion_queue.flush()
+
+        self.assertEqual(2, self.database.call_count("insert_events"))
@@ -0,0 +1,63 @@
+"""Test for radar server metrics."""
+import unittest
+
+from mlre.radar import radar_metrics
+
+
+class TestRadarMetrics(unittest.TestCase):
+    """Test for radar server metrics."""
+
+    def setUp(self) -> None:
+        self.metrics = radar_metrics.MetricsRegistry()
+
+    def test_counter(self) -> None:
+        """Test if counters are rendered per label value."""
+        counter = self.metrics.counter("requests_total", "Requests.", ("method",))
+        counter.inc(("GET",))
+        counter.inc(("GET",))
+        counter.inc(("POST",), 0.5)
+
+        self.assertEqual(2, counter.value(("GET",)))
+        self.assertEqual("# HELP requests_total Requests.\n"
+                         "# TYPE requests_total counter\n"
+                         'requests_total{method="GET"} 2\n'
+                         'requests_total{method="POST"} 0.5\n', self.metrics.render())
+
+    def test_histogram(self) -> None:
+        """Test if histogram buckets are cumulative and include their upper bound."""
+        histogram = self.metrics.histogram("size", "Sizes.", buckets=(1.0, 10.0))
+        for value in (0.5, 1.0, 5.0, 100.0):
+            histogram.observe(value)
+
+        self.assertEqual(4, histogram.count())
+        self.assertEqual("# HELP size Sizes.\n"
+                         "# TYPE size histogram\n"
+                         'size_bucket{le="1"} 2\n'
+                         'size_bucket{le="10"} 3\n'
+                         'size_bucket{le="+Inf"} 4\n'
+                         "size_sum 106.5\n"
+                         "size_count 4\n", self.metrics.render())
+
+    def test_gauge(self) -> None:
+        """Test if gauges are read when rendered."""
+        depth = [3]
+        gauge = self.metrics.gauge("depth", "Depth.", lambda: depth[0])
+        depth[0] = 7
+        self.assertEqual(7, gauge.value())
+        self.assertIn("depth 7\n", self.metrics.render())
+
+    def test_label_escaping(self) -> None:
+        """Test if label values are escaped."""
+        counter = self.metrics.counter("errors_total", "Errors.", ("message",))
+        counter.inc(('say "hi"\\\n',))
+        self.assertIn('errors_total{message="say \\"hi\\"\\\\\\n"} 1', self.metrics.render())
+
+    def test_registry(self) -> None:
+        """Test if metrics are shared by name and their types are checked."""
+        counter = self.metrics.counter("total", "Total.")
+        self.assertIs(counter, self.metrics.counter("total", "Total."))
+
+        with self.assertRaises(ValueError):
+            self.metrics.histogram("total", "Total.")
+        with self.assertRaises(ValueError):
+            self.metrics.gauge("total", "Total.", lambda: 0)
@@ -0,0 +1,50 @@
+"""Tests for the radar database record log."""
+import io
+import pickle  # nosec
+import typing
+import unittest
+
+import test_radar_common
+from mlre.radar import radar_record_log
+
+
+class TestRadarRecordLog(unittest.TestCase):
+    """Tests for the radar database record log."""
+
+    def test_round_trip(self) -> None:
+        """Test if records are read back in order."""
+        records: typing.List[radar_record_log.Record] = [
+            ("event_identifier", 0, test_radar_common.TEST_EVENT_IDENTIFIER),
+            ("occurrences", 0, 1, None, None)]
+        db_file = io.BytesIO()
+        for record in records:
+            radar_record_log.write_record(db_file, record)
+
+        db_file.seek(0)
+        self.assertEqual(records, list(radar_record_log.read_records(db_file)))  # type: ignore
+
+    def test_torn_record(self) -> None:
+        """Test if a truncated record at the end is ignored."""
+        db_file = io.BytesIO()
+        radar_record_log.write_record(db_file, ("occurrences", 0, 1, None, None))
+        radar_record_log.write_record(db_file, ("occurrences", 0, 2, None, None))
+
+        torn_file = io.BytesIO(db_file.getvalue()[:-1])
+        self.assertEqual(1, len(list(radar_record_log.read_records(torn_file))))
+
+    def test_legacy_records(self) -> None:
+        """Test if a pickled dictionary is converted into records."""
+        event_data: typing.List[object] = [
+            (test_radar_common.TEST_EVENT_IDENTIFIER,
+             [(test_radar_common.TEST_SESSION_UUID, test_radar_common.TEST_EVENT_FREEZE_FRAME)])]
+        client_info: typing.Dict[object, object] = {
+            test_radar_common.TEST_SESSION_UUID: test_radar_common.TEST_CLIENT_INFO}
+        legacy_database: typing.Dict[str, object] = {
+            "event_data": event_data, "client_info": client_info}
+        db_file = io.BytesIO(pickle.dumps(legacy_database))
+
+        kinds: typing.List[str] = [
+            record[0] for record in radar_record_log.read_legacy_records(db_file)]
+        expected_kinds: typing.List[str] = [
+            "client_info", "event_identifier", "freeze_frames", "occurrences"]
+        self.assertEqual(expected_kinds, kinds)
@@ -0,0 +1,82 @@
+"""Test for radar retention policies."""
+import random
+import typing
+import unittest
+
+from mlre.radar import radar_retention
+
+
+class TestRadarRetention(unittest.TestCase):
+    """Test for radar retention policies."""
+
+    def setUp(self) -> None:
+        self.rng = random.Random(1234)
+
+    def test_keep_everything(self) -> None:
+        """Test if an empty policy keeps all freeze frames."""
+        policy = radar_retention.RetentionPolicy()
+        positions: typing.List[int] = [0, 1, 2]
+        self.assertEqual(positions, radar_retention.sampled_freeze_frames(
+            policy, 1000, 3, 3, self.rng))
+        self.assertEqual(0, len(radar_retention.select_evicted(
+            policy, [0.0, 1.0, 2.0], 1000.0, self.rng)))
+
+    def test_newest(self) -> None:
+        """Test if a ring buffer evicts the oldest freeze frames."""
+        policy = radar_retention.RetentionPolicy(max_freeze_frames=2)
+        evicted: typing.List[int] = [0, 1, 2]
+        self.assertEqual(evicted, radar_retention.select_evicted(
+            policy, [0.0, 1.0, 2.0, 3.0, 4.0], 4.0, self.rng))
+        self.assertEqual(0, len(radar_retention.select_evicted(
+            policy, [0.0, 1.0], 4.0, self.rng)))
+        self.assertEqual(1, radar_retention.eviction_slack(policy))
+
+    def test_max_age(self) -> None:
+        """Test if freeze frames older than the maximum age are evicted before counting."""
+        policy = radar_retention.RetentionPolicy(max_freeze_frames=2, max_age=10.0)
+        evicted: typing.List[int] = [0, 1, 2]
+        self.assertEqual(evicted, radar_retention.select_evicted(
+            policy, [0.0, 5.0, 12.0, 15.0, 20.0], 21.0, self.rng))
+        evicted = [0]
+        self.assertEqual(evicted, radar_retention.select_evicted(
+            policy, [0.0, 15.0], 21.0, self.rng))
+
+    def test_reservoir_is_uniform(self) -> None:
+        """Test if every occurrence ends up in the reservoir sample equally often."""
+        policy = radar_retention.RetentionPolicy(max_freeze_frames=10, reservoir=True)
+        occurrences = 100
+        kept_counts = [0] * occurrences
+        for _ in range(1000):
+            # Like a database, store sampled frames and evict once the slack is used up
+            stored: typing.List[int] = list()
+            for occurrence in range(occurrences):
+                if radar_retention.sampled_freeze_frames(policy, occurrence, 1, 1, self.rng):
+                    stored.append(occurrence)
+                if len(stored) > 10 + radar_retention.eviction_slack(policy):
+                    evicted = set(radar_retention.select_evicted(
+                        policy, [0.0] * len(stored), 0.0, self.rng))
+                    stored = [frame for position, frame in enumerate(stored)
+                              if position not in evicted]
+
+            evicted = set(radar_retention.select_evicted(
+                policy, [0.0] * len(stored), 0.0, self.rng))
+            stored = [frame for position, frame in enumerate(stored) if position not in evicted]
+            self.assertEqual(10, len(stored))
+            for occurrence in stored:
+                kept_counts[occurrence] += 1
+
+        # Each occurrence is kept in 10% of the runs, i.e. 100 times
+        self.assertLess(max(kept_counts), 150)
+        self.assertGreater(min(kept_counts), 50)
+
+    def test_aggregated_reservoir(self) -> None:
+        """Test if aggregated freeze frames stand for several occurrences each."""
+        policy = radar_retention.RetentionPolicy(max_freeze_frames=10, reservoir=True)
+        positions: typing.List[int] = [0, 1]
+        self.assertEqual(positions, radar_retention.sampled_freeze_frames(
+            policy, 0, 10, 2, self.rng))
+
+        sampled = sum(len(radar_retention.sampled_freeze_frames(policy, 1000000, 1000, 10,
+                                                                self.rng))
+                      for _ in range(100))
+        self.assertLess(sampled, 10)
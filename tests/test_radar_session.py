@@ -1,11 +1,12 @@
 """Tests for the radar session object."""
 import os
 import socket
+import tempfile
 import unittest
 from unittest import mock
 
 import test_radar_common
-from mlre.radar import radar_common, radar_session
+from mlre.radar import radar_common, radar_session, radar_spool
 
 
 class TestRadarSession(unittest.TestCase):
@@ -99,3 +100,56 @@ class TestRadarSession(unittest.TestCase):
             description="Session ended")
 
         self.assertEqual(expected_identifier, actual_identifier)
+
+    def test_closes_on_exit(self) -> None:
+        """Tests if the Session closes the client, which flushes buffered events, on exit."""
+        self.test_server_default()
+
+        self.assertEqual(
+            1, self.patched_api_client_type.return_value.close.call_count)
+
+    def test_background(self) -> None:
+        """Tests if a background Session reports through a buffered client and closes on exit."""
+        with radar_session.RadarSession(background=True):
+            pass
+
+        self.assertTrue(
+            self.patched_api_client_type.call_args[1]['buffered'])
+        self.assertEqual(
+            1, self.patched_api_client_type.return_value.report_client_info.call_count)
+        self.assertEqual(
+            2, self.patched_api_client_type.return_value.report_event.call_count)
+        self.assertEqual(mock.call.close(),
+                         self.patched_api_client_type.return_value.method_calls[-1])
+
+    def test_aggregation_window(self) -> None:
+        """Tests if the Session passes the aggregation window on to the client."""
+        with radar_session.RadarSession(aggregation_window=5.0):
+            pass
+
+        self.assertEqual(
+            5.0, self.patched_api_client_type.call_args[1]['aggregation_window'])
+
+    def test_spool_directory(self) -> None:
+        """Tests if the Session spools reports to the given directory."""
+        with tempfile.TemporaryDirectory() as directory:
+            with radar_session.RadarSession(spool_directory=directory):
+                pass
+
+            spool = self.patched_api_client_type.call_args[1]['spool']
+            self.assertIsInstance(spool, radar_spool.Spool)
+            spool.close()
+
+    def test_environment_filters(self) -> None:
+        """Tests if only allowed and not denied environment variables are reported."""
+        with mock.patch.dict(os.environ, {"RADAR_TEST_KEEP": "1", "RADAR_TEST_SECRET": "2",
+                                          "OTHER_TEST_VARIABLE": "3"}):
+            with radar_session.RadarSession(environment_allowlist=["RADAR_TEST_*"],
+                                            environment_denylist=["*_SECRET"]):
+                pass
+
+        actual_client_info: radar_common.ClientInfo =\
+            self.patched_api_client_type.return_value.report_client_info.call_args[
+                0][0]
+        self.assertEqual({"RADAR_TEST_KEEP": "1"},
+                         actual_client_info.environment_variables)
@@ -0,0 +1,177 @@
+"""Tests for the client-side spool."""
+import os
+import tempfile
+import threading
+import typing
+import unittest
+
+from mlre.radar import radar_spool
+
+
+def _event_request(session_id: str, number: int) -> radar_spool.SpooledRequest:
+    """Creates a single event report."""
+    return ("report_event",
+            {"session_id": session_id, "event_identifier": ["e", number],
+             "freeze_frame": {"number": number}})
+
+
+def _event_requests(session_id: str,
+                    numbers: typing.Iterable[int]) -> typing.List[radar_spool.SpooledRequest]:
+    """Creates single event reports."""
+    return [_event_request(session_id, number) for number in numbers]
+
+
+def _requests(spooled: typing.Iterable[typing.Tuple[radar_spool.SpooledRequest,
+                                                    radar_spool.Position]]
+              ) -> typing.List[radar_spool.SpooledRequest]:
+    """Leaves out the positions of read requests."""
+    return [request for request, _ in spooled]
+
+
+class TestSpool(unittest.TestCase):
+    """Tests for the spool segment files."""
+
+    def setUp(self) -> None:
+        self._directory = tempfile.TemporaryDirectory()
+        self.directory = self._directory.name
+
+    def tearDown(self) -> None:
+        self._directory.cleanup()
+
+    def test_read_and_commit(self) -> None:
+        """Test if requests are read in order, and committed requests are not read again."""
+        spool = radar_spool.Spool(self.directory)
+        for number in range(3):
+            self.assertTrue(spool.append(_event_request("a", number)))
+
+        requests = spool.read(2)
+        self.assertEqual(_event_requests("a", (0, 1)), _requests(requests))
+        self.assertFalse(spool.empty())
+
+        spool.commit(requests[0][1])
+        self.assertEqual(_event_requests("a", (1, 2)), _requests(spool.read(10)))
+
+        spool.commit(spool.read(10)[-1][1])
+        self.assertTrue(spool.empty())
+        self.assertEqual(0, len(spool.read(10)))
+        spool.close()
+
+    def test_replays_after_crash(self) -> None:
+        """Test if uncommitted requests are read again, and a torn record is discarded."""
+        spool = radar_spool.Spool(self.directory)
+        for number in range(3):
+            spool.append(_event_request("a", number))
+        spool.commit(spool.read(1)[0][1])
+
+        # Simulate a crash in the middle of appending a record
+        spool._file.write(b"\x10\x00\x00\x00\x00")  # pylint: disable=protected-access
+        spool.close()
+
+        spool = radar_spool.Spool(self.directory)
+        spool.append(_event_request("a", 3))
+        self.assertEqual(_event_requests("a", (1, 2, 3)), _requests(spool.read(10)))
+        spool.close()
+
+    def test_segments(self) -> None:
+        """Test if requests are spread over segment files, which are deleted once committed."""
+        spool = radar_spool.Spool(self.directory, max_segment_bytes=200)
+        for number in range(10):
+            spool.append(_event_request("a", number))
+        segment_count = len(os.listdir(self.directory))
+        self.assertGreater(segment_count, 2)
+
+        requests = spool.read(100)
+        self.assertEqual(_event_requests("a", range(10)), _requests(requests))
+
+        spool.commit(requests[5][1])
+        self.assertLess(len(os.listdir(self.directory)), segment_count)
+        spool.close()
+
+        spool = radar_spool.Spool(self.directory, max_segment_bytes=200)
+        self.assertEqual(_event_requests("a", range(6, 10)), _requests(spool.read(100)))
+        spool.close()
+
+    def test_drops_when_full(self) -> None:
+        """Test if requests are dropped while the spool is full, and accepted once uploaded."""
+        spool = radar_spool.Spool(self.directory, max_bytes=300, max_segment_bytes=100)
+        appended = [spool.append(_event_request("a", number)) for number in range(10)]
+        self.assertIn(False, appended)
+        self.assertEqual(appended.count(False), spool.dropped_requests)
+
+        spool.commit(spool.read(100)[-1][1])
+        self.assertTrue(spool.append(_event_request("a", 10)))
+        spool.close()
+
+
+class TestSpoolUploader(unittest.TestCase):
+    """Tests for uploading spooled requests."""
+
+    def setUp(self) -> None:
+        self._directory = tempfile.TemporaryDirectory()
+        self.spool = radar_spool.Spool(self._directory.name)
+        self.uploaded: typing.List[radar_spool.SpooledRequest] = list()
+        self.statuses: typing.List[int] = list()
+        self.lock = threading.Lock()
+
+    def tearDown(self) -> None:
+        self.spool.close()
+        self._directory.cleanup()
+
+    def _upload(self, path: str, request_body: typing.Mapping[str, object]) -> int:
+        """Records uploads, responding with the next status."""
+        with self.lock:
+            status = self.statuses.pop(0) if self.statuses else 200
+            if status < 400:
+                self.uploaded.append((path, request_body))
+            return status
+
+    def test_merges_events(self) -> None:
+        """Test if consecutive events of a session are uploaded in one request."""
+        self.spool.append(("report_client_info", {"session_id": "a", "client_info": None}))
+        self.spool.append(_event_request("a", 0))
+        self.spool.append(("report_events", {"session_id": "a",
+                                             "events": [(["e", 1], {"number": 1})]}))
+        self.spool.append(_event_request("b", 2))
+
+        uploader = radar_spool.SpoolUploader(self.spool, self._upload)
+        self.assertTrue(uploader.close(10.0))
+
+        uploaded: typing.List[radar_spool.SpooledRequest] = [
+            ("report_client_info", {"session_id": "a", "client_info": None}),
+            ("report_events", {"session_id": "a", "events": [(["e", 0], {"number": 0}),
+                                                             (["e", 1], {"number": 1})]}),
+            ("report_events", {"session_id": "b", "events": [(["e", 2], {"number": 2})]})]
+        self.assertEqual(uploaded, self.uploaded)
+        self.assertTrue(self.spool.empty())
+
+    def test_retries_while_unavailable(self) -> None:
+        """Test if uploads are retried while the server is unavailable."""
+        self.statuses = [503, 503]
+        self.spool.append(_event_request("a", 0))
+
+        uploader = radar_spool.SpoolUploader(self.spool, self._upload, poll_interval=0.01)
+        self.assertTrue(uploader.close(10.0))
+
+        self.assertEqual(1, len(self.uploaded))
+        self.assertEqual(0, len(self.statuses))
+
+    def test_skips_rejected(self) -> None:
+        """Test if requests the server rejects do not block the spool."""
+        self.statuses = [400]
+        self.spool.append(("report_client_info", {"session_id": "a", "client_info": None}))
+        self.spool.append(_event_request("a", 0))
+
+        uploader = radar_spool.SpoolUploader(self.spool, self._upload)
+        self.assertTrue(uploader.close(10.0))
+
+        self.assertEqual(1, len(self.uploaded))
+        self.assertEqual("report_events", self.uploaded[0][0])
+
+    def test_close_keeps_requests(self) -> None:
+        """Test if requests stay in the spool if the server does not come back in time."""
+        self.statuses = [503] * 1000
+        self.spool.append(_event_request("a", 0))
+
+        uploader = radar_spool.SpoolUploader(self.spool, self._upload, poll_interval=0.01)
+        self.assertFalse(uploader.close(0.1))
+        self.assertFalse(self.spool.empty())
@@ -0,0 +1,179 @@
+"""Tests for the SQLite storage backend."""
+import typing
+import unittest
+from unittest import mock
+
+import test_radar_common
+from mlre.radar import (radar_common, radar_database, radar_sqlite_storage,
+                        radar_storage)
+from test_radar_storage import StorageBackendContract
+
+
+class TestSQLiteStorageBackend(StorageBackendContract, unittest.TestCase):
+    """Tests for the SQLite storage backend."""
+
+    def setUp(self) -> None:
+        test_radar_common.remove_sqlite_files(
+            test_radar_common.TEST_SQLITE_FILENAME)
+        self.storage = radar_sqlite_storage.SQLiteStorageBackend(
+            test_radar_common.TEST_SQLITE_FILENAME)
+
+    def tearDown(self) -> None:
+        self.storage.close()
+        test_radar_common.remove_sqlite_files(
+            test_radar_common.TEST_SQLITE_FILENAME)
+
+    def test_durable_database(self) -> None:
+        """Test if a radar database on SQLite keeps its data after reopening the file."""
+        database = radar_database.RadarDatabase(self.storage)
+        database.insert_client_info(test_radar_common.TEST_SESSION_UUID,
+                                    test_radar_common.TEST_CLIENT_INFO)
+        index_1 = database.insert_event(test_radar_common.TEST_SESSION_UUID,
+                                        test_radar_common.TEST_EVENT_IDENTIFIER,
+                                        test_radar_common.TEST_EVENT_FREEZE_FRAME)
+        database.close()
+
+        # Reopen without saving
+        self.storage = radar_sqlite_storage.SQLiteStorageBackend(
+            test_radar_common.TEST_SQLITE_FILENAME)
+        database = radar_database.RadarDatabase(self.storage)
+
+        event_identifiers: typing.List[typing.Tuple[int, radar_common.EventIdentifier]] = [
+            (index_1, test_radar_common.TEST_EVENT_IDENTIFIER)]
+        self.assertEqual(event_identifiers, database.event_identifiers())
+        freeze_frames: radar_storage.FreezeFrameList = [
+            (test_radar_common.TEST_SESSION_UUID, test_radar_common.TEST_EVENT_FREEZE_FRAME)]
+        self.assertEqual(freeze_frames, database.event(index_1)[1])
+        self.assertEqual(test_radar_common.TEST_CLIENT_INFO,
+                         database.client_info(test_radar_common.TEST_SESSION_UUID))
+
+        # Known events keep their index
+        index_2 = database.insert_event(test_radar_common.TEST_SESSION_UUID,
+                                        test_radar_common.TEST_EVENT_IDENTIFIER,
+                                        test_radar_common.TEST_EVENT_FREEZE_FRAME)
+        self.assertEqual(index_1, index_2)
+        self.assertEqual(2, len(database.event(index_1)[1]))
+
+    def test_shared_database(self) -> None:
+        """Test if radar databases of several processes see each other's events."""
+        database_1 = radar_database.RadarDatabase(self.storage)
+        storage_2 = radar_sqlite_storage.SQLiteStorageBackend(
+            test_radar_common.TEST_SQLITE_FILENAME)
+        database_2 = radar_database.RadarDatabase(storage_2)
+
+        index_1 = database_1.insert_event(test_radar_common.TEST_SESSION_UUID,
+                                          test_radar_common.TEST_EVENT_IDENTIFIER,
+                                          test_radar_common.TEST_EVENT_FREEZE_FRAME)
+        index_2 = database_2.insert_event(test_radar_common.TEST_SESSION_UUID_ALTERNATIVE,
+                                          test_radar_common.TEST_EVENT_IDENTIFIER_ALTERNATIVE,
+                                          test_radar_common.TEST_EVENT_FREEZE_FRAME_ALTERNATIVE)
+        index_3 = database_2.insert_event(test_radar_common.TEST_SESSION_UUID_ALTERNATIVE,
+                                          test_radar_common.TEST_EVENT_IDENTIFIER,
+                                          test_radar_common.TEST_EVENT_FREEZE_FRAME_ALTERNATIVE)
+
+        # Both databases agree on the indices
+        self.assertEqual(index_1, index_3)
+        self.assertNotEqual(index_1, index_2)
+        expected_identifiers = [(index_1, test_radar_common.TEST_EVENT_IDENTIFIER),
+                                (index_2, test_radar_common.TEST_EVENT_IDENTIFIER_ALTERNATIVE)]
+        self.assertEqual(expected_identifiers, database_1.event_identifiers())
+        self.assertEqual(expected_identifiers, database_2.event_identifiers())
+
+        # Occurrences are counted across processes
+        self.assertEqual(
+            test_radar_common.TEST_EVENT_IDENTIFIER_ALTERNATIVE, database_1.event(index_2)[0])
+        self.assertEqual(2, len(database_1.event(index_1)[1]))
+        frequencies: typing.List[typing.Tuple[int, radar_common.EventIdentifier, int]] = [
+            (index_1, test_radar_common.TEST_EVENT_IDENTIFIER, 2),
+            (index_2, test_radar_common.TEST_EVENT_IDENTIFIER_ALTERNATIVE, 1)]
+        self.assertEqual(frequencies, database_1.event_frequencies(sort_by_frequency=True))
+        severities: typing.Dict[radar_common.Severity, int] = {radar_common.Severity.INFO: 3}
+        self.assertEqual(severities, database_1.severity_frequencies())
+        locations: typing.Dict[str, int] = {test_radar_common.TEST_EVENT_LOCATION: 3}
+        self.assertEqual(locations, database_2.location_frequencies())
+
+        storage_2.close()
+
+    def test_shared_changes(self) -> None:
+        """Test if a radar database reports changes recorded by other processes."""
+        database_1 = radar_database.RadarDatabase(self.storage)
+        storage_2 = radar_sqlite_storage.SQLiteStorageBackend(
+            test_radar_common.TEST_SQLITE_FILENAME)
+        database_2 = radar_database.RadarDatabase(storage_2)
+
+        start = database_1.sequence()
+        database_2.insert_events(test_radar_common.TEST_SESSION_UUID,
+                                 [(test_radar_common.TEST_EVENT_IDENTIFIER,
+                                   test_radar_common.TEST_EVENT_FREEZE_FRAME)] * 2)
+
+        changes = database_1.changes(start, timeout=10.0)
+        if changes is None:
+            self.fail("The changes were forgotten.")
+        sequence, changed_events = changes
+        self.assertLess(start, sequence)
+        expected_events: typing.List[typing.Tuple[int, radar_common.EventIdentifier, int]] = [
+            (0, test_radar_common.TEST_EVENT_IDENTIFIER, 2)]
+        self.assertEqual(expected_events, changed_events)
+
+        # Sequence numbers mean the same in every process
+        self.assertEqual(sequence, database_1.sequence())
+        self.assertEqual(sequence, database_2.sequence())
+        database_1.insert_event(test_radar_common.TEST_SESSION_UUID_ALTERNATIVE,
+                                test_radar_common.TEST_EVENT_IDENTIFIER_ALTERNATIVE,
+                                test_radar_common.TEST_EVENT_FREEZE_FRAME_ALTERNATIVE)
+        self.assertEqual(
+            (sequence + 1, [(1, test_radar_common.TEST_EVENT_IDENTIFIER_ALTERNATIVE, 1)]),
+            database_2.changes(sequence))
+        self.assertEqual((sequence + 1, []), database_1.changes(sequence + 1))
+
+        storage_2.close()
+
+    def test_changes_forgotten(self) -> None:
+        """Test if only the most recent changes are kept."""
+        index = self.storage.insert_event_identifier(test_radar_common.TEST_EVENT_IDENTIFIER)
+        with mock.patch("mlre.radar.radar_sqlite_storage._MAX_LOGGED_CHANGES", 2):
+            for _ in range(3):
+                self.storage.record_occurrences(index, 1, None, None)
+
+        self.assertEqual(3, self.storage.change_sequence())
+        self.assertIsNone(self.storage.occurrence_changes(0))
+        self.assertEqual((3, [(index, 2)]), self.storage.occurrence_changes(1))
+        self.assertIsNone(self.storage.occurrence_changes(4))
+
+    def test_shared_event_version(self) -> None:
+        """Test if an event's version changes with occurrences recorded by other processes."""
+        database_1 = radar_database.RadarDatabase(self.storage)
+        storage_2 = radar_sqlite_storage.SQLiteStorageBackend(
+            test_radar_common.TEST_SQLITE_FILENAME)
+        database_2 = radar_database.RadarDatabase(storage_2)
+
+        index = database_2.insert_event(test_radar_common.TEST_SESSION_UUID,
+                                        test_radar_common.TEST_EVENT_IDENTIFIER,
+                                        test_radar_common.TEST_EVENT_FREEZE_FRAME)
+        version = database_1.event_version(index)
+        database_2.insert_event(test_radar_common.TEST_SESSION_UUID,
+                                test_radar_common.TEST_EVENT_IDENTIFIER,
+                                test_radar_common.TEST_EVENT_FREEZE_FRAME)
+        self.assertNotEqual(version, database_1.event_version(index))
+
+        storage_2.close()
+
+    def test_shared_client_info_version(self) -> None:
+        """Test if the client info version changes with client info stored by other processes."""
+        database_1 = radar_database.RadarDatabase(self.storage)
+        storage_2 = radar_sqlite_storage.SQLiteStorageBackend(
+            test_radar_common.TEST_SQLITE_FILENAME)
+        database_2 = radar_database.RadarDatabase(storage_2)
+
+        version = database_1.client_info_version()
+        database_2.insert_client_info(test_radar_common.TEST_SESSION_UUID,
+                                      test_radar_common.TEST_CLIENT_INFO)
+        self.assertNotEqual(version, database_1.client_info_version())
+
+        # Replacing the client info of a session changes the version, too
+        version = database_1.client_info_version()
+        database_2.insert_client_info(test_radar_common.TEST_SESSION_UUID,
+                                      test_radar_common.TEST_CLIENT_INFO_ALTERNATIVE)
+        self.assertNotEqual(version, database_1.client_info_version())
+
+        storage_2.close()
@@ -0,0 +1,264 @@
+"""Tests for the radar storage backends."""
+import typing
+import unittest
+import uuid
+
+import test_radar_common
+from mlre.radar import radar_common, radar_storage
+
+
+class StorageBackendContract:
+    """Tests every storage backend has to pass.
+
+    Subclasses need to provide a fresh backend in self.storage."""
+
+    storage: radar_storage.StorageBackend
+
+    # pylint: disable=no-member
+
+    def test_initial_state(self) -> None:
+        """Test if a new backend is empty."""
+        self.assertEqual(0, len(self.storage.event_identifiers()))  # type: ignore
+        self.assertEqual(0, len(list(self.storage.client_infos())))  # type: ignore
+
+    def test_insert_event_identifiers(self) -> None:
+        """Test if identifiers get consecutive indices and duplicates keep theirs."""
+        index_1 = self.storage.insert_event_identifier(
+            test_radar_common.TEST_EVENT_IDENTIFIER)
+        index_2 = self.storage.insert_event_identifier(
+            test_radar_common.TEST_EVENT_IDENTIFIER_ALTERNATIVE)
+        index_3 = self.storage.insert_event_identifier(
+            test_radar_common.TEST_EVENT_IDENTIFIER)
+
+        self.assertEqual(0, index_1)  # type: ignore
+        self.assertEqual(1, index_2)  # type: ignore
+        self.assertEqual(index_1, index_3)  # type: ignore
+        self.assertEqual([test_radar_common.TEST_EVENT_IDENTIFIER,  # type: ignore
+                          test_radar_common.TEST_EVENT_IDENTIFIER_ALTERNATIVE],
+                         list(self.storage.event_identifiers()))
+
+    def test_append_freeze_frames(self) -> None:
+        """Test if freeze frames are kept per event and in order."""
+        index_1 = self.storage.insert_event_identifier(
+            test_radar_common.TEST_EVENT_IDENTIFIER)
+        index_2 = self.storage.insert_event_identifier(
+            test_radar_common.TEST_EVENT_IDENTIFIER_ALTERNATIVE)
+
+        self.storage.append_freeze_frame(
+            index_1, test_radar_common.TEST_SESSION_UUID, test_radar_common.TEST_EVENT_FREEZE_FRAME)
+        self.storage.append_freeze_frame(
+            index_2, test_radar_common.TEST_SESSION_UUID, {"other": "value"})
+        self.storage.append_freeze_frame(
+            index_1, test_radar_common.TEST_SESSION_UUID_ALTERNATIVE, {"count": 3})
+
+        self.assertEqual([(test_radar_common.TEST_SESSION_UUID,  # type: ignore
+                           test_radar_common.TEST_EVENT_FREEZE_FRAME),
+                          (test_radar_common.TEST_SESSION_UUID_ALTERNATIVE, {"count": 3})],
+                         list(self.storage.freeze_frames(index_1)))
+        self.assertEqual([(test_radar_common.TEST_SESSION_UUID,  # type: ignore
+                           {"other": "value"})],
+                         list(self.storage.freeze_frames(index_2)))
+        self.assertEqual([(test_radar_common.TEST_SESSION_UUID_ALTERNATIVE,  # type: ignore
+                           {"count": 3})],
+                         list(self.storage.freeze_frames(index_1, start=1)))
+
+    def test_append_freeze_frames_batch(self) -> None:
+        """Test if a batch of freeze frames is stored in order."""
+        index_1 = self.storage.insert_event_identifier(
+            test_radar_common.TEST_EVENT_IDENTIFIER)
+        index_2 = self.storage.insert_event_identifier(
+            test_radar_common.TEST_EVENT_IDENTIFIER_ALTERNATIVE)
+
+        self.storage.append_freeze_frames([
+            (index_1, test_radar_common.TEST_SESSION_UUID, {"count": 1}),
+            (index_2, test_radar_common.TEST_SESSION_UUID, {"count": 2}),
+            (index_1, test_radar_common.TEST_SESSION_UUID_ALTERNATIVE, {"count": 3})])
+
+        self.assertEqual([(test_radar_common.TEST_SESSION_UUID, {"count": 1}),  # type: ignore
+                          (test_radar_common.TEST_SESSION_UUID_ALTERNATIVE, {"count": 3})],
+                         list(self.storage.freeze_frames(index_1)))
+        self.assertEqual([(test_radar_common.TEST_SESSION_UUID,  # type: ignore
+                           {"count": 2})],
+                         list(self.storage.freeze_frames(index_2)))
+
+    def test_freeze_frame_pages(self) -> None:
+        """Test if freeze frames can be limited and filtered by session."""
+        index = self.storage.insert_event_identifier(
+            test_radar_common.TEST_EVENT_IDENTIFIER)
+        self.storage.append_freeze_frames([
+            (index, test_radar_common.TEST_SESSION_UUID, {"count": 1}),
+            (index, test_radar_common.TEST_SESSION_UUID_ALTERNATIVE, {"count": 2}),
+            (index, test_radar_common.TEST_SESSION_UUID, {"count": 3})])
+
+        self.assertEqual([(test_radar_common.TEST_SESSION_UUID_ALTERNATIVE,  # type: ignore
+                           {"count": 2})],
+                         list(self.storage.freeze_frames(index, start=1, limit=1)))
+        self.assertEqual([(test_radar_common.TEST_SESSION_UUID, {"count": 3})],  # type: ignore
+                         list(self.storage.freeze_frames(
+                             index, start=1, session_id=test_radar_common.TEST_SESSION_UUID)))
+
+        self.assertEqual({index}, self.storage.session_event_indices(  # type: ignore
+            test_radar_common.TEST_SESSION_UUID_ALTERNATIVE))
+        self.assertEqual(set(), set(self.storage.session_event_indices(  # type: ignore
+            uuid.uuid4())))
+
+    def test_sorted_freeze_frames(self) -> None:
+        """Test if freeze frames can be ordered by a measurement, with those without it last."""
+        index = self.storage.insert_event_identifier(
+            test_radar_common.TEST_EVENT_IDENTIFIER)
+        self.storage.append_freeze_frames([
+            (index, test_radar_common.TEST_SESSION_UUID, {"loss": 0.5}),
+            (index, test_radar_common.TEST_SESSION_UUID, {"epoch": 1}),
+            (index, test_radar_common.TEST_SESSION_UUID_ALTERNATIVE, {"loss": "nan"}),
+            (index, test_radar_common.TEST_SESSION_UUID, {"loss": 2}),
+            (index, test_radar_common.TEST_SESSION_UUID_ALTERNATIVE, {"loss": 0.1})])
+
+        def losses(**kwargs: typing.Any) -> typing.List[object]:  # type: ignore
+            return [freeze_frame.get("loss") for _, freeze_frame in
+                    self.storage.freeze_frames(index, sort_key="loss", **kwargs)]  # type: ignore
+
+        self.assertEqual([0.1, 0.5, 2, "nan", None], losses())  # type: ignore
+        self.assertEqual(["nan", 2, 0.5, 0.1, None], losses(descending=True))  # type: ignore
+        self.assertEqual([0.5, 2], losses(start=1, limit=2))  # type: ignore
+        self.assertEqual([2, 0.5], losses(start=1, limit=2, descending=True))  # type: ignore
+        self.assertEqual([0.5, 2, None], losses(  # type: ignore
+            session_id=test_radar_common.TEST_SESSION_UUID))
+        self.assertEqual([0.5, None, "nan", 2, 0.1], [  # type: ignore
+            freeze_frame.get("loss") for _, freeze_frame in
+            self.storage.freeze_frames(index, sort_key="unknown")])
+
+        self.assertEqual(radar_common.FreezeFrameSummary(5, 2),  # type: ignore
+                         self.storage.freeze_frame_summary(index))
+
+    def test_evict_freeze_frames(self) -> None:
+        """Test if freeze frames keep their timestamps and can be evicted by position."""
+        index = self.storage.insert_event_identifier(
+            test_radar_common.TEST_EVENT_IDENTIFIER)
+        for count in range(4):
+            self.storage.append_freeze_frame(
+                index, test_radar_common.TEST_SESSION_UUID if count < 3
+                else test_radar_common.TEST_SESSION_UUID_ALTERNATIVE,
+                {"count": count}, 100.0 + count)
+
+        self.assertEqual([100.0, 101.0, 102.0, 103.0],  # type: ignore
+                         list(self.storage.freeze_frame_timestamps(index)))
+        self.assertEqual([102.0, 103.0],  # type: ignore
+                         list(self.storage.freeze_frame_timestamps(index, start=2)))
+
+        evicted = self.storage.evict_freeze_frames(
+            index, lambda timestamps: [position for position, timestamp in enumerate(timestamps)
+                                       if timestamp in (101.0, 103.0)])
+
+        self.assertEqual(2, evicted)  # type: ignore
+        self.assertEqual([(test_radar_common.TEST_SESSION_UUID, {"count": 0}),  # type: ignore
+                          (test_radar_common.TEST_SESSION_UUID, {"count": 2})],
+                         list(self.storage.freeze_frames(index)))
+        self.assertEqual([100.0, 102.0],  # type: ignore
+                         list(self.storage.freeze_frame_timestamps(index)))
+        self.assertEqual(set(), set(self.storage.session_event_indices(  # type: ignore
+            test_radar_common.TEST_SESSION_UUID_ALTERNATIVE)))
+        self.assertEqual(radar_common.FreezeFrameSummary(2, 1),  # type: ignore
+                         self.storage.freeze_frame_summary(index))
+        self.assertEqual(0, self.storage.evict_freeze_frames(  # type: ignore
+            index, lambda timestamps: []))
+
+    def test_event_statistics(self) -> None:
+        """Test if occurrences are added up and timestamps are widened."""
+        index = self.storage.insert_event_identifier(
+            test_radar_common.TEST_EVENT_IDENTIFIER)
+        self.assertEqual(radar_common.EventStatistics(0, None, None),  # type: ignore
+                         self.storage.event_statistics(index))
+
+        self.storage.record_occurrences(index, 3, None, None)
+        self.storage.record_occurrences(index, 2, 20.0, 30.0)
+        self.storage.record_occurrences(index, 1, 10.0, 15.0)
+
+        self.assertEqual(radar_common.EventStatistics(6, 10.0, 30.0),  # type: ignore
+                         self.storage.event_statistics(index))
+
+    def test_occurrence_changes(self) -> None:
+        """Test if the change sequence grows with every occurrence and can be polled."""
+        index = self.storage.insert_event_identifier(
+            test_radar_common.TEST_EVENT_IDENTIFIER)
+        start = self.storage.change_sequence()
+        self.storage.record_occurrences(index, 2, None, None)
+
+        sequence = self.storage.change_sequence()
+        self.assertLess(start, sequence)  # type: ignore
+        changes = self.storage.occurrence_changes(sequence)
+        if changes is None:
+            self.fail("The changes were forgotten.")  # type: ignore
+        self.assertEqual(sequence, changes[0])  # type: ignore
+        self.assertEqual(0, len(changes[1]))  # type: ignore
+        self.assertIsNone(self.storage.occurrence_changes(sequence + 1))  # type: ignore
+
+    def test_client_info(self) -> None:
+        """Test if client info is stored, replaced and enumerated."""
+        self.storage.insert_client_info(test_radar_common.TEST_SESSION_UUID,
+                                        test_radar_common.TEST_CLIENT_INFO)
+        self.storage.insert_client_info(test_radar_common.TEST_SESSION_UUID_ALTERNATIVE,
+                                        test_radar_common.TEST_CLIENT_INFO)
+        self.storage.insert_client_info(test_radar_common.TEST_SESSION_UUID_ALTERNATIVE,
+                                        test_radar_common.TEST_CLIENT_INFO_ALTERNATIVE)
+
+        self.assertEqual(test_radar_common.TEST_CLIENT_INFO,  # type: ignore
+                         self.storage.client_info(test_radar_common.TEST_SESSION_UUID))
+        self.assertEqual(test_radar_common.TEST_CLIENT_INFO_ALTERNATIVE,  # type: ignore
+                         self.storage.client_info(test_radar_common.TEST_SESSION_UUID_ALTERNATIVE))
+        self.assertEqual(2, len(list(self.storage.client_infos())))  # type: ignore
+
+    def test_client_info_count(self) -> None:
+        """Test if the client info count grows when a session stores its client info."""
+        start = self.storage.client_info_count()
+        self.storage.insert_client_info(test_radar_common.TEST_SESSION_UUID,
+                                        test_radar_common.TEST_CLIENT_INFO)
+
+        self.assertLess(start, self.storage.client_info_count())  # type: ignore
+
+    def test_client_info_is_shared(self) -> None:
+        """Test if sessions with identical client info share one copy."""
+        self.storage.insert_client_info(test_radar_common.TEST_SESSION_UUID,
+                                        test_radar_common.TEST_CLIENT_INFO)
+        self.storage.insert_client_info(test_radar_common.TEST_SESSION_UUID_ALTERNATIVE,
+                                        radar_common.ClientInfo(
+                                            test_radar_common.TEST_HOSTNAME,
+                                            dict(test_radar_common.TEST_ENVIRONMENT)))
+
+        client_info_1 = self.storage.client_info(test_radar_common.TEST_SESSION_UUID)
+        client_info_2 = self.storage.client_info(test_radar_common.TEST_SESSION_UUID_ALTERNATIVE)
+        self.assertEqual(test_radar_common.TEST_CLIENT_INFO, client_info_2)  # type: ignore
+        self.assertIs(client_info_1, client_info_2)  # type: ignore
+
+    def test_client_info_with_other_values(self) -> None:
+        """Test if client info with environment values that are not strings is stored as is."""
+        client_info = radar_common.ClientInfo(
+            test_radar_common.TEST_HOSTNAME, {"A": 1, "B": None})  # type: ignore
+        self.storage.insert_client_info(test_radar_common.TEST_SESSION_UUID, client_info)
+
+        self.assertEqual(client_info,  # type: ignore
+                         self.storage.client_info(test_radar_common.TEST_SESSION_UUID))
+
+    def test_client_info_digest(self) -> None:
+        """Test if the digest only depends on the content of a client info."""
+        reordered = radar_common.ClientInfo(
+            test_radar_common.TEST_HOSTNAME,
+            dict(reversed(list(test_radar_common.TEST_ENVIRONMENT.items()))))
+
+        self.assertEqual(  # type: ignore
+            radar_storage.client_info_digest(test_radar_common.TEST_CLIENT_INFO),
+            radar_storage.client_info_digest(reordered))
+        self.assertNotEqual(  # type: ignore
+            radar_storage.client_info_digest(test_radar_common.TEST_CLIENT_INFO),
+            radar_storage.client_info_digest(test_radar_common.TEST_CLIENT_INFO_ALTERNATIVE))
+
+    def test_unknown_client_info(self) -> None:
+        """Test if unknown sessions raise a KeyError."""
+        with self.assertRaises(KeyError):  # type: ignore
+            self.storage.client_info(test_radar_common.TEST_SESSION_UUID)
+
+
+class TestMemoryStorageBackend(StorageBackendContract, unittest.TestCase):
+    """Tests for the in-memory storage backend."""
+
+    def setUp(self) -> None:
+        self.storage = radar_storage.MemoryStorageBackend()
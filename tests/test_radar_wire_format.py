@@ -0,0 +1,57 @@
+"""Test for radar API body encodings."""
+import typing
+import unittest
+
+import test_radar_common
+from mlre.radar import radar_common, radar_wire_format
+
+
+class TestRadarWireFormat(unittest.TestCase):
+    """Test for radar API body encodings."""
+
+    BODY = {"session_id": test_radar_common.TEST_SESSION_UUID,
+            "event_identifier": test_radar_common.TEST_EVENT_IDENTIFIER,
+            "freeze_frame": test_radar_common.TEST_EVENT_FREEZE_FRAME}
+
+    def test_round_trip(self) -> None:
+        """Test if all supported content types decode to the same structure."""
+        self.assertEqual(radar_wire_format.JSON, radar_wire_format.content_types()[0])
+
+        for content_type in radar_wire_format.content_types():
+            decoded: typing.Dict[str, object] = radar_wire_format.decode(  # type: ignore
+                radar_wire_format.encode(self.BODY, content_type), content_type)
+            fields = decoded["event_identifier"]
+            event_identifier = radar_common.EventIdentifier(*fields)  # type: ignore
+
+            self.assertEqual(str(test_radar_common.TEST_SESSION_UUID), decoded["session_id"])
+            self.assertEqual(test_radar_common.TEST_EVENT_IDENTIFIER, event_identifier)
+            self.assertEqual(test_radar_common.TEST_EVENT_FREEZE_FRAME, decoded["freeze_frame"])
+
+    @unittest.skipUnless(test_radar_common.MSGPACK_INSTALLED,  # type: ignore
+                         "msgpack is not installed")
+    def test_msgpack_is_smaller(self) -> None:
+        """Test if numeric freeze frames are smaller in MessagePack."""
+        body = {"freeze_frame": {f"loss_{step}": step / 3 for step in range(100)}}
+        self.assertLess(len(radar_wire_format.encode(body, radar_wire_format.MSGPACK)),
+                        len(radar_wire_format.encode(body, radar_wire_format.JSON)))
+
+    def test_invalid_body(self) -> None:
+        """Test if broken bodies and unsupported content types are rejected."""
+        for content_type in radar_wire_format.content_types():
+            with self.assertRaises(ValueError):
+                radar_wire_format.decode(b"\xc1{", content_type)
+
+        with self.assertRaises(ValueError):
+            radar_wire_format.encode(self.BODY, "application/xml")
+        with self.assertRaises(ValueError):
+            radar_wire_format.decode(b"{}", "application/xml")
+
+    def test_negotiate(self) -> None:
+        """Test if the client falls back to JSON unless the server lists its content type."""
+        server_content_types = [radar_wire_format.JSON, radar_wire_format.MSGPACK]
+        self.assertEqual(radar_wire_format.MSGPACK, radar_wire_format.negotiate(
+            radar_wire_format.MSGPACK, server_content_types))
+        self.assertEqual(radar_wire_format.JSON, radar_wire_format.negotiate(
+            radar_wire_format.MSGPACK, server_content_types[:1]))
+        self.assertEqual(radar_wire_format.JSON,
+                         radar_wire_format.negotiate(radar_wire_format.MSGPACK, None))